@@ -78,6 +78,25 @@ DATABASES = {
     }
 }
 
+# Cache shared by all worker processes on this host (set CACHE_BACKEND to a Redis or
+# Memcached backend when workers run on several hosts, or when more users are active
+# than the file cache holds comfortably: it lists its directory on every write)
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', str(BASE_DIR / 'cache')),
+    }
+}
+
+# Entries kept by a file, database or local-memory cache (Redis and Memcached clients
+# take no such option); a user's cached recommendations take two, the result and its
+# token, so the default holds 50000 users
+RECOMMENDER_RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RECOMMENDER_RESULT_CACHE_MAX_ENTRIES', '100000'))
+if CACHES['default']['BACKEND'].rsplit('.', 1)[0] in (
+    'django.core.cache.backends.filebased', 'django.core.cache.backends.db', 'django.core.cache.backends.locmem',
+):
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': RECOMMENDER_RESULT_CACHE_MAX_ENTRIES}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -170,9 +189,58 @@ CORS_ALLOW_HEADERS = [
     'x-requested-with',
 ]
 
+# Let the frontend read which recommendation model version served a response
+CORS_EXPOSE_HEADERS = [
+    'x-model-version',
+]
+
 # PesePay settings
 PESEPAY_API_KEY = os.getenv('PESEPAY_API_KEY', '')
 PESEPAY_API_SECRET = os.getenv('PESEPAY_API_SECRET', '')
 PESEPAY_RETURN_URL = 'http://localhost:4200/payment/result'
 PESEPAY_CANCEL_URL = 'http://localhost:4200/payment/result'
 
+# Recommendation engine settings
+# Seconds between checks for new model artifacts on disk
+RECOMMENDER_RELOAD_INTERVAL = int(os.getenv('RECOMMENDER_RELOAD_INTERVAL', '5'))
+# Number of published model versions kept on disk for rollback
+RECOMMENDER_KEEP_VERSIONS = int(os.getenv('RECOMMENDER_KEEP_VERSIONS', '3'))
+# Number of precomputed nearest neighbours kept per product
+RECOMMENDER_NEIGHBOURS = int(os.getenv('RECOMMENDER_NEIGHBOURS', '50'))
+# Catalog size from which similar products come from an approximate (IVF) index
+RECOMMENDER_ANN_MIN_ITEMS = int(os.getenv('RECOMMENDER_ANN_MIN_ITEMS', '100000'))
+# Number of IVF cells probed per query (higher = better recall, fewer queries/sec)
+RECOMMENDER_ANN_N_PROBE = int(os.getenv('RECOMMENDER_ANN_N_PROBE', '8'))
+# Model artifact format: 'joblib' pickles or 'npy' arrays memory-mapped and shared by all workers
+RECOMMENDER_ARTIFACT_FORMAT = os.getenv('RECOMMENDER_ARTIFACT_FORMAT', 'joblib')
+# Update the content model in place when a product is saved (disable for bulk imports)
+RECOMMENDER_INCREMENTAL_CONTENT_UPDATES = os.getenv('RECOMMENDER_INCREMENTAL_CONTENT_UPDATES', 'True') == 'True'
+# Float dtype of served item factors and product features ('float32' halves their memory)
+RECOMMENDER_FACTOR_DTYPE = os.getenv('RECOMMENDER_FACTOR_DTYPE', 'float64')
+# Store neighbour similarity scores as int8 with per-row scales (a quarter of float32)
+RECOMMENDER_QUANTIZE_NEIGHBOURS = os.getenv('RECOMMENDER_QUANTIZE_NEIGHBOURS', 'False') == 'True'
+# BLAS/OpenMP threads per server worker for request-time scoring (keeps workers x threads <= cores)
+RECOMMENDER_SERVING_THREADS = int(os.getenv('RECOMMENDER_SERVING_THREADS', '1'))
+# BLAS/OpenMP threads for training runs (0 = all cores)
+RECOMMENDER_TRAINING_THREADS = int(os.getenv('RECOMMENDER_TRAINING_THREADS', '0')) or None
+# Seconds after which a training job still pending while no training runs is marked failed
+RECOMMENDER_PENDING_JOB_TIMEOUT = int(os.getenv('RECOMMENDER_PENDING_JOB_TIMEOUT', '60'))
+# Users scored per matrix multiply when recommendations are precomputed or refreshed
+RECOMMENDER_SCORING_BLOCK_SIZE = int(os.getenv('RECOMMENDER_SCORING_BLOCK_SIZE', '128'))
+# Cache (see CACHES) holding recommendation results shared by all workers
+RECOMMENDER_RESULT_CACHE_ALIAS = os.getenv('RECOMMENDER_RESULT_CACHE_ALIAS', 'default')
+# Seconds a cached recommendation result is served (0 disables the cache). Results are
+# recomputed when the user's interaction rows are written, so reviews and orders show
+# up after the next interaction sync and views and cart additions after the next event
+# flush (RECOMMENDER_EVENT_FLUSH_INTERVAL); the TTL bounds staleness from anything else
+RECOMMENDER_RESULT_CACHE_TTL = int(os.getenv('RECOMMENDER_RESULT_CACHE_TTL', '300'))
+# Record product views and cart additions as interactions (buffered per worker)
+RECOMMENDER_CAPTURE_EVENTS = os.getenv('RECOMMENDER_CAPTURE_EVENTS', 'True') == 'True'
+# Seconds between background writes of buffered view and cart events
+RECOMMENDER_EVENT_FLUSH_INTERVAL = float(os.getenv('RECOMMENDER_EVENT_FLUSH_INTERVAL', '5'))
+# Buffered events that trigger an early write, and rows per INSERT
+RECOMMENDER_EVENT_BATCH_SIZE = int(os.getenv('RECOMMENDER_EVENT_BATCH_SIZE', '1000'))
+# Seconds the popular products served while no model is available are cached per worker
+RECOMMENDER_POPULAR_PRODUCTS_TTL = int(os.getenv('RECOMMENDER_POPULAR_PRODUCTS_TTL', '300'))
+# Seconds before its watermark the interaction sync re-reads, for rows committed late (longer than any transaction)
+RECOMMENDER_SYNC_SAFETY_LAG = int(os.getenv('RECOMMENDER_SYNC_SAFETY_LAG', '300'))
@@ -9,6 +9,7 @@ from django.shortcuts import get_object_or_404
 from .models import Cart, CartItem, Order
 from .serializers import CartSerializer, CartItemSerializer, OrderSerializer, CheckoutSerializer
 from products.models import Product
+from recommendations.event_buffer import interaction_events
 import requests 
 
 
@@ -66,6 +67,9 @@ class CartViewSet(viewsets.ViewSet):
             cart_item.quantity += quantity
             cart_item.save()
         
+        # Record the cart addition for the recommender (buffered, written in the background)
+        interaction_events.record(request.user.id, product.id, 'cart', quantity)
+        
         serializer = CartSerializer(cart)
         return Response(serializer.data)
     
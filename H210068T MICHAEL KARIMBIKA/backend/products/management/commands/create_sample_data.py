@@ -1,15 +1,132 @@
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
 from products.models import Category, Product, ProductImage, Review, Season
+from orders.models import Order, OrderItem
+from recommendations.models import UserProductInteraction
 from recommendations.recommendation_engine import RecommendationEngine
+from datetime import timedelta
+from decimal import Decimal
+import numpy as np
 import random
+import time
 from django.utils.text import slugify
 
 User = get_user_model()
 
+# Vocabulary for generated product names, per sample category
+SCALE_PRODUCT_NOUNS = {
+    'Electronics': ['Headphones', 'Speaker', 'Charger', 'Smart Watch', 'Earbuds', 'Tablet', 'Keyboard', 'Mouse', 'Monitor', 'Camera'],
+    'Clothing': ['T-Shirt', 'Jeans', 'Jacket', 'Sweater', 'Shorts', 'Dress', 'Hoodie', 'Socks', 'Scarf', 'Cap'],
+    'Home & Kitchen': ['Blender', 'Toaster', 'Kettle', 'Cookware Set', 'Knife Set', 'Blanket', 'Fan', 'Lamp', 'Mug', 'Coffee Maker'],
+    'Beauty & Personal Care': ['Moisturizer', 'Shampoo', 'Sunscreen', 'Hair Dryer', 'Toothbrush', 'Lip Balm', 'Face Mask', 'Perfume', 'Conditioner', 'Serum'],
+    'Sports & Outdoors': ['Yoga Mat', 'Dumbbells', 'Water Bottle', 'Backpack', 'Tent', 'Ski Goggles', 'Tennis Racket', 'Bike Helmet', 'Running Belt', 'Beach Umbrella'],
+}
+SCALE_ADJECTIVES = ['Wireless', 'Portable', 'Premium', 'Compact', 'Classic', 'Smart', 'Organic', 'Pro', 'Ultra', 'Lightweight', 'Waterproof', 'Vintage']
+SCALE_FEATURES = ['durable', 'eco-friendly', 'handmade', 'rechargeable', 'breathable', 'insulated', 'adjustable', 'foldable', 'stainless', 'cotton', 'leather', 'bamboo']
+
+# User countries (weights roughly follow store traffic) and their regions
+SCALE_COUNTRIES = ['US', 'GB', 'DE', 'FR', 'CA', 'JP', 'AU', 'ZA', 'BR', 'NZ', 'ZW', 'AR']
+SCALE_COUNTRY_WEIGHTS = [0.30, 0.10, 0.08, 0.07, 0.06, 0.05, 0.08, 0.07, 0.07, 0.03, 0.05, 0.04]
+SCALE_REGIONS = {
+    'US': ['CA', 'NY', 'TX', 'FL', 'WA'],
+    'CA': ['ON', 'QC', 'BC'],
+    'AU': ['NSW', 'VIC', 'QLD'],
+    'ZA': ['GP', 'WC', 'KZN'],
+}
+
+# Interaction mix and review rating distribution
+SCALE_INTERACTION_TYPES = ['view', 'cart', 'purchase', 'review']
+SCALE_INTERACTION_WEIGHTS = [0.70, 0.15, 0.10, 0.05]
+SCALE_RATING_WEIGHTS = [0.05, 0.05, 0.15, 0.35, 0.40]
+
+
+def insert_rows(model, field_names, rows, batch_size, ignore_conflicts=False, returning=()):
+    """
+    Insert rows given as tuples of database values with multi-row INSERTs
+    
+    Unlike bulk_create this builds no model instances and applies no auto_now or
+    auto_now_add, so generated timestamps are stored as given. ignore_conflicts
+    and returning need PostgreSQL or SQLite 3.35+.
+    
+    Args:
+        model: Model class
+        field_names: Names of the fields the tuples hold, in order
+        rows: List of tuples of database values
+        batch_size: Rows per INSERT (lowered to the backend's query parameter limit)
+        ignore_conflicts: Skip rows that violate a unique constraint
+        returning: Field names to return for the inserted rows
+        
+    Returns:
+        List of tuples of the `returning` values of the inserted rows
+    """
+    opts = model._meta
+    fields = [opts.get_field(name) for name in field_names]
+    quote = connection.ops.quote_name
+    batch_size = max(1, min(batch_size, connection.ops.bulk_batch_size(fields, rows) or batch_size))
+    
+    sql = f"INSERT INTO {quote(opts.db_table)} ({', '.join(quote(field.column) for field in fields)}) VALUES "
+    suffix = ' ON CONFLICT DO NOTHING' if ignore_conflicts else ''
+    if returning:
+        suffix += f" RETURNING {', '.join(quote(opts.get_field(name).column) for name in returning)}"
+    placeholders = f"({', '.join(['%s'] * len(fields))})"
+    
+    inserted = []
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            cursor.execute(
+                sql + ', '.join([placeholders] * len(batch)) + suffix,
+                [value for row in batch for value in row],
+            )
+            if returning:
+                inserted.extend(cursor.fetchall())
+    return inserted
+
+
+def past_datetimes(now, ages):
+    """
+    Database values of the times `ages` seconds before `now`
+    
+    Args:
+        now: Aware or naive current time
+        ages: Array of ages in seconds
+    """
+    now = np.datetime64(now.replace(tzinfo=None), 'us')
+    values = (now - (ages * 1e6).astype('timedelta64[us]')).astype(object)
+    return [connection.ops.adapt_datetimefield_value(value) for value in values]
+
+
+def power_law_cdf(rng, n, exponent):
+    """
+    Cumulative distribution of a shuffled Zipf-like popularity over n items
+    
+    Sample indices from it with np.searchsorted(cdf, rng.random(size)).
+    """
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    rng.shuffle(weights)
+    cdf = np.cumsum(weights)
+    return cdf / cdf[-1]
+
 class Command(BaseCommand):
     help = 'Creates sample data for the e-commerce recommendation system'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=0,
+                            help='Scale mode: number of users to generate')
+        parser.add_argument('--products', type=int, default=0,
+                            help='Scale mode: number of products to generate')
+        parser.add_argument('--interactions', type=int, default=0,
+                            help='Scale mode: number of user-product interactions to generate')
+        parser.add_argument('--days', type=int, default=365,
+                            help='Scale mode: spread interaction timestamps over this many past days')
+        parser.add_argument('--seed', type=int, default=42, help='Scale mode: random seed')
+        parser.add_argument('--chunk-size', type=int, default=10000,
+                            help='Scale mode: rows generated and inserted per chunk')
+
     def handle(self, *args, **options):
         self.stdout.write('Creating sample data...')
         
@@ -63,6 +180,11 @@ class Command(BaseCommand):
             if created:
                 self.stdout.write(f'Created category: {category.name}')
         
+        # Scale mode replaces the hand-written catalog with generated data
+        if options['users'] or options['products'] or options['interactions']:
+            self.create_scale_data(options)
+            return
+        
         # Get all categories and seasons
         all_categories = Category.objects.all()
         winter_n = Season.objects.get(name='Winter', hemisphere='N')
@@ -193,9 +315,256 @@ class Command(BaseCommand):
         self.stdout.write('Generating recommendations...')
         RecommendationEngine.update_user_product_interactions()
         RecommendationEngine.calculate_product_similarities()
-        
-        for user in all_users:
-            RecommendationEngine.generate_recommendations_for_user(user)
+        call_command('refresh_recommendations', stdout=self.stdout)
         
         self.stdout.write(self.style.SUCCESS('Sample data created successfully!'))
-
+    
+    def create_scale_data(self, options):
+        """
+        Generate a production-sized dataset in chunks
+        
+        Product popularity and user activity follow power laws, so a few products
+        and users account for most interactions. Reviews and orders are created
+        for the generated review and purchase interactions.
+        """
+        rng = np.random.default_rng(options['seed'])
+        chunk_size = options['chunk_size']
+        
+        # Names are prefixed per seed; re-running with the same seed appends more rows
+        prefix = f"scale{options['seed']}-"
+        start = time.perf_counter()
+        
+        user_ids = self.create_scale_users(rng, prefix, options['users'], chunk_size)
+        product_ids, product_prices = self.create_scale_products(rng, prefix, options['products'], chunk_size)
+        
+        if options['interactions']:
+            if not len(user_ids) or not len(product_ids):
+                self.stdout.write(self.style.WARNING('Interactions need generated users and products, skipping'))
+            else:
+                self.create_scale_interactions(
+                    rng, prefix, user_ids, product_ids, product_prices,
+                    options['interactions'], options['days'], chunk_size
+                )
+        
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Scale data created in {elapsed:.1f}s. Train the models with the recommendations API or a training job.'
+        ))
+    
+    def create_scale_users(self, rng, prefix, count, chunk_size):
+        """Create `count` users and return the IDs of all users with this prefix"""
+        offset = User.objects.filter(username__startswith=prefix).count()
+        
+        # Hashing is deliberately slow, so every generated user shares one password hash
+        password = make_password('password123')
+        countries = rng.choice(SCALE_COUNTRIES, size=count, p=SCALE_COUNTRY_WEIGHTS)
+        
+        for chunk_start in range(0, count, chunk_size):
+            users = []
+            for i in range(chunk_start, min(chunk_start + chunk_size, count)):
+                number = offset + i
+                country = str(countries[i])
+                regions = SCALE_REGIONS.get(country)
+                users.append(User(
+                    username=f'{prefix}user{number}',
+                    email=f'{prefix}user{number}@example.com',
+                    password=password,
+                    country=country,
+                    state=regions[number % len(regions)] if regions else '',
+                ))
+            User.objects.bulk_create(users, batch_size=chunk_size)
+            self.stdout.write(f'Created {min(chunk_start + chunk_size, count)}/{count} users')
+        
+        return np.fromiter(
+            User.objects.filter(username__startswith=prefix).order_by('id').values_list('id', flat=True),
+            dtype=np.int64,
+        )
+    
+    def create_scale_products(self, rng, prefix, count, chunk_size):
+        """
+        Create `count` products with seasons and country availability
+        
+        Returns:
+            Tuple of (product IDs, prices) arrays for all products with this prefix
+        """
+        offset = Product.objects.filter(slug__startswith=prefix).count()
+        categories = list(Category.objects.all())
+        seasons = list(Season.objects.all())
+        SeasonLink = Product.seasons.through
+        
+        for chunk_start in range(0, count, chunk_size):
+            chunk_end = min(chunk_start + chunk_size, count)
+            size = chunk_end - chunk_start
+            
+            category_choices = rng.integers(len(categories), size=size)
+            prices = np.round(rng.lognormal(mean=3.5, sigma=0.8, size=size), 2)
+            is_seasonal = rng.random(size) < 0.4
+            is_location_specific = rng.random(size) < 0.1
+            
+            products = []
+            product_seasons = []
+            for row in range(size):
+                number = offset + chunk_start + row
+                category = categories[category_choices[row]]
+                nouns = SCALE_PRODUCT_NOUNS.get(category.name, ['Item'])
+                adjective = SCALE_ADJECTIVES[rng.integers(len(SCALE_ADJECTIVES))]
+                noun = nouns[rng.integers(len(nouns))]
+                features = rng.choice(SCALE_FEATURES, size=2, replace=False)
+                name = f'{adjective} {noun}'
+                
+                countries = ''
+                if is_location_specific[row]:
+                    countries = ','.join(rng.choice(SCALE_COUNTRIES, size=rng.integers(1, 5), replace=False))
+                
+                products.append(Product(
+                    name=name,
+                    slug=f'{prefix}{slugify(name)}-{number}',
+                    description=f"A {features[0]}, {features[1]} {name.lower()} in the {category.name} category.",
+                    price=Decimal(str(prices[row])),
+                    category=category,
+                    stock=int(rng.integers(0, 500)),
+                    featured=bool(rng.random() < 0.02),
+                    is_location_specific=bool(is_location_specific[row]),
+                    available_countries=countries,
+                ))
+                if is_seasonal[row] and seasons:
+                    product_seasons.append(rng.choice(len(seasons), size=rng.integers(1, 3), replace=False))
+                else:
+                    product_seasons.append([])
+            
+            with transaction.atomic():
+                Product.objects.bulk_create(products, batch_size=chunk_size)
+                slugs = [product.slug for product in products]
+                ids_by_slug = dict(Product.objects.filter(slug__in=slugs).values_list('slug', 'id'))
+                SeasonLink.objects.bulk_create([
+                    SeasonLink(product_id=ids_by_slug[slug], season_id=seasons[season_index].id)
+                    for slug, season_indices in zip(slugs, product_seasons)
+                    for season_index in season_indices
+                ], batch_size=chunk_size)
+            self.stdout.write(f'Created {chunk_end}/{count} products')
+        
+        rows = list(Product.objects.filter(slug__startswith=prefix).order_by('id').values_list('id', 'price'))
+        product_ids = np.array([product_id for product_id, _ in rows], dtype=np.int64)
+        product_prices = np.array([float(price) for _, price in rows], dtype=np.float64)
+        return product_ids, product_prices
+    
+    def create_scale_interactions(self, rng, prefix, user_ids, product_ids, product_prices, count, days, chunk_size):
+        """
+        Create `count` interactions with power-law popularity, plus matching reviews and orders
+        
+        Rows are generated as numpy columns and inserted as plain tuples with their
+        created_at and updated_at already spread over the past `days` days.
+        Duplicate (user, product, type) triples are skipped, within a chunk and
+        against stored rows, so slightly fewer interactions than requested may be
+        stored; reviews and orders are only created for the review and purchase
+        interactions actually inserted.
+        """
+        user_cdf = power_law_cdf(rng, len(user_ids), exponent=0.8)
+        product_cdf = power_law_cdf(rng, len(product_ids), exponent=1.1)
+        type_choices = np.arange(len(SCALE_INTERACTION_TYPES))
+        type_names = np.array(SCALE_INTERACTION_TYPES, dtype=object)
+        review_type = SCALE_INTERACTION_TYPES.index('review')
+        purchase_type = SCALE_INTERACTION_TYPES.index('purchase')
+        interaction_fields = ('user_id', 'product_id', 'interaction_type', 'value', 'created_at', 'updated_at')
+        now = timezone.now()
+        order_number = Order.objects.filter(payment_reference__startswith=prefix).count()
+        
+        for chunk_start in range(0, count, chunk_size):
+            size = min(chunk_size, count - chunk_start)
+            
+            # Draw users and products from their popularity distributions
+            user_idx = np.searchsorted(user_cdf, rng.random(size))
+            product_idx = np.searchsorted(product_cdf, rng.random(size))
+            types = rng.choice(type_choices, size=size, p=SCALE_INTERACTION_WEIGHTS)
+            
+            # Drop duplicate triples within the chunk
+            keys = (user_idx * len(product_ids) + product_idx) * len(type_choices) + types
+            _, unique_rows = np.unique(keys, return_index=True)
+            user_idx, product_idx, types = user_idx[unique_rows], product_idx[unique_rows], types[unique_rows]
+            size = len(unique_rows)
+            
+            ratings = rng.choice(np.arange(1, 6), size=size, p=SCALE_RATING_WEIGHTS)
+            quantities = rng.integers(1, 4, size=size)
+            helpful_counts = rng.integers(0, 10, size=size)
+            ages = rng.random(size) * days * 86400
+            values = np.select([types == review_type, types == purchase_type], [ratings, quantities], 1).astype(float)
+            
+            users = user_ids[user_idx].tolist()
+            products = product_ids[product_idx].tolist()
+            dates = past_datetimes(now, ages)
+            rows = list(zip(users, products, type_names[types].tolist(), values.tolist(), dates, dates))
+            
+            with transaction.atomic():
+                # Reviews and purchases are inserted apart, to learn which of them were new
+                tracked = np.flatnonzero((types == review_type) | (types == purchase_type))
+                insert_rows(
+                    UserProductInteraction, interaction_fields,
+                    [rows[row] for row in np.flatnonzero((types != review_type) & (types != purchase_type))],
+                    chunk_size, ignore_conflicts=True,
+                )
+                inserted = set(insert_rows(
+                    UserProductInteraction, interaction_fields, [rows[row] for row in tracked],
+                    chunk_size, ignore_conflicts=True, returning=('user_id', 'product_id', 'interaction_type'),
+                ))
+                new_rows = np.array([row for row in tracked if rows[row][:3] in inserted], dtype=np.int64)
+                
+                reviews = new_rows[types[new_rows] == review_type]
+                insert_rows(Review, ('user_id', 'product_id', 'rating', 'comment', 'helpful_count', 'created_at', 'updated_at'), [
+                    (users[row], products[row], int(ratings[row]), f"Rated {ratings[row]} out of 5.",
+                     int(helpful_counts[row]), dates[row], dates[row])
+                    for row in reviews.tolist()
+                ], chunk_size, ignore_conflicts=True)
+                
+                order_number = self.create_scale_orders(
+                    prefix, order_number, new_rows[types[new_rows] == purchase_type],
+                    user_ids[user_idx], product_ids[product_idx], product_prices[product_idx], quantities, ages,
+                    now, chunk_size,
+                )
+            
+            self.stdout.write(f'Created {min(chunk_start + chunk_size, count)}/{count} interactions')
+    
+    def create_scale_orders(self, prefix, order_number, purchases, users, products, prices, quantities, ages, now, chunk_size):
+        """
+        Create one order per user for a chunk's new purchase interactions
+        
+        An order is dated at its latest purchase.
+        
+        Args:
+            prefix: Payment reference prefix
+            order_number: Number of the first new order
+            purchases: Indices of the chunk rows that are new purchases
+            users, products, prices, quantities, ages: Per-row columns of the chunk
+            now: Time the ages count back from
+            chunk_size: Rows per INSERT
+            
+        Returns:
+            Number of the next order
+        """
+        if not len(purchases):
+            return order_number
+        
+        purchases = purchases[np.argsort(users[purchases], kind='stable')]
+        order_users, starts = np.unique(users[purchases], return_index=True)
+        totals = np.add.reduceat(prices[purchases] * quantities[purchases], starts)
+        order_dates = past_datetimes(now, np.minimum.reduceat(ages[purchases], starts))
+        references = [f'{prefix}order{number}' for number in range(order_number, order_number + len(order_users))]
+        
+        ids_by_reference = dict(insert_rows(Order, (
+            'user_id', 'full_name', 'email', 'phone', 'address', 'status', 'payment_status', 'payment_method',
+            'payment_reference', 'shipping_cost', 'total_amount', 'created_at', 'updated_at',
+        ), [
+            (user_id, f'Scale User {user_id}', f'{prefix}customer{user_id}@example.com', '0000000000',
+             '1 Load Test Road', 'delivered', 'paid', 'PesePay', reference, Decimal('0'),
+             Decimal(str(round(total, 2))), date, date)
+            for user_id, reference, total, date in zip(order_users.tolist(), references, totals.tolist(), order_dates)
+        ], chunk_size, returning=('payment_reference', 'id')))
+        
+        order_ids = np.repeat([ids_by_reference[reference] for reference in references], np.diff(np.append(starts, len(purchases))))
+        insert_rows(OrderItem, ('order_id', 'product_id', 'quantity', 'price'), [
+            (order_id, product_id, quantity, Decimal(str(price)))
+            for order_id, product_id, quantity, price in zip(
+                order_ids.tolist(), products[purchases].tolist(), quantities[purchases].tolist(), prices[purchases].tolist()
+            )
+        ], chunk_size)
+        
+        return order_number + len(order_users)
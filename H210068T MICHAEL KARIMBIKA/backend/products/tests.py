@@ -1,3 +1,75 @@
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+from orders.models import Order, OrderItem
+from recommendations.models import UserProductInteraction
+from .models import Product, Review
+import datetime
 
-# Create your tests here.
+User = get_user_model()
+
+
+class CreateSampleDataScaleTests(TestCase):
+    """Smoke test of create_sample_data's scale mode with small counts"""
+
+    def create(self, **counts):
+        args = []
+        for option, value in counts.items():
+            args += [f'--{option.replace("_", "-")}', str(value)]
+        call_command('create_sample_data', *args, stdout=StringIO())
+
+    def test_scale_mode(self):
+        before = timezone.now()
+        self.create(users=6, products=10, interactions=80, days=30, chunk_size=25)
+        after = timezone.now()
+
+        self.assertEqual(User.objects.filter(username__startswith='scale42-').count(), 6)
+        self.assertEqual(Product.objects.filter(slug__startswith='scale42-').count(), 10)
+
+        interactions = UserProductInteraction.objects.all()
+        self.assertTrue(0 < interactions.count() <= 80)
+
+        # Timestamps are spread over the past 30 days, and auto_now_add is left alone
+        for model in (UserProductInteraction, Review, Order):
+            rows = list(model.objects.values_list('created_at', 'updated_at'))
+            created_at = [created for created, _ in rows]
+            self.assertTrue(created_at)
+            self.assertTrue(all(before - datetime.timedelta(days=30) <= value <= after for value in created_at))
+            self.assertLess(min(created_at), before - datetime.timedelta(days=1))
+            self.assertTrue(model._meta.get_field('created_at').auto_now_add)
+
+            # updated_at is backdated too, so a refresh --since a recent time skips the rows
+            self.assertTrue(all(updated == created for created, updated in rows))
+
+        self.assert_matching_reviews_and_orders()
+
+    def assert_matching_reviews_and_orders(self):
+        # Reviews and order items match the review and purchase interactions
+        interactions = UserProductInteraction.objects.all()
+        self.assertEqual(
+            set(Review.objects.values_list('user_id', 'product_id', 'rating')),
+            {
+                (user_id, product_id, int(value)) for user_id, product_id, value in
+                interactions.filter(interaction_type='review').values_list('user_id', 'product_id', 'value')
+            },
+        )
+        self.assertEqual(
+            sorted(OrderItem.objects.values_list('order__user_id', 'product_id', 'quantity')),
+            sorted(
+                (user_id, product_id, int(value)) for user_id, product_id, value in
+                interactions.filter(interaction_type='purchase').values_list('user_id', 'product_id', 'value')
+            ),
+        )
+        self.assertFalse(Order.objects.filter(items__isnull=True).exists())
+
+    def test_rerun_appends(self):
+        self.create(users=3, products=4, interactions=20)
+        self.create(users=2, products=1, interactions=10)
+
+        self.assertEqual(User.objects.filter(username__startswith='scale42-').count(), 5)
+        self.assertEqual(Product.objects.filter(slug__startswith='scale42-').count(), 5)
+
+        # Purchases already stored by the first run create no second order
+        self.assert_matching_reviews_and_orders()
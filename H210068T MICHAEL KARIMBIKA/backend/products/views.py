@@ -6,6 +6,7 @@ from django.db.models import Q, Case, When, Value, IntegerField
 from .models import Category, Product, Review, HelpfulReview, Season
 from .serializers import CategorySerializer, ProductSerializer, ProductDetailSerializer, ReviewSerializer, SeasonSerializer
 from .filters import ProductFilter
+from recommendations.event_buffer import interaction_events
 import datetime
 
 class SeasonViewSet(viewsets.ReadOnlyModelViewSet):
@@ -86,6 +87,16 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
             return ProductDetailSerializer
         return ProductSerializer
     
+    def retrieve(self, request, *args, **kwargs):
+        product = self.get_object()
+        serializer = self.get_serializer(product)
+        
+        # Record the view for the recommender (buffered, written in the background)
+        if request.user.is_authenticated:
+            interaction_events.record(request.user.id, product.id, 'view')
+        
+        return Response(serializer.data)
+    
     @action(detail=False, methods=['get'])
     def featured(self, request):
         featured_products = self.get_queryset().filter(featured=True)
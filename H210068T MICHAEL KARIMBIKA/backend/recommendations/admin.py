@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UserProductInteraction, ProductSimilarity, UserProductRecommendation
+from .models import UserProductInteraction, ProductSimilarity, UserProductRecommendation, TrainingJob, PopularitySegment, InteractionSyncState
 
 @admin.register(UserProductInteraction)
 class UserProductInteractionAdmin(admin.ModelAdmin):
@@ -17,3 +17,17 @@ class UserProductRecommendationAdmin(admin.ModelAdmin):
     list_display = ('user', 'product', 'score', 'created_at')
     search_fields = ('user__username', 'product__name')
 
+@admin.register(TrainingJob)
+class TrainingJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'phase', 'requested_by', 'created_at', 'started_at', 'finished_at')
+    list_filter = ('status',)
+
+@admin.register(PopularitySegment)
+class PopularitySegmentAdmin(admin.ModelAdmin):
+    list_display = ('country', 'hemisphere', 'month', 'updated_at')
+    list_filter = ('hemisphere', 'month')
+    search_fields = ('country',)
+
+@admin.register(InteractionSyncState)
+class InteractionSyncStateAdmin(admin.ModelAdmin):
+    list_display = ('source', 'synced_until', 'updated_at')
@@ -0,0 +1,254 @@
+import os
+import time
+import numpy as np
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+def normalize_rows(features):
+    """Return float32 copy of features with unit-length rows (zero rows stay zero)"""
+    features = np.asarray(features, dtype=np.float32)
+    norms = np.linalg.norm(features, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return features / norms
+
+
+def top_k(scores, k):
+    """
+    Get indices of the k highest scores, sorted by descending score
+    
+    Args:
+        scores: 1-D array of scores
+        k: Number of indices to return
+    
+    Returns:
+        Array of indices into scores
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def top_k_rows(scores, k):
+    """
+    Get indices of the k highest scores of every row, sorted by descending score
+    
+    Args:
+        scores: 2-D array of scores
+        k: Number of indices to return per row
+    
+    Returns:
+        Array of shape (rows, min(k, columns)) of column indices
+    """
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.zeros((scores.shape[0], 0), dtype=np.int64)
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+class IVFIndex:
+    """
+    Approximate cosine nearest neighbour index (inverted file with a k-means coarse quantiser)
+    
+    Items are clustered into `n_lists` cells. A query only scores the items in the
+    `n_probe` cells whose centroids are closest to it, so raising `n_probe` trades
+    queries per second for recall.
+    """
+    def __init__(self, n_lists=None, n_probe=8, n_iter=10, random_state=42):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.random_state = random_state
+        self.normalized = None
+        self.centroids = None
+        self.list_offsets = None
+        self.list_items = None
+    
+    def _assign(self, vectors, block_size=4096):
+        """Assign each vector to its closest centroid"""
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), block_size):
+            block = vectors[start:start + block_size] @ self.centroids.T
+            assignments[start:start + block_size] = np.argmax(block, axis=1)
+        return assignments
+    
+    def build(self, features):
+        """
+        Build the index from an item feature matrix
+        
+        Args:
+            features: Array of shape (n_items, n_features), e.g. CF item factors or content features
+        """
+        rng = np.random.default_rng(self.random_state)
+        self.normalized = normalize_rows(features)
+        n_items = len(self.normalized)
+        
+        n_lists = self.n_lists or int(np.sqrt(n_items))
+        n_lists = max(1, min(n_lists, n_items))
+        
+        # Train the coarse quantiser (spherical k-means) on a sample of the items
+        sample_size = min(n_items, n_lists * 256)
+        sample = self.normalized[rng.choice(n_items, sample_size, replace=False)]
+        self.centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+        
+        for _ in range(self.n_iter):
+            assignments = self._assign(sample)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, assignments, sample)
+            
+            # Re-seed empty cells with random sample points
+            empty = np.flatnonzero(~sums.any(axis=1))
+            if len(empty):
+                sums[empty] = sample[rng.choice(sample_size, len(empty))]
+            self.centroids = normalize_rows(sums)
+        
+        # Store the inverted lists as one array of item indices grouped by cell
+        assignments = self._assign(self.normalized)
+        self.list_items = np.argsort(assignments, kind='stable').astype(np.int32)
+        self.list_offsets = np.searchsorted(assignments[self.list_items], np.arange(n_lists + 1))
+        
+        logger.info(f"Built IVF index over {n_items} items with {n_lists} lists")
+        return self
+    
+    def update_items(self, item_indices, features):
+        """
+        Re-index changed or appended items without retraining the quantiser
+        
+        Args:
+            item_indices: Row indices of the changed or new items
+            features: Full, updated feature matrix (may have more rows than before)
+        """
+        n_lists = len(self.centroids)
+        
+        # Recover each item's cell from the inverted lists
+        assignments = np.empty(len(features), dtype=np.int32)
+        assignments[self.list_items] = np.repeat(np.arange(n_lists, dtype=np.int32), np.diff(self.list_offsets))
+        
+        normalized = np.empty((len(features), self.normalized.shape[1]), dtype=np.float32)
+        normalized[:len(self.normalized)] = self.normalized
+        normalized[item_indices] = normalize_rows(np.asarray(features)[item_indices])
+        self.normalized = normalized
+        assignments[item_indices] = self._assign(self.normalized[item_indices])
+        
+        self.list_items = np.argsort(assignments, kind='stable').astype(np.int32)
+        self.list_offsets = np.searchsorted(assignments[self.list_items], np.arange(n_lists + 1))
+        return self
+    
+    def save_arrays(self, directory):
+        """
+        Save the index as raw .npy arrays
+        
+        Returns:
+            Dictionary of parameters to record in the artifact manifest
+        """
+        np.save(os.path.join(directory, 'ann_normalized.npy'), self.normalized)
+        np.save(os.path.join(directory, 'ann_centroids.npy'), self.centroids)
+        np.save(os.path.join(directory, 'ann_list_offsets.npy'), self.list_offsets)
+        np.save(os.path.join(directory, 'ann_list_items.npy'), self.list_items)
+        return {'n_lists': len(self.centroids), 'n_probe': self.n_probe}
+    
+    @classmethod
+    def load_arrays(cls, directory, params, mmap_mode='r'):
+        """Load an index saved with save_arrays, memory-mapping the arrays"""
+        index = cls(n_lists=params['n_lists'], n_probe=params['n_probe'])
+        index.normalized = np.load(os.path.join(directory, 'ann_normalized.npy'), mmap_mode=mmap_mode)
+        index.centroids = np.load(os.path.join(directory, 'ann_centroids.npy'), mmap_mode=mmap_mode)
+        index.list_offsets = np.load(os.path.join(directory, 'ann_list_offsets.npy'), mmap_mode=mmap_mode)
+        index.list_items = np.load(os.path.join(directory, 'ann_list_items.npy'), mmap_mode=mmap_mode)
+        return index
+    
+    def query_vector(self, vector, n=10, exclude_idx=None):
+        """
+        Get the approximate nearest items for a query vector
+        
+        Args:
+            vector: Query vector of shape (n_features,)
+            n: Number of neighbours to return
+            exclude_idx: Optional item index to leave out of the results
+        
+        Returns:
+            Tuple of (indices, scores) arrays sorted by descending cosine similarity
+        """
+        query = normalize_rows(np.reshape(vector, (1, -1)))[0]
+        
+        # Pick the cells closest to the query
+        probe = top_k(self.centroids @ query, self.n_probe)
+        candidates = np.concatenate([
+            self.list_items[self.list_offsets[cell]:self.list_offsets[cell + 1]]
+            for cell in probe
+        ])
+        if exclude_idx is not None:
+            candidates = candidates[candidates != exclude_idx]
+        
+        # Score only the candidates exactly
+        scores = self.normalized[candidates] @ query
+        top = top_k(scores, n)
+        return candidates[top], scores[top]
+    
+    def query_item(self, item_idx, n=10):
+        """
+        Get the approximate nearest items for an indexed item (excluding itself)
+        
+        Args:
+            item_idx: Row index of the item in the indexed feature matrix
+            n: Number of neighbours to return
+        
+        Returns:
+            Tuple of (indices, scores) arrays sorted by descending cosine similarity
+        """
+        return self.query_vector(self.normalized[item_idx], n=n, exclude_idx=item_idx)
+
+
+def benchmark_index(features, index, n=10, n_queries=1000, random_state=42):
+    """
+    Compare an ANN index against exact cosine search
+    
+    Args:
+        features: Feature matrix the index was built from
+        index: Built IVFIndex
+        n: Number of neighbours per query (the K in recall@K)
+        n_queries: Number of random items to query
+    
+    Returns:
+        Dictionary with recall@K and queries per second for both paths
+    """
+    rng = np.random.default_rng(random_state)
+    normalized = normalize_rows(features)
+    queries = rng.choice(len(normalized), min(n_queries, len(normalized)), replace=False)
+    
+    # Exact path: score every item for every query
+    start = time.perf_counter()
+    exact_results = []
+    for item_idx in queries:
+        scores = normalized @ normalized[item_idx]
+        scores[item_idx] = -np.inf
+        exact_results.append(top_k(scores, n))
+    exact_seconds = time.perf_counter() - start
+    
+    # Approximate path
+    start = time.perf_counter()
+    ann_results = [index.query_item(item_idx, n=n)[0] for item_idx in queries]
+    ann_seconds = time.perf_counter() - start
+    
+    hits = sum(
+        len(np.intersect1d(exact, approx))
+        for exact, approx in zip(exact_results, ann_results)
+    )
+    total = sum(len(exact) for exact in exact_results)
+    
+    return {
+        'items': len(normalized),
+        'queries': len(queries),
+        'k': n,
+        'n_lists': len(index.centroids),
+        'n_probe': index.n_probe,
+        'recall_at_k': hits / total if total else 0.0,
+        'exact_qps': len(queries) / exact_seconds if exact_seconds else 0.0,
+        'ann_qps': len(queries) / ann_seconds if ann_seconds else 0.0,
+    }
@@ -0,0 +1,68 @@
+import os
+import numpy as np
+
+
+def ranking_metrics(recommended, relevant, k):
+    """
+    Compute precision@K, recall@K and NDCG@K for one ranked list
+    
+    Args:
+        recommended: Ranked list of recommended item IDs
+        relevant: Set of item IDs the user actually interacted with
+        k: Cut-off rank
+    
+    Returns:
+        Tuple of (precision, recall, ndcg)
+    """
+    recommended = list(recommended)[:k]
+    hits = [1.0 if item_id in relevant else 0.0 for item_id in recommended]
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+    
+    dcg = float(np.dot(hits, discounts[:len(hits)]))
+    idcg = float(discounts[:min(len(relevant), k)].sum())
+    
+    precision = sum(hits) / k
+    recall = sum(hits) / len(relevant) if relevant else 0.0
+    ndcg = dcg / idcg if idcg else 0.0
+    return precision, recall, ndcg
+
+
+def latency_summary(samples):
+    """
+    Summarise per-request latencies
+    
+    Args:
+        samples: Latencies in seconds
+    
+    Returns:
+        Dictionary with count, mean and p50/p95/p99 in milliseconds
+    """
+    if not samples:
+        return {'count': 0}
+    
+    samples_ms = np.asarray(samples) * 1000
+    p50, p95, p99 = np.percentile(samples_ms, [50, 95, 99])
+    return {
+        'count': len(samples_ms),
+        'mean_ms': round(float(samples_ms.mean()), 3),
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+    }
+
+
+def directory_size(directory):
+    """
+    Total size in bytes of all files under a directory
+    
+    Files removed while the directory is walked (e.g. a model version being
+    pruned) are skipped.
+    """
+    size = 0
+    for root, _, files in os.walk(directory):
+        for filename in files:
+            try:
+                size += os.path.getsize(os.path.join(root, filename))
+            except OSError:
+                continue
+    return size
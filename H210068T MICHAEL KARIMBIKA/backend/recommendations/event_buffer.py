@@ -0,0 +1,183 @@
+import atexit
+import threading
+from collections import deque
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+class InteractionEventBuffer:
+    """
+    In-process buffer of view and cart events, batch-written to UserProductInteraction
+    
+    record() only appends to a deque, so request paths never wait for the database.
+    A daemon thread, started by the first event, flushes the buffer every
+    `flush_interval` seconds or as soon as `batch_size` events are waiting, and
+    the remaining events are flushed when the process exits. Events of a failed
+    flush are dropped (and logged), and while flushes keep failing only the newest
+    `max_pending` events are kept.
+    
+    Events are increments: a flush adds the summed values of each user, product
+    and type to the stored interaction, so repeated views count up.
+    
+    Events only live in memory until they are flushed, so a worker that is killed
+    (SIGKILL, out of memory, crash) loses up to `flush_interval` seconds or
+    `batch_size` events; atexit only covers a normal shutdown. That is the price of
+    keeping inserts off the request path, and is acceptable for implicit signals
+    that the model sees in aggregate. Interactions that must not be lost (reviews,
+    purchases) are synced from their own tables instead.
+    """
+    def __init__(self, flush_interval=None, batch_size=None, max_pending=None):
+        if flush_interval is None:
+            flush_interval = getattr(settings, 'RECOMMENDER_EVENT_FLUSH_INTERVAL', 5)
+        if batch_size is None:
+            batch_size = getattr(settings, 'RECOMMENDER_EVENT_BATCH_SIZE', 1000)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.enabled = getattr(settings, 'RECOMMENDER_CAPTURE_EVENTS', True)
+        
+        # (user_id, product_id, interaction_type, value) tuples, oldest first
+        self._events = deque(maxlen=max_pending or batch_size * 100)
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+    
+    def record(self, user_id, product_id, interaction_type, value=1.0):
+        """
+        Queue an interaction event
+        
+        Args:
+            user_id: User ID
+            product_id: Product ID
+            interaction_type: 'view' or 'cart'
+            value: Amount added to the interaction's value (1 per view, quantity added to the cart)
+        """
+        if not self.enabled:
+            return
+        self._events.append((user_id, product_id, interaction_type, float(value)))
+        self._ensure_started()
+        if len(self._events) >= self.batch_size:
+            self._wakeup.set()
+    
+    def _ensure_started(self):
+        """Start the flusher thread in this process (after any fork by the server)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='interaction-event-flusher', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+    
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            
+            # This thread holds its own database connection
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing interaction events: {e}")
+            finally:
+                close_old_connections()
+    
+    def flush(self):
+        """
+        Add all queued events to the stored interactions with bulk upserts
+        
+        Returns:
+            Number of interactions written
+        """
+        from .models import UserProductInteraction
+        from .ml_models import recommendation_cache
+        from products.models import Product
+        
+        with self._flush_lock:
+            # Sum repeated events
+            totals = {}
+            while self._events:
+                user_id, product_id, interaction_type, value = self._events.popleft()
+                key = (user_id, product_id, interaction_type)
+                totals[key] = totals.get(key, 0.0) + value
+            if not totals:
+                return 0
+            
+            # Skip users and products deleted since the events were recorded
+            user_ids = set(get_user_model().objects.filter(
+                id__in={user_id for user_id, _, _ in totals}
+            ).values_list('id', flat=True))
+            product_ids = set(Product.objects.filter(
+                id__in={product_id for _, product_id, _ in totals}
+            ).values_list('id', flat=True))
+            # Sorted, so concurrent flushes take their row locks in the same order
+            totals = {
+                key: totals[key] for key in sorted(totals) if key[0] in user_ids and key[1] in product_ids
+            }
+            keys = list(totals)
+            
+            with transaction.atomic():
+                # Create missing rows, then lock exactly the flushed rows, so that
+                # concurrent flushes by other workers add up instead of overwriting
+                # each other without blocking writes to any other interaction
+                UserProductInteraction.objects.bulk_create(
+                    [
+                        UserProductInteraction(
+                            user_id=user_id, product_id=product_id, interaction_type=interaction_type, value=0
+                        )
+                        for user_id, product_id, interaction_type in keys
+                    ],
+                    batch_size=self.batch_size,
+                    ignore_conflicts=True,
+                )
+                stored = {}
+                max_query_params = connection.features.max_query_params
+                lock_batch_size = min(self.batch_size, max_query_params // 3) if max_query_params else self.batch_size
+                for start in range(0, len(keys), lock_batch_size):
+                    condition = Q()
+                    for user_id, product_id, interaction_type in keys[start:start + lock_batch_size]:
+                        condition |= Q(user_id=user_id, product_id=product_id, interaction_type=interaction_type)
+                    locked = UserProductInteraction.objects.select_for_update().filter(condition).order_by(
+                        'user_id', 'product_id', 'interaction_type'
+                    ).values_list('user_id', 'product_id', 'interaction_type', 'value')
+                    stored.update(
+                        ((user_id, product_id, interaction_type), value)
+                        for user_id, product_id, interaction_type, value in locked
+                    )
+                
+                # bulk_create does not apply auto_now to updated rows
+                now = timezone.now()
+                rows = [
+                    UserProductInteraction(
+                        user_id=user_id, product_id=product_id, interaction_type=interaction_type,
+                        value=stored.get((user_id, product_id, interaction_type), 0) + value, updated_at=now,
+                    )
+                    for (user_id, product_id, interaction_type), value in totals.items()
+                ]
+                UserProductInteraction.objects.bulk_create(
+                    rows,
+                    batch_size=self.batch_size,
+                    update_conflicts=True,
+                    unique_fields=['user', 'product', 'interaction_type'],
+                    update_fields=['value', 'updated_at'],
+                )
+                
+                # The users' cached recommendations are stale once the rows are committed
+                written_user_ids = sorted({row.user_id for row in rows})
+                transaction.on_commit(lambda: recommendation_cache.invalidate_many(written_user_ids))
+        
+        logger.info(f"Flushed {len(rows)} interaction events")
+        return len(rows)
+
+
+# View and cart events recorded by this process
+interaction_events = InteractionEventBuffer()
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from recommendations.ann_index import IVFIndex, benchmark_index
+from recommendations.ml_models import model_registry
+import numpy as np
+import time
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the approximate similar-product index against exact cosine search'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=['cf', 'cb'], default='cb',
+                            help='Feature matrix to index: CF item factors or content features')
+        parser.add_argument('--synthetic', type=int, default=0,
+                            help='Benchmark on N random items instead of the trained model')
+        parser.add_argument('--dims', type=int, default=50,
+                            help='Feature dimensions for synthetic items')
+        parser.add_argument('--n-lists', type=int, default=None,
+                            help='Number of IVF cells (default: sqrt of the item count)')
+        parser.add_argument('--n-probe', type=int, nargs='+', default=[1, 4, 8, 16],
+                            help='Cells probed per query; one benchmark row per value')
+        parser.add_argument('--k', type=int, default=10, help='Neighbours per query (recall@K)')
+        parser.add_argument('--queries', type=int, default=1000, help='Number of queries')
+    
+    def handle(self, *args, **options):
+        if options['synthetic']:
+            # Clustered random items, closer to real embeddings than isotropic noise
+            rng = np.random.default_rng(42)
+            centers = rng.standard_normal((max(options['synthetic'] // 100, 1), options['dims']))
+            assignments = rng.integers(len(centers), size=options['synthetic'])
+            noise = rng.standard_normal((options['synthetic'], options['dims']))
+            features = (centers[assignments] + 0.5 * noise).astype(np.float32)
+        else:
+            recommender = model_registry.get()
+            if recommender is None:
+                raise CommandError('No trained recommendation model found')
+            if options['model'] == 'cf':
+                features = recommender.cf_model.item_features
+            else:
+                features = recommender.cb_model.product_features
+        
+        start = time.perf_counter()
+        index = IVFIndex(n_lists=options['n_lists']).build(features)
+        build_seconds = time.perf_counter() - start
+        self.stdout.write(f'Built index over {len(features)} items in {build_seconds:.2f}s')
+        
+        for n_probe in options['n_probe']:
+            index.n_probe = n_probe
+            result = benchmark_index(features, index, n=options['k'], n_queries=options['queries'])
+            self.stdout.write(
+                f"n_probe={result['n_probe']:<4} "
+                f"recall@{result['k']}={result['recall_at_k']:.3f} "
+                f"ann_qps={result['ann_qps']:.0f} "
+                f"exact_qps={result['exact_qps']:.0f}"
+            )
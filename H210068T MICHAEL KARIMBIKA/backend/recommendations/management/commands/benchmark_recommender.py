@@ -0,0 +1,239 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from products.models import Product
+from recommendations.models import UserProductInteraction
+from recommendations.ml_models import HybridRecommender, load_interactions_dataframe, load_products_dataframe
+from recommendations.evaluation import ranking_metrics, latency_summary, directory_size
+from recommendations.thread_budget import limit_threads, training_threads, SERVING_THREADS
+from collections import defaultdict
+from datetime import datetime
+import numpy as np
+import json
+import tempfile
+import time
+import tracemalloc
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks recommendation quality and speed on a time-based train/test split, printing JSON'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--k', type=int, default=10, help='Cut-off rank for precision/recall/NDCG')
+        parser.add_argument('--test-fraction', type=float, default=0.2,
+                            help='Fraction of interactions (the most recent) held out for testing')
+        parser.add_argument('--max-users', type=int, default=1000,
+                            help='Maximum number of test users evaluated')
+        parser.add_argument('--queries', type=int, default=1000,
+                            help='Number of similar-item queries timed')
+        parser.add_argument('--seed', type=int, default=42, help='Seed for sampling users and products')
+        parser.add_argument('--blas-threads', type=int, default=None,
+                            help='BLAS/OpenMP threads while timing requests (default: RECOMMENDER_SERVING_THREADS)')
+        parser.add_argument('--output', default=None, help='Write the JSON report to this file instead of stdout')
+    
+    def handle(self, *args, **options):
+        k = options['k']
+        rng = np.random.default_rng(options['seed'])
+        
+        # Split interactions by time: everything from the cutoff onwards is the test set
+        interactions = UserProductInteraction.objects.all()
+        total = interactions.count()
+        cutoff_index = int(total * (1 - options['test_fraction']))
+        if total == 0 or cutoff_index in (0, total):
+            raise CommandError('Not enough interactions for a train/test split')
+        cutoff = interactions.order_by('created_at').values_list('created_at', flat=True)[cutoff_index]
+        
+        train_interactions = interactions.filter(created_at__lt=cutoff)
+        test_interactions = interactions.filter(created_at__gte=cutoff)
+        
+        interactions_df = load_interactions_dataframe(train_interactions)
+        products_df = load_products_dataframe(Product.objects.all())
+        if interactions_df.empty:
+            raise CommandError('All interactions share the same timestamp; no training data before the cutoff')
+        
+        # Train, tracking wall time and peak traced (Python and numpy) memory
+        recommender = HybridRecommender(
+            n_neighbours=getattr(settings, 'RECOMMENDER_NEIGHBOURS', 50),
+            ann_min_items=getattr(settings, 'RECOMMENDER_ANN_MIN_ITEMS', None),
+            ann_n_probe=getattr(settings, 'RECOMMENDER_ANN_N_PROBE', 8),
+        )
+        phase_times = {}
+        current_phase = [None, None]
+        
+        def on_phase(phase):
+            now = time.perf_counter()
+            if current_phase[0] is not None:
+                phase_times[current_phase[0]] = now - current_phase[1]
+            current_phase[:] = [phase, now]
+        
+        tracemalloc.start()
+        start = time.perf_counter()
+        with training_threads():
+            recommender.fit(interactions_df, products_df, on_phase=on_phase)
+        training_seconds = time.perf_counter() - start
+        on_phase('done')
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        
+        # Artifact sizes in both formats
+        artifacts = {}
+        for artifact_format in ('joblib', 'npy'):
+            with tempfile.TemporaryDirectory() as directory:
+                if artifact_format == 'npy':
+                    recommender.save_arrays(directory)
+                else:
+                    recommender.save(directory)
+                artifacts[f'{artifact_format}_mb'] = round(directory_size(directory) / (1024 * 1024), 3)
+        
+        # Held-out items per user: only new items for users the model was trained on
+        train_items = defaultdict(set)
+        for user_id, product_id in zip(interactions_df['user_id'], interactions_df['product_id']):
+            train_items[int(user_id)].add(int(product_id))
+        
+        relevant_items = defaultdict(set)
+        for user_id, product_id in test_interactions.values_list('user_id', 'product_id').iterator():
+            if user_id in train_items and product_id not in train_items[user_id]:
+                relevant_items[user_id].add(product_id)
+        
+        test_users = sorted(relevant_items)
+        if len(test_users) > options['max_users']:
+            test_users = sorted(rng.choice(test_users, options['max_users'], replace=False).tolist())
+        
+        # Requests are scored under the serving thread budget (or --blas-threads)
+        with limit_threads(options['blas_threads'] or SERVING_THREADS):
+            # Score each path for quality and time every request
+            paths = {
+                'cf': lambda user_id, profile, exclude: recommender.cf_model.recommend_for_user(
+                    user_id, n=k, exclude_items=exclude
+                ),
+                'cb': lambda user_id, profile, exclude: recommender.cb_model.recommend_for_user_profile(
+                    profile, n=k, exclude_items=exclude
+                ),
+                'hybrid': lambda user_id, profile, exclude: recommender.recommend_for_user(
+                    user_id, user_profile=profile, n=k, exclude_items=exclude,
+                    current_month=datetime.now().month, hemisphere='N'
+                ),
+            }
+            quality = {}
+            latency = {}
+            
+            for name, recommend in paths.items():
+                scores = []
+                samples = []
+                for user_id in test_users:
+                    exclude = list(train_items[user_id])
+                    profile = {'liked_categories': [], 'liked_products': exclude}
+                    
+                    start = time.perf_counter()
+                    recommendations = recommend(user_id, profile, exclude)
+                    samples.append(time.perf_counter() - start)
+                    
+                    scores.append(ranking_metrics(
+                        [item_id for item_id, _ in recommendations], relevant_items[user_id], k
+                    ))
+                
+                precision, recall, ndcg = np.mean(scores, axis=0) if scores else (0.0, 0.0, 0.0)
+                quality[name] = {
+                    f'precision_at_{k}': round(float(precision), 4),
+                    f'recall_at_{k}': round(float(recall), 4),
+                    f'ndcg_at_{k}': round(float(ndcg), 4),
+                }
+                latency[f'{name}.recommend_for_user'] = latency_summary(samples)
+            
+            # Time similar-item lookups on random catalog products
+            product_ids = products_df['id'].to_numpy()
+            query_ids = rng.choice(product_ids, min(options['queries'], len(product_ids)), replace=False)
+            for name, model in (('cf', recommender.cf_model), ('cb', recommender.cb_model), ('hybrid', recommender)):
+                samples = []
+                for product_id in query_ids.tolist():
+                    start = time.perf_counter()
+                    model.get_similar_items(product_id, n=k)
+                    samples.append(time.perf_counter() - start)
+                latency[f'{name}.get_similar_items'] = latency_summary(samples)
+        
+        compact = self._benchmark_compact(recommender, test_users, train_items, query_ids.tolist(), k)
+        
+        report = {
+            'created_at': datetime.now().isoformat(),
+            'dataset': {
+                'interactions': total,
+                'train_interactions': total - test_interactions.count(),
+                'users': int(interactions_df['user_id'].nunique()),
+                'products': len(products_df),
+                'test_users': len(test_users),
+                'cutoff': cutoff.isoformat(),
+            },
+            'training': {
+                'wall_seconds': round(training_seconds, 3),
+                'phase_seconds': {phase: round(seconds, 3) for phase, seconds in phase_times.items()},
+                'peak_traced_memory_mb': round(peak_memory / (1024 * 1024), 3),
+            },
+            'artifacts': artifacts,
+            'quality': quality,
+            'latency': latency,
+            'blas_threads': options['blas_threads'] or SERVING_THREADS,
+            'compact': compact,
+        }
+        
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Benchmark report written to {options['output']}"))
+        else:
+            self.stdout.write(output)
+    
+    def _benchmark_compact(self, recommender, test_users, train_items, query_ids, k):
+        """
+        Compare compact serving variants against the full precision model
+        
+        Returns:
+            Dictionary per variant with served array memory, npy artifact size and the
+            overlap@K of its results with the float64 results (1.0 = identical top K)
+        """
+        variants = {
+            'float64': (np.float64, False),
+            'float32': (np.float32, False),
+            'float32_int8_neighbours': (np.float32, True),
+        }
+        
+        def results(model):
+            similar = [
+                [item_id for item_id, _ in model.get_similar_items(product_id, n=k)]
+                for product_id in query_ids
+            ]
+            recommended = [
+                [item_id for item_id, _ in model.recommend_for_user(
+                    user_id, n=k, exclude_items=list(train_items[user_id]),
+                    current_month=datetime.now().month, hemisphere='N',
+                )]
+                for user_id in test_users
+            ]
+            return similar, recommended
+        
+        def overlap(baseline, lists):
+            hits = sum(len(set(expected) & set(actual)) for expected, actual in zip(baseline, lists))
+            total = sum(len(expected) for expected in baseline)
+            return round(hits / total, 4) if total else 1.0
+        
+        baseline = results(recommender)
+        compact = {}
+        for name, (dtype, quantize_neighbours) in variants.items():
+            # Start every variant from a fresh in-memory copy of the trained model
+            with tempfile.TemporaryDirectory() as directory:
+                params = recommender.save_arrays(directory)
+                variant = HybridRecommender.load_arrays(directory, params, mmap_mode=None)
+                variant.cb_model.get_pipeline()
+            variant.compact(dtype=dtype, quantize_neighbours=quantize_neighbours)
+            
+            with tempfile.TemporaryDirectory() as directory:
+                variant.save_arrays(directory)
+                artifact_size = directory_size(directory)
+            
+            similar, recommended = results(variant)
+            compact[name] = {
+                'memory_mb': round(sum(variant.memory_usage().values()) / (1024 * 1024), 3),
+                'npy_mb': round(artifact_size / (1024 * 1024), 3),
+                f'similar_items_overlap_at_{k}': overlap(baseline[0], similar),
+                f'recommend_overlap_at_{k}': overlap(baseline[1], recommended),
+            }
+        return compact
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from recommendations.ml_models import model_registry
+from recommendations.recommendation_engine import RecommendationEngine
+import time
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Precomputes hybrid recommendations for all users in chunks'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Users scored and written per chunk')
+        parser.add_argument('--limit', type=int, default=8,
+                            help='Recommendations stored per user')
+    
+    def handle(self, *args, **options):
+        if model_registry.get() is None:
+            raise CommandError('No trained recommendation model found, run training first')
+        
+        chunk_size = options['chunk_size']
+        start = time.perf_counter()
+        user_count = 0
+        row_count = 0
+        
+        user_ids = User.objects.order_by('id').values_list('id', flat=True).iterator(chunk_size=chunk_size)
+        chunk = []
+        for user_id in user_ids:
+            chunk.append(user_id)
+            if len(chunk) == chunk_size:
+                row_count += self._process_chunk(chunk, options['limit'])
+                user_count += len(chunk)
+                chunk = []
+        if chunk:
+            row_count += self._process_chunk(chunk, options['limit'])
+            user_count += len(chunk)
+        
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {row_count} recommendations for {user_count} users in {elapsed:.1f}s'
+        ))
+    
+    def _process_chunk(self, user_ids, limit):
+        _, row_count, _ = RecommendationEngine.refresh_recommendations(user_ids, limit)
+        return row_count
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from recommendations.recommendation_engine import RecommendationEngine
+import time
+
+
+class Command(BaseCommand):
+    help = 'Precomputes cold-start popular products per country, hemisphere and month (schedule e.g. nightly)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=100,
+                            help='Ranked products kept per segment')
+    
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = RecommendationEngine.refresh_popularity_segments(size=options['size'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f'Refreshed {count} popularity segments in {elapsed:.1f}s'))
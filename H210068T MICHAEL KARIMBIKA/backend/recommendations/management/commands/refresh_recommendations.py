@@ -0,0 +1,123 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, time as datetime_time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+import django
+import os
+import time
+
+# Worker processes may be spawned rather than forked, so this module only imports
+# Django models inside functions, after django.setup() has run
+
+
+def _init_worker():
+    """Prepare a pool worker: own database connection and the memory-mapped model"""
+    django.setup()
+    
+    # Connections inherited from a forked parent must not be shared with it
+    connections.close_all()
+    
+    # Load the current model version once per worker; the npy arrays are memory-mapped,
+    # so all workers share the same pages of the operating system's file cache
+    from recommendations.ml_models import model_registry
+    model_registry.get()
+
+
+def refresh_users(user_ids, limit=8):
+    """
+    Refresh the stored recommendations of a chunk of users (see RecommendationEngine.refresh_recommendations)
+    
+    Args:
+        user_ids: List of user IDs
+        limit: Recommendations stored per user
+    
+    Returns:
+        Tuple of (users refreshed, recommendations bulk-written, users sent to the fallback)
+    """
+    from recommendations.recommendation_engine import RecommendationEngine
+    
+    return RecommendationEngine.refresh_recommendations(user_ids, limit)
+
+
+class Command(BaseCommand):
+    help = 'Refreshes stored recommendations for all users (or recently active ones) with a process pool'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Worker processes (1 refreshes in this process)')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Users per task handed to a worker')
+        parser.add_argument('--limit', type=int, default=8,
+                            help='Recommendations stored per user')
+        parser.add_argument('--since',
+                            help='Only refresh users with interactions changed since this ISO date or datetime')
+    
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        workers = max(1, options['workers'] or 1)
+        user_ids = self._user_ids(self._parse_since(options['since']))
+        chunks = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+        
+        start = time.perf_counter()
+        user_count = row_count = fallback_count = 0
+        
+        if workers == 1 or len(chunks) <= 1:
+            results = (refresh_users(chunk, options['limit']) for chunk in chunks)
+            workers = 1
+        else:
+            # Workers open their own connections, so none is inherited mid-use
+            connections.close_all()
+            executor = ProcessPoolExecutor(max_workers=min(workers, len(chunks)), initializer=_init_worker)
+            futures = [executor.submit(refresh_users, chunk, options['limit']) for chunk in chunks]
+            results = (future.result() for future in as_completed(futures))
+        
+        try:
+            for chunk_users, chunk_rows, chunk_fallbacks in results:
+                user_count += chunk_users
+                row_count += chunk_rows
+                fallback_count += chunk_fallbacks
+                
+                if options['verbosity'] > 1:
+                    elapsed = time.perf_counter() - start
+                    self.stdout.write(f'{user_count}/{len(user_ids)} users ({user_count / elapsed:.1f} users/s)')
+        finally:
+            if workers > 1:
+                executor.shutdown(cancel_futures=True)
+        
+        elapsed = time.perf_counter() - start
+        rate = user_count / elapsed if elapsed else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f'Refreshed {user_count} users in {elapsed:.1f}s with {workers} workers ({rate:.1f} users/s); '
+            f'{row_count} model recommendations stored, {fallback_count} users via fallback'
+        ))
+    
+    @staticmethod
+    def _parse_since(value):
+        """Parse --since as an aware datetime (dates mean midnight), or None if not given"""
+        if value is None:
+            return None
+        
+        since = parse_datetime(value)
+        if since is None:
+            date = parse_date(value)
+            if date is None:
+                raise CommandError(f'Invalid --since value {value!r}, expected an ISO date or datetime')
+            since = datetime.combine(date, datetime_time.min)
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        return since
+    
+    @staticmethod
+    def _user_ids(since):
+        """IDs of the users to refresh, in ID order"""
+        from django.contrib.auth import get_user_model
+        from recommendations.models import UserProductInteraction
+        
+        if since is None:
+            return list(get_user_model().objects.order_by('id').values_list('id', flat=True))
+        return list(
+            UserProductInteraction.objects.filter(updated_at__gte=since)
+            .order_by('user_id').values_list('user_id', flat=True).distinct()
+        )
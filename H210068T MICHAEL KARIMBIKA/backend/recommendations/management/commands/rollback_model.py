@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from recommendations.ml_models import get_current_version, list_versions, read_manifest, rollback_recommender
+
+
+class Command(BaseCommand):
+    help = 'Lists published recommendation model versions or switches serving to an earlier one'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('version', nargs='?', default=None,
+                            help='Version to serve (default: the one before the current version)')
+        parser.add_argument('--list', action='store_true', help='List published versions and exit')
+    
+    def handle(self, *args, **options):
+        if options['list']:
+            current = get_current_version()
+            for version in reversed(list_versions()):
+                manifest = read_manifest(version) or {}
+                marker = '*' if version == current else ' '
+                self.stdout.write(f"{marker} {version}  {manifest.get('format')}  {manifest.get('created_at')}")
+            return
+        
+        version = rollback_recommender(options['version'])
+        if version is None:
+            raise CommandError('No matching earlier model version to roll back to')
+        
+        # Workers pick up the new pointer on their next reload check
+        self.stdout.write(self.style.SUCCESS(f'Now serving recommendation model version {version}'))
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0002_trainingjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PopularitySegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country', models.CharField(blank=True, max_length=100)),
+                ('hemisphere', models.CharField(choices=[('N', 'Northern'), ('S', 'Southern')], max_length=1)),
+                ('month', models.PositiveSmallIntegerField()),
+                ('products', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('country', 'hemisphere', 'month')},
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0003_popularitysegment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InteractionSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('review', 'Reviews'), ('purchase', 'Order items')], max_length=20, unique=True)),
+                ('synced_until', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
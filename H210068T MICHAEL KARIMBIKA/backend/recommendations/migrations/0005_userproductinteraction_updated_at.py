@@ -0,0 +1,27 @@
+# Generated by Django 5.1.6 on 2026-10-18 15:20
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def copy_created_at(apps, schema_editor):
+    # When existing interactions last changed is unknown, so --since keeps matching their creation
+    UserProductInteraction = apps.get_model('recommendations', 'UserProductInteraction')
+    UserProductInteraction.objects.update(updated_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0004_interactionsyncstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userproductinteraction',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+    ]
@@ -1,18 +1,37 @@
 import os
 import numpy as np
 import pandas as pd
+from scipy import sparse
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.decomposition import TruncatedSVD
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import MinMaxScaler
+import copy
 import joblib
-from datetime import datetime
+import json
+import shutil
+from contextlib import contextmanager
+from datetime import datetime, timezone
 import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from itertools import islice
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
 from django.conf import settings
+from django.core.cache import caches
 from django.db.models import Count, Avg, Q
 from products.models import Product, Category, Review
 from .models import UserProductInteraction, ProductSimilarity
+from .ann_index import IVFIndex, normalize_rows, top_k, top_k_rows
+from .thread_budget import serving_threads, training_threads, current_threads
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -21,18 +40,325 @@ logger = logging.getLogger(__name__)
 MODELS_DIR = os.path.join(settings.BASE_DIR, 'models')
 os.makedirs(MODELS_DIR, exist_ok=True)
 
+# Lock file held by whichever process is training, so concurrent model misses start a single run
+TRAINING_LOCK_PATH = os.path.join(MODELS_DIR, 'training.lock')
+
+# Open descriptor of the lock file while this process holds the training lock
+_training_lock_guard = threading.Lock()
+_training_lock_fd = None
+
+# Popular products served while no model is available: ranked candidate IDs per
+# category (None = whole catalog), recomputed per process at most every TTL seconds
+POPULAR_PRODUCTS_TTL = getattr(settings, 'RECOMMENDER_POPULAR_PRODUCTS_TTL', 300)
+POPULAR_PRODUCTS_POOL = 100
+_popular_products_lock = threading.Lock()
+_popular_products = {}
+
+# Fallback training job queued by this process when no model could be loaded
+_fallback_training_lock = threading.Lock()
+_fallback_training_job_id = None
+
+# Interaction weights: reviews (5x), purchases (3x), cart additions (2x), views (1x)
+INTERACTION_WEIGHTS = {'review': 5, 'purchase': 3, 'cart': 2, 'view': 1}
+
+# Product season masks: one bit per (hemisphere, month); products without seasons are always in season
+HEMISPHERES = ('N', 'S')
+ALL_SEASONS_MASK = (1 << (12 * len(HEMISPHERES))) - 1
+
+# On-disk artifact format: 'joblib' pickles, or 'npy' memory-mapped arrays shared by all workers
+ARTIFACT_FORMAT = getattr(settings, 'RECOMMENDER_ARTIFACT_FORMAT', 'joblib')
+
+# Versioned model store: every save publishes a new hybrid-<sequence>-<UTC timestamp>
+# directory with a manifest.json, and the `current` pointer file names the version that
+# is served. Versions are ordered by their sequence number, never by wall-clock time
+CURRENT_POINTER = os.path.join(MODELS_DIR, 'current')
+MODEL_STORE_LOCK_PATH = os.path.join(MODELS_DIR, 'store.lock')
+
+# Lock serialising incremental content updates across processes, so each one is built
+# from the version the previous one published
+CONTENT_UPDATE_LOCK_PATH = os.path.join(MODELS_DIR, 'content_update.lock')
+KEEP_VERSIONS = getattr(settings, 'RECOMMENDER_KEEP_VERSIONS', 3)
+ARRAYS_FORMAT_VERSION = 4
+
+# Relative spread below which scores are rounding noise (float32 artifacts carry ~1e-7)
+SCORE_TOLERANCE = 1e-6
+
+# Users scored per matrix multiply when recommending for several users
+SCORING_BLOCK_SIZE = getattr(settings, 'RECOMMENDER_SCORING_BLOCK_SIZE', 128)
+
+
+def save_array(directory, name, array):
+    """Save one array as <directory>/<name>.npy"""
+    np.save(os.path.join(directory, f'{name}.npy'), np.ascontiguousarray(array))
+
+
+def load_array(directory, name, mmap_mode='r'):
+    """Load <directory>/<name>.npy, memory-mapped read-only by default"""
+    return np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+
+
+def normalize_scores(scores, mask, tolerance=SCORE_TOLERANCE):
+    """
+    Min-max scale the masked entries of a score vector to [0, 1]
+    
+    A spread within `tolerance` of the scores' magnitude (at least 1) is rounding
+    noise, e.g. the CF scores of a user with no usable interactions, and is not
+    stretched to [0, 1]: such scores count as constant.
+    
+    Args:
+        scores: 1-D array of scores
+        mask: Boolean array selecting the entries to scale
+        tolerance: Relative spread below which the masked scores count as constant
+        
+    Returns:
+        Float array with the scaled scores under the mask and 0 elsewhere
+        (constant masked scores also map to 0)
+    """
+    return normalize_score_rows(np.asarray(scores)[np.newaxis], np.asarray(mask)[np.newaxis], tolerance)[0]
+
+
+def normalize_score_rows(scores, mask, tolerance=SCORE_TOLERANCE):
+    """
+    Min-max scale the masked entries of every row of a score matrix to [0, 1] (see normalize_scores)
+    
+    Args:
+        scores: 2-D array of scores
+        mask: Boolean array of the same shape selecting the entries to scale
+        tolerance: Relative spread below which a row's masked scores count as constant
+        
+    Returns:
+        Float array with the scaled scores under the mask and 0 elsewhere
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    normalized = np.zeros(scores.shape)
+    
+    low = np.where(mask, scores, np.inf).min(axis=1)
+    high = np.where(mask, scores, -np.inf).max(axis=1)
+    rows = np.flatnonzero(mask.any(axis=1))
+    low, high = low[rows], high[rows]
+    spread = high - low
+    scaled = spread > tolerance * np.maximum(np.maximum(np.abs(high), np.abs(low)), 1.0)
+    rows, low, spread = rows[scaled], low[scaled], spread[scaled]
+    
+    normalized[rows] = np.where(mask[rows], (scores[rows] - low[:, np.newaxis]) / spread[:, np.newaxis], 0.0)
+    return normalized
+
+
+def season_bit(month, hemisphere):
+    """Bit of a product season mask for a month (1-12) in a hemisphere ('N' or 'S')"""
+    return HEMISPHERES.index(hemisphere) * 12 + month - 1
+
+
+def season_mask(start_month, end_month, hemisphere):
+    """
+    Bitmask of the (hemisphere, month) pairs a season covers
+    
+    Args:
+        start_month: First month of the season (1-12)
+        end_month: Last month of the season; seasons may span the year end
+        hemisphere: 'N', 'S' or 'B' (both)
+    """
+    if start_month <= end_month:
+        months = range(start_month, end_month + 1)
+    else:
+        months = list(range(start_month, 13)) + list(range(1, end_month + 1))
+    
+    mask = 0
+    for code in HEMISPHERES:
+        if hemisphere in (code, 'B'):
+            for month in months:
+                mask |= 1 << season_bit(month, code)
+    return mask
+
+
+def build_availability_index(code_lists, n_rows=None):
+    """
+    Build a product x code availability matrix (e.g. countries or regions)
+    
+    Args:
+        code_lists: One list of codes per product row
+        n_rows: Number of rows (defaults to len(code_lists))
+        
+    Returns:
+        Tuple of (codes, index): the sorted list of codes and a boolean CSC matrix
+        whose column for a code lists the rows of the products available there
+    """
+    codes = sorted({code for code_list in code_lists for code in code_list})
+    columns = {code: i for i, code in enumerate(codes)}
+    rows = [row for row, code_list in enumerate(code_lists) for _ in code_list]
+    cols = [columns[code] for code_list in code_lists for code in code_list]
+    index = sparse.csc_matrix(
+        (np.ones(len(rows), dtype=bool), (rows, cols)),
+        shape=(n_rows if n_rows is not None else len(code_lists), len(codes)),
+    )
+    return codes, index
+
+
+def availability_code_lists(codes, index):
+    """Invert build_availability_index: the list of codes of every row"""
+    index = index.tocsr()
+    return [[codes[col] for col in index.indices[index.indptr[row]:index.indptr[row + 1]]] for row in range(index.shape[0])]
+
+
+def sorted_positions(sorted_ids, keys):
+    """
+    Positions of keys in a sorted ID array, without building a Python dict over it
+    
+    Args:
+        sorted_ids: Ascending array of unique IDs (may be memory-mapped)
+        keys: ID or IDs to look up
+        
+    Returns:
+        Array of positions aligned with keys, -1 for keys that are not in sorted_ids
+    """
+    keys = np.atleast_1d(np.asarray(keys, dtype=np.int64))
+    if not len(sorted_ids):
+        return np.full(len(keys), -1, dtype=np.int64)
+    
+    positions = np.minimum(np.searchsorted(sorted_ids, keys), len(sorted_ids) - 1)
+    return np.where(sorted_ids[positions] == keys, positions, -1)
+
+
+def available_rows(codes, index, code):
+    """Rows of the products available for a code (empty if the code is unknown)"""
+    try:
+        col = codes.index(code)
+    except ValueError:
+        return np.array([], dtype=np.int32)
+    return index.indices[index.indptr[col]:index.indptr[col + 1]]
+
+
+def build_neighbour_table(features, k=50, block_size=1024):
+    """
+    Build a per-item top-K cosine similarity neighbour table
+    
+    Similarities are computed for `block_size` rows at a time, so peak memory is
+    block_size x n_items instead of n_items x n_items.
+    
+    Args:
+        features: Array or scipy sparse matrix of shape (n_items, n_features);
+            sparse features (e.g. item x user interactions) are never densified
+        k: Number of neighbours to keep per item
+        block_size: Number of items scored per block
+        
+    Returns:
+        Tuple of (indices, scores) arrays of shape (n_items, k), int32 and float32,
+        sorted by descending similarity and never containing the item itself
+    """
+    if sparse.issparse(features):
+        features = sparse.csr_matrix(features, dtype=np.float32)
+    else:
+        features = np.asarray(features, dtype=np.float32)
+    n_items = features.shape[0]
+    k = max(min(k, n_items - 1), 0)
+    
+    indices = np.empty((n_items, k), dtype=np.int32)
+    scores = np.empty((n_items, k), dtype=np.float32)
+    if k == 0:
+        return indices, scores
+    
+    # Normalise rows so that dot products are cosine similarities
+    if sparse.issparse(features):
+        norms = np.sqrt(np.asarray(features.multiply(features).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        normalized = sparse.csr_matrix(sparse.diags(1 / norms) @ features)
+    else:
+        norms = np.linalg.norm(features, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        normalized = features / norms
+    
+    for start in range(0, n_items, block_size):
+        stop = min(start + block_size, n_items)
+        block = normalized[start:stop] @ normalized.T
+        if sparse.issparse(block):
+            block = block.toarray()
+        
+        # An item is never its own neighbour
+        block[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+        
+        # Select the top k per row, then sort only those k
+        top = np.argpartition(block, -k, axis=1)[:, -k:]
+        top_scores = np.take_along_axis(block, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        indices[start:stop] = np.take_along_axis(top, order, axis=1)
+        scores[start:stop] = np.take_along_axis(top_scores, order, axis=1)
+    
+    return indices, scores
+
+
+def quantize_rows(scores):
+    """
+    Quantise a score table to int8 with one float32 scale per row
+    
+    Each row is scaled so that its largest absolute score maps to 127. Non-finite
+    scores (padding in a partly filled table) are stored as -128.
+    
+    Args:
+        scores: Array of shape (n_rows, n_columns)
+        
+    Returns:
+        Tuple of (codes, scales): an int8 array shaped like scores and a float32
+        array of shape (n_rows,), see dequantize_rows
+    """
+    scores = np.asarray(scores, dtype=np.float32)
+    finite = np.isfinite(scores)
+    values = np.where(finite, scores, 0)
+    
+    scales = np.abs(values).max(axis=1) / 127 if values.shape[1] else np.zeros(len(values), dtype=np.float32)
+    scales[scales == 0] = 1
+    
+    codes = np.clip(np.round(values / scales[:, None]), -127, 127).astype(np.int8)
+    codes[~finite] = -128
+    return codes, scales.astype(np.float32)
+
+
+def dequantize_rows(codes, scales):
+    """Invert quantize_rows: float32 scores from int8 codes and per-row scales"""
+    scores = codes.astype(np.float32) * np.asarray(scales, dtype=np.float32)[:, None]
+    scores[codes == -128] = -np.inf
+    return scores
+
+
+def neighbour_row_scores(scores, scales, row, n):
+    """First n scores of a neighbour table row, dequantised if the table is int8 (scales is not None)"""
+    if scales is None:
+        return scores[row, :n]
+    return dequantize_rows(scores[row:row + 1, :n], scales[row:row + 1])[0]
+
+
 class CollaborativeFilteringModel:
     """
     Collaborative filtering model using matrix factorization (SVD)
     """
-    def __init__(self, n_components=10):
+    def __init__(self, n_components=10, n_neighbours=50, fold_in_cache_size=10000):
         self.n_components = n_components
+        self.n_neighbours = n_neighbours
         self.model = TruncatedSVD(n_components=n_components, random_state=42)
         self.user_item_matrix = None
-        self.user_mapping = {}
-        self.item_mapping = {}
-        self.reverse_user_mapping = {}
-        self.reverse_item_mapping = {}
+        self.item_features = None
+        self.neighbour_indices = None
+        self.neighbour_scores = None
+        self.neighbour_score_scales = None
+        self.ann_index = None
+        
+        # Folded-in users: user_id -> (signature, latent vector, interacted item indices), least recently used first
+        self.fold_in_cache_size = fold_in_cache_size
+        self.user_factors_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        
+        # Sorted (np.unique) IDs of the matrix rows and columns, looked up with searchsorted
+        self.user_ids = np.array([], dtype=np.int64)
+        self.item_ids = np.array([], dtype=np.int64)
+    
+    def user_index(self, user_id):
+        """Matrix row of a user, or None if the user is not in the training data"""
+        position = int(sorted_positions(self.user_ids, user_id)[0])
+        return position if position >= 0 else None
+    
+    def item_index(self, item_id):
+        """Matrix column of an item, or None if the item is not in the training data"""
+        position = int(sorted_positions(self.item_ids, item_id)[0])
+        return position if position >= 0 else None
     
     def fit(self, interactions_df):
         """
@@ -41,25 +367,25 @@ class CollaborativeFilteringModel:
         Args:
             interactions_df: DataFrame with columns 'user_id', 'product_id', 'value'
         """
-        # Create user-item matrix
-        self.user_item_matrix = interactions_df.pivot(
-            index='user_id', 
-            columns='product_id', 
-            values='value'
-        ).fillna(0)
-        
-        # Create mappings between original IDs and matrix indices
-        self.user_mapping = {user_id: i for i, user_id in enumerate(self.user_item_matrix.index)}
-        self.item_mapping = {item_id: i for i, item_id in enumerate(self.user_item_matrix.columns)}
-        self.reverse_user_mapping = {i: user_id for user_id, i in self.user_mapping.items()}
-        self.reverse_item_mapping = {i: item_id for item_id, i in self.item_mapping.items()}
+        # Map original IDs to contiguous matrix indices
+        self.user_ids, user_indices = np.unique(interactions_df['user_id'].to_numpy(dtype=np.int64), return_inverse=True)
+        self.item_ids, item_indices = np.unique(interactions_df['product_id'].to_numpy(dtype=np.int64), return_inverse=True)
+        
+        # Create sparse user-item matrix (duplicate user/item pairs are summed)
+        self.user_item_matrix = sparse.csr_matrix(
+            (interactions_df['value'].to_numpy(dtype=np.float64), (user_indices, item_indices)),
+            shape=(len(self.user_ids), len(self.item_ids)),
+        )
+        self.user_item_matrix.sum_duplicates()
         
-        # Fit the model
-        self.model.fit(self.user_item_matrix.values)
+        # Fit the model directly on the sparse matrix
+        self.model.fit(self.user_item_matrix)
         
-        # Calculate item-item similarity matrix
+        # Calculate top-K item-item neighbour table
         self.item_features = self.model.components_.T
-        self.item_similarity = cosine_similarity(self.item_features)
+        self.neighbour_indices, self.neighbour_scores = build_neighbour_table(
+            self.item_features, k=self.n_neighbours
+        )
         
         return self
     
@@ -74,17 +400,142 @@ class CollaborativeFilteringModel:
         Returns:
             List of (item_id, similarity_score) tuples
         """
-        if item_id not in self.item_mapping:
+        item_idx = self.item_index(item_id)
+        if item_idx is None:
             return []
         
-        item_idx = self.item_mapping[item_id]
-        similar_indices = np.argsort(self.item_similarity[item_idx])[::-1][1:n+1]
+        if self.ann_index is not None:
+            similar_indices, similar_scores = self.ann_index.query_item(item_idx, n=n)
+        else:
+            similar_indices = self.neighbour_indices[item_idx, :n]
+            similar_scores = neighbour_row_scores(self.neighbour_scores, self.neighbour_score_scales, item_idx, n)
         
         return [
-            (self.reverse_item_mapping[idx], self.item_similarity[item_idx][idx]) 
-            for idx in similar_indices
+            (int(self.item_ids[idx]), float(score)) 
+            for idx, score in zip(similar_indices, similar_scores)
         ]
     
+    def compact(self, dtype=np.float32, quantize_neighbours=False):
+        """
+        Shrink the served arrays
+        
+        Args:
+            dtype: Float dtype for the item factors and the interaction matrix
+            quantize_neighbours: Store neighbour scores as int8 with per-row scales
+        """
+        self.model.components_ = self.model.components_.astype(dtype)
+        self.item_features = self.model.components_.T
+        self.user_item_matrix = self.user_item_matrix.astype(dtype)
+        if quantize_neighbours and self.neighbour_score_scales is None:
+            self.neighbour_scores, self.neighbour_score_scales = quantize_rows(self.neighbour_scores)
+        return self
+    
+    def fold_in_user(self, user_id, item_ids, values, signature=None):
+        """
+        Project a user's current interactions into the latent space without retraining
+        
+        The latent vector is cached for the user and used by recommend_for_user,
+        so new users and fresh interactions are reflected immediately.
+        
+        Args:
+            user_id: User ID
+            item_ids: Product IDs the user interacted with
+            values: Weighted interaction values, aligned with item_ids
+            signature: Optional fingerprint of the interactions; if it matches the
+                cached one, the cached vector is returned without recomputing
+            
+        Returns:
+            Latent user vector of shape (n_components,)
+        """
+        with self._cache_lock:
+            cached = self.user_factors_cache.get(user_id)
+            if cached is not None and signature is not None and cached[0] == signature:
+                self.user_factors_cache.move_to_end(user_id)
+                return cached[1]
+        
+        # Items unknown to the model carry no collaborative signal
+        positions = sorted_positions(self.item_ids, item_ids)
+        known = positions >= 0
+        item_indices = positions[known]
+        item_values = np.asarray(values, dtype=np.float64).reshape(-1)[known]
+        
+        # Sparse fold-in: user_vector @ components_.T over the interacted columns only
+        user_factors = self.model.components_[:, item_indices] @ item_values
+        
+        with self._cache_lock:
+            self.user_factors_cache[user_id] = (signature, user_factors, item_indices)
+            self.user_factors_cache.move_to_end(user_id)
+            while len(self.user_factors_cache) > self.fold_in_cache_size:
+                self.user_factors_cache.popitem(last=False)
+        
+        return user_factors
+    
+    def score_user(self, user_id):
+        """
+        Score every item for a user
+        
+        Uses the user's folded-in latent vector if one is cached, otherwise the
+        user's row of the training matrix.
+        
+        Args:
+            user_id: User ID
+            
+        Returns:
+            Tuple of (scores, interacted) arrays aligned with item_ids, where
+            interacted marks the items the user already interacted with, or
+            (None, None) if the user is neither folded in nor in the training data
+        """
+        scores, interacted, known = self.score_users([user_id])
+        if not known[0]:
+            return None, None
+        return scores[0], interacted[0]
+    
+    def score_users(self, user_ids):
+        """
+        Score every item for several users with one matrix-matrix multiply
+        
+        Each user is scored from their folded-in latent vector if one is cached,
+        otherwise from their row of the training matrix.
+        
+        Args:
+            user_ids: List of user IDs
+            
+        Returns:
+            Tuple of (scores, interacted, known): scores and interacted have one row
+            per user aligned with item_ids, interacted marking the items the user
+            already interacted with; known marks the users that are folded in or in
+            the training data (the rows of the others are all zero)
+        """
+        components = self.model.components_
+        factors = np.zeros((len(user_ids), components.shape[0]))
+        interacted = np.zeros((len(user_ids), len(self.item_ids)), dtype=bool)
+        known = np.zeros(len(user_ids), dtype=bool)
+        
+        with self._cache_lock:
+            cached = [self.user_factors_cache.get(user_id) for user_id in user_ids]
+        
+        # Folded-in latent vectors
+        for row, entry in enumerate(cached):
+            if entry is not None:
+                _, user_factors, interacted_indices = entry
+                factors[row] = user_factors
+                interacted[row, interacted_indices] = True
+                known[row] = True
+        
+        # Project the other users' training rows into latent space
+        positions = sorted_positions(self.user_ids, user_ids)
+        training_rows = np.flatnonzero(~known & (positions >= 0))
+        if len(training_rows):
+            user_vectors = self.user_item_matrix[positions[training_rows]]
+            factors[training_rows] = np.asarray(user_vectors @ components.T)
+            entries = user_vectors.tocoo()
+            positive = entries.data > 0
+            interacted[training_rows[entries.row[positive]], entries.col[positive]] = True
+            known[training_rows] = True
+        
+        # Project back to item space
+        return factors @ components, interacted, known
+    
     def recommend_for_user(self, user_id, n=10, exclude_items=None):
         """
         Get recommendations for a user
@@ -97,114 +548,345 @@ class CollaborativeFilteringModel:
         Returns:
             List of (item_id, score) tuples
         """
-        if exclude_items is None:
-            exclude_items = []
-        
-        # If user is not in the training data, return empty list
-        if user_id not in self.user_mapping:
+        scores, excluded = self.score_user(user_id)
+        if scores is None:
+            # If user is neither folded in nor in the training data, return empty list
             return []
         
-        user_idx = self.user_mapping[user_id]
-        user_vector = self.user_item_matrix.iloc[user_idx].values.reshape(1, -1)
-        
-        # Project user vector into latent space and back
-        user_preds = user_vector @ self.model.components_.T @ self.model.components_
+        # Exclude interacted and explicitly excluded items
+        if exclude_items is not None and len(exclude_items):
+            excluded |= np.isin(self.item_ids, list(exclude_items))
+        scores = np.where(excluded, -np.inf, scores)
         
-        # Get indices of items to recommend (excluding already interacted items)
-        user_interacted = set(self.user_item_matrix.columns[user_vector.flatten() > 0])
-        exclude_set = set(exclude_items).union(user_interacted)
-        
-        # Get all items that are not excluded
-        candidate_items = [
-            item_id for item_id in self.user_item_matrix.columns 
-            if item_id not in exclude_set
-        ]
-        
-        # Get scores for candidate items
-        candidate_indices = [self.item_mapping[item_id] for item_id in candidate_items]
-        scores = user_preds.flatten()[candidate_indices]
-        
-        # Sort by score and return top n
-        item_scores = list(zip(candidate_items, scores))
-        item_scores.sort(key=lambda x: x[1], reverse=True)
-        
-        return item_scores[:n]
+        top_indices = top_k(scores, min(n, int((~excluded).sum())))
+        return [(int(self.item_ids[idx]), float(scores[idx])) for idx in top_indices]
     
-    def save(self, filename='collaborative_model.joblib'):
+    def save(self, filename='collaborative_model.joblib', directory=MODELS_DIR):
         """Save model to disk"""
-        path = os.path.join(MODELS_DIR, filename)
+        path = os.path.join(directory, filename)
         joblib.dump({
             'n_components': self.n_components,
+            'n_neighbours': self.n_neighbours,
             'model': self.model,
-            'user_mapping': self.user_mapping,
-            'item_mapping': self.item_mapping,
-            'reverse_user_mapping': self.reverse_user_mapping,
-            'reverse_item_mapping': self.reverse_item_mapping,
+            'user_ids': self.user_ids,
+            'item_ids': self.item_ids,
             'user_item_matrix': self.user_item_matrix,
+            'neighbour_indices': self.neighbour_indices,
+            'neighbour_scores': self.neighbour_scores,
+            'neighbour_score_scales': self.neighbour_score_scales,
+            'ann_index': self.ann_index,
         }, path)
         logger.info(f"Collaborative filtering model saved to {path}")
     
     @classmethod
-    def load(cls, filename='collaborative_model.joblib'):
+    def load(cls, filename='collaborative_model.joblib', directory=MODELS_DIR):
         """Load model from disk"""
-        path = os.path.join(MODELS_DIR, filename)
+        path = os.path.join(directory, filename)
         if not os.path.exists(path):
             logger.warning(f"Model file {path} not found")
             return None
         
         data = joblib.load(path)
-        model = cls(n_components=data['n_components'])
+        model = cls(n_components=data['n_components'], n_neighbours=data['n_neighbours'])
         model.model = data['model']
-        model.user_mapping = data['user_mapping']
-        model.item_mapping = data['item_mapping']
-        model.reverse_user_mapping = data['reverse_user_mapping']
-        model.reverse_item_mapping = data['reverse_item_mapping']
+        model.user_ids = data['user_ids']
+        model.item_ids = data['item_ids']
         model.user_item_matrix = data['user_item_matrix']
-        
-        # Recalculate item features and similarity
+        model.neighbour_indices = data['neighbour_indices']
+        model.neighbour_scores = data['neighbour_scores']
+        model.neighbour_score_scales = data['neighbour_score_scales']
+        model.ann_index = data['ann_index']
         model.item_features = model.model.components_.T
-        model.item_similarity = cosine_similarity(model.item_features)
         
         logger.info(f"Collaborative filtering model loaded from {path}")
         return model
+    
+    def save_arrays(self, directory):
+        """
+        Save model as raw .npy arrays
+        
+        Returns:
+            Dictionary of hyperparameters to record in the artifact manifest
+        """
+        os.makedirs(directory, exist_ok=True)
+        save_array(directory, 'components', self.model.components_)
+        save_array(directory, 'user_ids', self.user_ids)
+        save_array(directory, 'item_ids', self.item_ids)
+        save_array(directory, 'user_item_data', self.user_item_matrix.data)
+        save_array(directory, 'user_item_indices', self.user_item_matrix.indices)
+        save_array(directory, 'user_item_indptr', self.user_item_matrix.indptr)
+        save_array(directory, 'neighbour_indices', self.neighbour_indices)
+        save_array(directory, 'neighbour_scores', self.neighbour_scores)
+        if self.neighbour_score_scales is not None:
+            save_array(directory, 'neighbour_score_scales', self.neighbour_score_scales)
+        
+        return {
+            'n_components': self.n_components,
+            'n_neighbours': self.n_neighbours,
+            'quantized_neighbours': self.neighbour_score_scales is not None,
+            'ann_index': self.ann_index.save_arrays(directory) if self.ann_index is not None else None,
+        }
+    
+    @classmethod
+    def load_arrays(cls, directory, params, mmap_mode='r'):
+        """Load model saved with save_arrays, memory-mapping the arrays"""
+        model = cls(n_components=params['n_components'], n_neighbours=params['n_neighbours'])
+        model.model.components_ = load_array(directory, 'components', mmap_mode)
+        model.user_ids = load_array(directory, 'user_ids', mmap_mode)
+        model.item_ids = load_array(directory, 'item_ids', mmap_mode)
+        model.user_item_matrix = sparse.csr_matrix(
+            (
+                load_array(directory, 'user_item_data', mmap_mode),
+                load_array(directory, 'user_item_indices', mmap_mode),
+                load_array(directory, 'user_item_indptr', mmap_mode),
+            ),
+            shape=(len(model.user_ids), len(model.item_ids)),
+        )
+        model.neighbour_indices = load_array(directory, 'neighbour_indices', mmap_mode)
+        model.neighbour_scores = load_array(directory, 'neighbour_scores', mmap_mode)
+        if params['quantized_neighbours']:
+            model.neighbour_score_scales = load_array(directory, 'neighbour_score_scales', mmap_mode)
+        if params['ann_index'] is not None:
+            model.ann_index = IVFIndex.load_arrays(directory, params['ann_index'], mmap_mode)
+        model.item_features = model.model.components_.T
+        return model
 
 
 class ContentBasedFilteringModel:
     """
     Content-based filtering model using TF-IDF and cosine similarity
     """
-    def __init__(self):
+    def __init__(self, n_neighbours=50, drift_threshold=0.05):
+        self.n_neighbours = n_neighbours
         self.pipeline = Pipeline([
             ('tfidf', TfidfVectorizer(stop_words='english')),
             ('svd', TruncatedSVD(n_components=50, random_state=42)),
         ])
+        self.pipeline_path = None
         self.product_features = None
         self.product_ids = None
-        self.similarity_matrix = None
+        
+        # product_ids sorted, and the feature row of each sorted ID, looked up with searchsorted
+        self.sorted_product_ids = np.array([], dtype=np.int64)
+        self.product_order = np.array([], dtype=np.int64)
+        self.neighbour_indices = None
+        self.neighbour_scores = None
+        self.neighbour_score_scales = None
+        self.ann_index = None
+        
+        # Seasonal and location context aligned with product_ids, so boosts need no DB queries
+        self.season_masks = None
+        self.country_codes = []
+        self.country_index = None
+        self.region_codes = []
+        self.region_index = None
+        
+        # Vocabulary drift: tokens unknown to the fitted vocabulary seen by incremental
+        # updates, relative to the number of tokens the pipeline was fitted on
+        self.drift_threshold = drift_threshold
+        self.fit_token_count = 0
+        self.unknown_token_count = 0
+    
+    def _build_mappings(self):
+        """Sort the product IDs for lookups of their feature matrix rows"""
+        self.product_order = np.argsort(self.product_ids, kind='stable')
+        self.sorted_product_ids = self.product_ids[self.product_order]
+    
+    def product_rows(self, product_ids):
+        """Feature matrix rows of products, -1 for products the model does not know"""
+        positions = sorted_positions(self.sorted_product_ids, product_ids)
+        found = positions >= 0
+        positions[found] = self.product_order[positions[found]]
+        return positions
+    
+    def product_index(self, product_id):
+        """Feature matrix row of a product, or None if the model does not know it"""
+        row = int(self.product_rows(product_id)[0])
+        return row if row >= 0 else None
+    
+    @staticmethod
+    def _product_content(products_df):
+        """Combine text features of each product"""
+        return (
+            products_df['name'] + ' ' + 
+            products_df['description'] + ' ' + 
+            products_df['category']
+        )
+    
+    @staticmethod
+    def _column(products_df, column, default):
+        """Get a context column of a products DataFrame, or `default` for every row if it is missing"""
+        if column in products_df:
+            return products_df[column].to_numpy()
+        values = np.empty(len(products_df), dtype=object)
+        values[:] = [default] * len(products_df)
+        return values
+    
+    def get_pipeline(self):
+        """Get the fitted TF-IDF pipeline, loading it from disk if it was not loaded with the model"""
+        if self.pipeline is None and self.pipeline_path:
+            self.pipeline = joblib.load(self.pipeline_path)
+        return self.pipeline
+    
+    @property
+    def vocabulary_drift(self):
+        """Share of unknown tokens added by incremental updates since the last full fit"""
+        if not self.fit_token_count:
+            return 0.0
+        return self.unknown_token_count / self.fit_token_count
     
     def fit(self, products_df):
         """
         Train the model on product content
         
         Args:
-            products_df: DataFrame with columns 'id', 'name', 'description', 'category'
+            products_df: DataFrame with columns 'id', 'name', 'description', 'category' and
+                optionally 'season_mask', 'countries', 'regions' (see load_products_dataframe)
         """
         # Combine text features
-        products_df['content'] = (
-            products_df['name'] + ' ' + 
-            products_df['description'] + ' ' + 
-            products_df['category']
-        )
+        products_df['content'] = self._product_content(products_df)
         
         # Fit the pipeline and transform the content
         self.product_features = self.pipeline.fit_transform(products_df['content'])
-        self.product_ids = products_df['id'].values
-        
-        # Calculate similarity matrix
-        self.similarity_matrix = cosine_similarity(self.product_features)
+        self.product_ids = products_df['id'].to_numpy(dtype=np.int64)
+        self._build_mappings()
+        
+        # Precompute seasonal and location context
+        self.season_masks = self._column(products_df, 'season_mask', ALL_SEASONS_MASK).astype(np.uint32)
+        self.country_codes, self.country_index = build_availability_index(list(self._column(products_df, 'countries', [])))
+        self.region_codes, self.region_index = build_availability_index(list(self._column(products_df, 'regions', [])))
+        
+        # Reset vocabulary drift
+        analyzer = self.pipeline.named_steps['tfidf'].build_analyzer()
+        self.fit_token_count = sum(len(analyzer(content)) for content in products_df['content'])
+        self.unknown_token_count = 0
+        
+        # Calculate top-K product neighbour table
+        self.neighbour_indices, self.neighbour_scores = build_neighbour_table(
+            self.product_features, k=self.n_neighbours
+        )
         
         return self
     
+    def update_products(self, products_df):
+        """
+        Add or replace products through the already fitted pipeline
+        
+        Only the given products are transformed. Their rows in product_features are
+        replaced or appended, and the neighbour table (or ANN index) is patched
+        instead of rebuilt. Arrays are replaced rather than modified in place, so a
+        copy of a model that is being served can be updated safely.
+        
+        Args:
+            products_df: DataFrame with columns 'id', 'name', 'description', 'category'
+            
+        Returns:
+            False if vocabulary drift exceeds drift_threshold and a full refit is needed, True otherwise
+        """
+        pipeline = self.get_pipeline()
+        content = self._product_content(products_df)
+        
+        # Measure vocabulary drift before touching the model
+        tfidf = pipeline.named_steps['tfidf']
+        analyzer = tfidf.build_analyzer()
+        unknown_tokens = sum(
+            token not in tfidf.vocabulary_
+            for text in content
+            for token in analyzer(text)
+        )
+        self.unknown_token_count += unknown_tokens
+        if self.vocabulary_drift > self.drift_threshold:
+            logger.info(f"Content model vocabulary drift {self.vocabulary_drift:.3f} exceeds {self.drift_threshold}")
+            return False
+        
+        features = pipeline.transform(content)
+        
+        # Replace rows of known products, append rows for new ones
+        product_ids = products_df['id'].tolist()
+        new_ids = [product_id for product_id, row in zip(product_ids, self.product_rows(product_ids)) if row < 0]
+        self.product_ids = np.concatenate([self.product_ids, np.array(new_ids, dtype=np.int64)])
+        self._build_mappings()
+        
+        changed = self.product_rows(product_ids)
+        product_features = np.empty((len(self.product_ids), features.shape[1]), dtype=self.product_features.dtype)
+        product_features[:len(self.product_features)] = self.product_features
+        product_features[changed] = features
+        self.product_features = product_features
+        
+        # Update seasonal and location context of the changed rows
+        season_masks = np.full(len(self.product_ids), ALL_SEASONS_MASK, dtype=np.uint32)
+        season_masks[:len(self.season_masks)] = self.season_masks
+        season_masks[changed] = self._column(products_df, 'season_mask', ALL_SEASONS_MASK)
+        self.season_masks = season_masks
+        
+        for attribute, column in (('country', 'countries'), ('region', 'regions')):
+            code_lists = availability_code_lists(getattr(self, f'{attribute}_codes'), getattr(self, f'{attribute}_index'))
+            code_lists.extend([] for _ in new_ids)
+            for row, code_list in zip(changed, self._column(products_df, column, [])):
+                code_lists[row] = list(code_list)
+            codes, index = build_availability_index(code_lists, n_rows=len(self.product_ids))
+            setattr(self, f'{attribute}_codes', codes)
+            setattr(self, f'{attribute}_index', index)
+        
+        if self.ann_index is not None:
+            self.ann_index = copy.copy(self.ann_index).update_items(changed, self.product_features)
+        elif len(self.product_ids) > 1:
+            self._update_neighbours(changed)
+        
+        logger.info(f"Content model updated for {len(changed)} products ({len(new_ids)} new)")
+        return True
+    
+    def _update_neighbours(self, changed):
+        """
+        Patch the neighbour table after the rows in `changed` were replaced or appended
+        
+        Rows of changed items, and rows that listed a changed item (their scores are
+        stale), are recomputed. In all other rows a changed item is inserted if it
+        beats the current last neighbour.
+        """
+        n_items = len(self.product_ids)
+        k = self.neighbour_indices.shape[1] if self.neighbour_indices.shape[1] else min(self.n_neighbours, n_items - 1)
+        normalized = normalize_rows(self.product_features)
+        
+        old_scores = self.neighbour_scores
+        if self.neighbour_score_scales is not None:
+            old_scores = dequantize_rows(old_scores, self.neighbour_score_scales)
+        
+        indices = np.zeros((n_items, k), dtype=np.int32)
+        scores = np.full((n_items, k), -np.inf, dtype=np.float32)
+        n_old = len(self.neighbour_indices)
+        old_width = min(k, self.neighbour_indices.shape[1])
+        indices[:n_old, :old_width] = self.neighbour_indices[:, :old_width]
+        scores[:n_old, :old_width] = old_scores[:, :old_width]
+        
+        stale = np.flatnonzero(np.isin(indices[:n_old, :old_width], changed).any(axis=1))
+        recompute = np.union1d(np.union1d(changed, stale), np.arange(n_old, n_items))
+        
+        # Full recompute for changed, new and stale rows
+        block = normalized[recompute] @ normalized.T
+        block[np.arange(len(recompute)), recompute] = -np.inf
+        top = np.argpartition(block, -k, axis=1)[:, -k:]
+        top_scores = np.take_along_axis(block, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        indices[recompute] = np.take_along_axis(top, order, axis=1)
+        scores[recompute] = np.take_along_axis(top_scores, order, axis=1)
+        
+        # Insert changed items into the remaining rows where they now rank in the top k
+        others = np.setdiff1d(np.arange(n_items), recompute)
+        if len(others):
+            similarities = normalized[others] @ normalized[changed].T
+            candidate_ids = np.concatenate([indices[others], np.broadcast_to(changed, (len(others), len(changed)))], axis=1)
+            candidate_scores = np.concatenate([scores[others], similarities], axis=1)
+            order = np.argsort(-candidate_scores, axis=1)[:, :k]
+            indices[others] = np.take_along_axis(candidate_ids, order, axis=1)
+            scores[others] = np.take_along_axis(candidate_scores, order, axis=1)
+        
+        self.neighbour_indices = indices
+        if self.neighbour_score_scales is not None:
+            self.neighbour_scores, self.neighbour_score_scales = quantize_rows(scores)
+        else:
+            self.neighbour_scores = scores
+    
     def get_similar_items(self, item_id, n=10):
         """
         Get similar items for a given item based on content
@@ -217,23 +899,121 @@ class ContentBasedFilteringModel:
             List of (item_id, similarity_score) tuples
         """
         # Find index of the item
-        try:
-            item_idx = list(self.product_ids).index(item_id)
-        except ValueError:
+        item_idx = self.product_index(item_id)
+        if item_idx is None:
             return []
         
-        # Get similarity scores
-        similarity_scores = self.similarity_matrix[item_idx]
-        
-        # Get indices of top similar items (excluding the item itself)
-        similar_indices = np.argsort(similarity_scores)[::-1][1:n+1]
+        # Get top similar items (neither the index nor the table returns the item itself)
+        if self.ann_index is not None:
+            similar_indices, similar_scores = self.ann_index.query_item(item_idx, n=n)
+        else:
+            similar_indices = self.neighbour_indices[item_idx, :n]
+            similar_scores = neighbour_row_scores(self.neighbour_scores, self.neighbour_score_scales, item_idx, n)
         
         # Return item IDs and similarity scores
         return [
-            (self.product_ids[idx], similarity_scores[idx]) 
-            for idx in similar_indices
+            (int(self.product_ids[idx]), float(score)) 
+            for idx, score in zip(similar_indices, similar_scores)
         ]
     
+    def compact(self, dtype=np.float32, quantize_neighbours=False):
+        """
+        Shrink the served arrays
+        
+        Args:
+            dtype: Float dtype for the product features
+            quantize_neighbours: Store neighbour scores as int8 with per-row scales
+        """
+        self.product_features = self.product_features.astype(dtype)
+        if quantize_neighbours and self.neighbour_score_scales is None:
+            self.neighbour_scores, self.neighbour_score_scales = quantize_rows(self.neighbour_scores)
+        return self
+    
+    def score_profile(self, user_profile):
+        """
+        Score every product against a user profile
+        
+        Args:
+            user_profile: Dictionary with keys 'liked_categories', 'liked_products'
+            
+        Returns:
+            Array of cosine similarities aligned with product_ids, or None if the
+            profile is empty
+        """
+        scores, has_profile = self.score_profiles([user_profile])
+        return scores[0] if has_profile[0] else None
+    
+    def score_profiles(self, user_profiles):
+        """
+        Score every product against several user profiles
+        
+        A profile's vector is the average feature vector of its liked products
+        (zero if none of them is known).
+        
+        Args:
+            user_profiles: List of dictionaries with keys 'liked_categories', 'liked_products'
+            
+        Returns:
+            Tuple of (scores, has_profile): cosine similarities with one row per
+            profile aligned with product_ids, and a mask of the non-empty profiles
+            (the rows of empty ones are all zero)
+        """
+        user_vectors = np.zeros((len(user_profiles), self.product_features.shape[1]))
+        has_profile = np.zeros(len(user_profiles), dtype=bool)
+        
+        for row, user_profile in enumerate(user_profiles):
+            if not user_profile.get('liked_categories') and not user_profile.get('liked_products'):
+                continue
+            has_profile[row] = True
+            
+            # Calculate average feature vector for liked products
+            liked_product_indices = self.product_rows(user_profile.get('liked_products', []))
+            liked_product_indices = liked_product_indices[liked_product_indices >= 0]
+            if len(liked_product_indices):
+                user_vectors[row] = self.product_features[liked_product_indices].mean(axis=0)
+        
+        # Calculate similarity between user vectors and all products
+        scores = np.zeros((len(user_profiles), len(self.product_ids)))
+        if has_profile.any():
+            scores[has_profile] = cosine_similarity(user_vectors[has_profile], self.product_features)
+        return scores, has_profile
+    
+    def context_boosts(self, month, hemisphere, user_location=None, seasonal_boost=0.2, location_boost=0.1):
+        """
+        Get additive seasonal and location boosts for every product
+        
+        The boosts are added to fused scores in [0, 1], so they also lift products
+        whose scaled score is 0 (a factor would leave those unchanged).
+        
+        Args:
+            month: Current month (1-12)
+            hemisphere: User's hemisphere ('N' or 'S')
+            user_location: Optional dictionary with 'country' and 'region' keys
+            seasonal_boost: Boost for products in season
+            location_boost: Boost for location-specific products available in the
+                user's country (half of it for the region)
+            
+        Returns:
+            Array of boosts aligned with product_ids
+        """
+        boosts = np.zeros(len(self.product_ids))
+        if self.season_masks is None:
+            return boosts
+        
+        if hemisphere in HEMISPHERES:
+            in_season = (self.season_masks >> np.uint32(season_bit(month, hemisphere))) & 1
+            boosts[in_season.astype(bool)] += seasonal_boost
+        
+        if user_location:
+            country = user_location.get('country')
+            region = user_location.get('region')
+            if country:
+                boosts[available_rows(self.country_codes, self.country_index, country)] += location_boost
+            if region:
+                boosts[available_rows(self.region_codes, self.region_index, region)] += location_boost / 2
+        
+        return boosts
+    
     def recommend_for_user_profile(self, user_profile, n=10, exclude_items=None):
         """
         Get recommendations based on user profile
@@ -246,114 +1026,251 @@ class ContentBasedFilteringModel:
         Returns:
             List of (item_id, score) tuples
         """
-        if exclude_items is None:
-            exclude_items = []
-        
-        # If no profile data, return empty list
-        if not user_profile.get('liked_categories') and not user_profile.get('liked_products'):
+        scores = self.score_profile(user_profile)
+        if scores is None:
+            # If no profile data, return empty list
             return []
         
-        # Calculate average feature vector for liked products
-        liked_product_indices = [
-            list(self.product_ids).index(pid) 
-            for pid in user_profile.get('liked_products', [])
-            if pid in self.product_ids
-        ]
-        
-        if liked_product_indices:
-            user_vector = self.product_features[liked_product_indices].mean(axis=0)
-        else:
-            # If no liked products, use a zero vector
-            user_vector = np.zeros((1, self.product_features.shape[1]))
-        
-        # Calculate similarity between user vector and all products
-        similarity_scores = cosine_similarity(user_vector, self.product_features)[0]
-        
-        # Create list of (item_id, score) tuples
-        item_scores = list(zip(self.product_ids, similarity_scores))
+        # Filter out excluded items with a mask
+        excluded = np.zeros(len(self.product_ids), dtype=bool)
+        if exclude_items is not None and len(exclude_items):
+            excluded = np.isin(self.product_ids, list(exclude_items))
+        scores = np.where(excluded, -np.inf, scores)
         
-        # Filter out excluded items
-        item_scores = [
-            (item_id, score) for item_id, score in item_scores
-            if item_id not in exclude_items
-        ]
-        
-        # Sort by score and return top n
-        item_scores.sort(key=lambda x: x[1], reverse=True)
-        return item_scores[:n]
+        top_indices = top_k(scores, min(n, int((~excluded).sum())))
+        return [(int(self.product_ids[idx]), float(scores[idx])) for idx in top_indices]
     
-    def save(self, filename='content_model.joblib'):
+    def save(self, filename='content_model.joblib', directory=MODELS_DIR):
         """Save model to disk"""
-        path = os.path.join(MODELS_DIR, filename)
+        path = os.path.join(directory, filename)
         joblib.dump({
+            'n_neighbours': self.n_neighbours,
+            'drift_threshold': self.drift_threshold,
+            'fit_token_count': self.fit_token_count,
+            'unknown_token_count': self.unknown_token_count,
             'pipeline': self.pipeline,
             'product_features': self.product_features,
             'product_ids': self.product_ids,
-            'similarity_matrix': self.similarity_matrix,
+            'neighbour_indices': self.neighbour_indices,
+            'neighbour_scores': self.neighbour_scores,
+            'neighbour_score_scales': self.neighbour_score_scales,
+            'ann_index': self.ann_index,
+            'season_masks': self.season_masks,
+            'country_codes': self.country_codes,
+            'country_index': self.country_index,
+            'region_codes': self.region_codes,
+            'region_index': self.region_index,
         }, path)
         logger.info(f"Content-based filtering model saved to {path}")
     
     @classmethod
-    def load(cls, filename='content_model.joblib'):
+    def load(cls, filename='content_model.joblib', directory=MODELS_DIR):
         """Load model from disk"""
-        path = os.path.join(MODELS_DIR, filename)
+        path = os.path.join(directory, filename)
         if not os.path.exists(path):
             logger.warning(f"Model file {path} not found")
             return None
         
         data = joblib.load(path)
-        model = cls()
+        model = cls(n_neighbours=data['n_neighbours'], drift_threshold=data['drift_threshold'])
+        model.fit_token_count = data['fit_token_count']
+        model.unknown_token_count = data['unknown_token_count']
         model.pipeline = data['pipeline']
         model.product_features = data['product_features']
         model.product_ids = data['product_ids']
-        model.similarity_matrix = data['similarity_matrix']
+        model.neighbour_indices = data['neighbour_indices']
+        model.neighbour_scores = data['neighbour_scores']
+        model.neighbour_score_scales = data['neighbour_score_scales']
+        model.ann_index = data['ann_index']
+        model.season_masks = data['season_masks']
+        model.country_codes = data['country_codes']
+        model.country_index = data['country_index']
+        model.region_codes = data['region_codes']
+        model.region_index = data['region_index']
+        model._build_mappings()
         
         logger.info(f"Content-based filtering model loaded from {path}")
         return model
+    
+    def save_arrays(self, directory):
+        """
+        Save model as raw .npy arrays
+        
+        The fitted TF-IDF pipeline is not needed for serving, so it is stored
+        separately as pipeline.joblib and not loaded by load_arrays.
+        
+        Returns:
+            Dictionary of hyperparameters to record in the artifact manifest
+        """
+        os.makedirs(directory, exist_ok=True)
+        save_array(directory, 'product_features', self.product_features)
+        save_array(directory, 'product_ids', self.product_ids)
+        save_array(directory, 'sorted_product_ids', self.sorted_product_ids)
+        save_array(directory, 'product_order', self.product_order)
+        save_array(directory, 'neighbour_indices', self.neighbour_indices)
+        save_array(directory, 'neighbour_scores', self.neighbour_scores)
+        if self.neighbour_score_scales is not None:
+            save_array(directory, 'neighbour_score_scales', self.neighbour_score_scales)
+        save_array(directory, 'season_masks', self.season_masks)
+        for attribute in ('country', 'region'):
+            index = getattr(self, f'{attribute}_index')
+            save_array(directory, f'{attribute}_index_indices', index.indices)
+            save_array(directory, f'{attribute}_index_indptr', index.indptr)
+        joblib.dump(self.get_pipeline(), os.path.join(directory, 'pipeline.joblib'))
+        
+        return {
+            'n_neighbours': self.n_neighbours,
+            'drift_threshold': self.drift_threshold,
+            'country_codes': self.country_codes,
+            'region_codes': self.region_codes,
+            'fit_token_count': self.fit_token_count,
+            'unknown_token_count': self.unknown_token_count,
+            'quantized_neighbours': self.neighbour_score_scales is not None,
+            'ann_index': self.ann_index.save_arrays(directory) if self.ann_index is not None else None,
+        }
+    
+    @classmethod
+    def load_arrays(cls, directory, params, mmap_mode='r'):
+        """Load model saved with save_arrays, memory-mapping the arrays"""
+        model = cls(n_neighbours=params['n_neighbours'], drift_threshold=params['drift_threshold'])
+        model.fit_token_count = params['fit_token_count']
+        model.unknown_token_count = params['unknown_token_count']
+        model.pipeline = None
+        model.pipeline_path = os.path.join(directory, 'pipeline.joblib')
+        model.product_features = load_array(directory, 'product_features', mmap_mode)
+        model.product_ids = load_array(directory, 'product_ids', mmap_mode)
+        model.sorted_product_ids = load_array(directory, 'sorted_product_ids', mmap_mode)
+        model.product_order = load_array(directory, 'product_order', mmap_mode)
+        model.neighbour_indices = load_array(directory, 'neighbour_indices', mmap_mode)
+        model.neighbour_scores = load_array(directory, 'neighbour_scores', mmap_mode)
+        if params['quantized_neighbours']:
+            model.neighbour_score_scales = load_array(directory, 'neighbour_score_scales', mmap_mode)
+        if params['ann_index'] is not None:
+            model.ann_index = IVFIndex.load_arrays(directory, params['ann_index'], mmap_mode)
+        
+        model.season_masks = load_array(directory, 'season_masks', mmap_mode)
+        for attribute in ('country', 'region'):
+            codes = params[f'{attribute}_codes']
+            indices = load_array(directory, f'{attribute}_index_indices', mmap_mode)
+            setattr(model, f'{attribute}_codes', codes)
+            setattr(model, f'{attribute}_index', sparse.csc_matrix(
+                (np.ones(len(indices), dtype=bool), indices, load_array(directory, f'{attribute}_index_indptr', mmap_mode)),
+                shape=(len(model.product_ids), len(codes)),
+            ))
+        return model
 
 
 class HybridRecommender:
     """
     Hybrid recommender that combines collaborative filtering and content-based filtering
     """
-    def __init__(self, cf_weight=0.7, cb_weight=0.3):
+    def __init__(self, cf_weight=0.7, cb_weight=0.3, n_neighbours=50, ann_min_items=None, ann_n_probe=8):
         self.cf_model = None
         self.cb_model = None
         self.cf_weight = cf_weight
         self.cb_weight = cb_weight
+        self.n_neighbours = n_neighbours
+        self.ann_min_items = ann_min_items
+        self.ann_n_probe = ann_n_probe
         self.seasonal_boost = 0.2
         self.location_boost = 0.1
+        self.version = None
+        self._alignment = None
     
-    def fit(self, interactions_df, products_df):
+    def fit(self, interactions_df, products_df, on_phase=None):
         """
         Train both models
         
         Args:
             interactions_df: DataFrame for collaborative filtering
             products_df: DataFrame for content-based filtering
+            on_phase: Optional callback receiving the name of each training phase as it starts
         """
+        if on_phase is None:
+            on_phase = lambda phase: None
+        
+        # Large catalogs use an approximate index instead of exact neighbour tables
+        use_ann = self.ann_min_items is not None and len(products_df) >= self.ann_min_items
+        n_neighbours = 0 if use_ann else self.n_neighbours
+        
         # Train collaborative filtering model
-        self.cf_model = CollaborativeFilteringModel()
+        on_phase('cf_fit')
+        self.cf_model = CollaborativeFilteringModel(n_neighbours=n_neighbours)
         self.cf_model.fit(interactions_df)
         
         # Train content-based filtering model
-        self.cb_model = ContentBasedFilteringModel()
+        on_phase('cb_fit')
+        self.cb_model = ContentBasedFilteringModel(n_neighbours=n_neighbours)
         self.cb_model.fit(products_df)
         
+        if use_ann:
+            self.cf_model.ann_index = IVFIndex(n_probe=self.ann_n_probe).build(self.cf_model.item_features)
+            self.cb_model.ann_index = IVFIndex(n_probe=self.ann_n_probe).build(self.cb_model.product_features)
+        
         return self
     
-    def get_similar_items(self, item_id, n=10):
+    def compact(self, dtype=np.float32, quantize_neighbours=False):
         """
-        Get similar items using both models
+        Shrink the served arrays of both models (see CollaborativeFilteringModel.compact)
         
         Args:
-            item_id: Product ID
-            n: Number of similar items to return
-            
-        Returns:
-            List of (item_id, similarity_score) tuples
+            dtype: Float dtype for item factors and product features
+            quantize_neighbours: Store neighbour scores as int8 with per-row scales
         """
-        # Get recommendations from both models
+        self.cf_model.compact(dtype, quantize_neighbours)
+        self.cb_model.compact(dtype, quantize_neighbours)
+        return self
+    
+    def memory_usage(self):
+        """
+        Get the bytes held by the served arrays
+        
+        Returns:
+            Dictionary mapping each component to its size in bytes
+        """
+        def nbytes(*arrays):
+            return int(sum(array.nbytes for array in arrays if array is not None))
+        
+        cf, cb = self.cf_model, self.cb_model
+        usage = {
+            'cf_factors': nbytes(cf.model.components_),
+            'cf_interactions': nbytes(cf.user_item_matrix.data, cf.user_item_matrix.indices, cf.user_item_matrix.indptr),
+            'cf_neighbours': nbytes(cf.neighbour_indices, cf.neighbour_scores, cf.neighbour_score_scales),
+            'cb_features': nbytes(cb.product_features),
+            'cb_neighbours': nbytes(cb.neighbour_indices, cb.neighbour_scores, cb.neighbour_score_scales),
+        }
+        for name, model in (('cf_ann', cf), ('cb_ann', cb)):
+            if model.ann_index is not None:
+                index = model.ann_index
+                usage[name] = nbytes(index.normalized, index.centroids, index.list_offsets, index.list_items)
+        return usage
+    
+    def _cf_catalog_positions(self):
+        """
+        Get the catalog position of every CF item (-1 for items not in the catalog)
+        
+        The catalog is the content model's product index. The mapping is cached and
+        rebuilt whenever either model is replaced, e.g. by an incremental update.
+        """
+        alignment = self._alignment
+        if alignment is None or alignment[0] is not self.cf_model or alignment[1] is not self.cb_model:
+            positions = self.cb_model.product_rows(self.cf_model.item_ids)
+            alignment = (self.cf_model, self.cb_model, positions)
+            self._alignment = alignment
+        return alignment[2]
+    
+    def get_similar_items(self, item_id, n=10):
+        """
+        Get similar items using both models
+        
+        Args:
+            item_id: Product ID
+            n: Number of similar items to return
+            
+        Returns:
+            List of (item_id, similarity_score) tuples
+        """
+        # Get recommendations from both models
         cf_recs = dict(self.cf_model.get_similar_items(item_id, n=n))
         cb_recs = dict(self.cb_model.get_similar_items(item_id, n=n))
         
@@ -380,6 +1297,13 @@ class HybridRecommender:
         """
         Get recommendations for a user using both models and considering seasonal and location factors
         
+        Every catalog product is scored by both models. CF reconstruction scores and
+        CB cosine similarities are on different scales, so each is min-max scaled to
+        [0, 1] over the products it can score (excluded and interacted products left
+        out) before the weighted sum. Products unknown to the CF model get no CF
+        contribution, and only CF-known products are candidates when the profile is
+        empty. Seasonal and location boosts are added to the fused score.
+        
         Args:
             user_id: User ID
             user_profile: Dictionary with user profile for content-based filtering
@@ -392,67 +1316,113 @@ class HybridRecommender:
         Returns:
             List of (item_id, score) tuples
         """
-        if exclude_items is None:
-            exclude_items = []
-        if user_profile is None:
-            user_profile = {}
-        
-        # Get recommendations from collaborative filtering
-        cf_recs = dict(self.cf_model.recommend_for_user(user_id, n=n*2, exclude_items=exclude_items))
-        
-        # Get recommendations from content-based filtering
-        cb_recs = dict(self.cb_model.recommend_for_user_profile(user_profile, n=n*2, exclude_items=exclude_items))
-        
-        # Combine recommendations
-        combined_recs = {}
-        
-        # Add collaborative filtering recommendations
-        for item_id, score in cf_recs.items():
-            combined_recs[item_id] = score * self.cf_weight
-        
-        # Add content-based recommendations
-        for item_id, score in cb_recs.items():
-            if item_id in combined_recs:
-                combined_recs[item_id] += score * self.cb_weight
-            else:
-                combined_recs[item_id] = score * self.cb_weight
+        return self.recommend_for_users(
+            [user_id],
+            user_profiles={user_id: user_profile},
+            n=n,
+            exclude_items={user_id: exclude_items},
+            current_month=current_month,
+            user_contexts={user_id: (hemisphere, user_location)},
+        )[user_id]
+    
+    def recommend_for_users(self, user_ids, user_profiles=None, n=10, exclude_items=None,
+                            current_month=None, user_contexts=None, block_size=SCORING_BLOCK_SIZE):
+        """
+        Get recommendations for several users, scoring a block of users per matrix multiply
         
-        # Apply seasonal and location boosts if applicable
-        if current_month and hemisphere:
-            # Get products from database to check seasonal relevance
-            product_ids = list(combined_recs.keys())
-            products = Product.objects.filter(id__in=product_ids)
-            
-            for product in products:
-                if product.id in combined_recs:
-                    # Apply seasonal boost
-                    if product.is_in_season(current_month, hemisphere):
-                        combined_recs[product.id] *= (1 + self.seasonal_boost)
-                    
-                    # Apply location boost
-                    if user_location and product.is_location_specific:
-                        country = user_location.get('country')
-                        region = user_location.get('region')
-                        
-                        if country and country in (product.available_countries or ''):
-                            combined_recs[product.id] *= (1 + self.location_boost)
-                        
-                        if region and region in (product.available_regions or ''):
-                            combined_recs[product.id] *= (1 + self.location_boost / 2)
+        Scores are fused exactly as in recommend_for_user, which delegates here, so a
+        user gets the same recommendations alone or in a batch.
         
-        # Sort by score and return top n
-        sorted_recs = sorted(combined_recs.items(), key=lambda x: x[1], reverse=True)
-        return sorted_recs[:n]
+        Args:
+            user_ids: List of user IDs
+            user_profiles: Dictionary mapping user IDs to profiles for content-based filtering
+            n: Number of recommendations per user
+            exclude_items: Dictionary mapping user IDs to lists of item IDs to exclude
+            current_month: Current month (1-12)
+            user_contexts: Dictionary mapping user IDs to (hemisphere, user_location) tuples
+            block_size: Number of users scored at once
+            
+        Returns:
+            Dictionary mapping user IDs to lists of (item_id, score) tuples
+        """
+        user_profiles = user_profiles or {}
+        exclude_items = exclude_items or {}
+        user_contexts = user_contexts or {}
+        
+        product_ids = np.asarray(self.cb_model.product_ids)
+        cf_positions = self._cf_catalog_positions()
+        cf_known = cf_positions >= 0
+        boosts = {}
+        
+        recommendations = {}
+        for start in range(0, len(user_ids), block_size):
+            block = list(user_ids[start:start + block_size])
+            
+            # Score the whole catalog (the content model's product index) with both models
+            cf_scores, cf_interacted, cf_users = self.cf_model.score_users(block)
+            cb_scores, cb_users = self.cb_model.score_profiles([user_profiles.get(user_id) or {} for user_id in block])
+            
+            excluded = np.zeros((len(block), len(product_ids)), dtype=bool)
+            for row, user_id in enumerate(block):
+                items = exclude_items.get(user_id)
+                if items is not None and len(items):
+                    excluded[row] = np.isin(product_ids, list(items))
+            
+            # Map CF scores onto the catalog; interacted items are excluded, and items
+            # without a CF score get no CF contribution
+            catalog_cf_scores = np.zeros((len(block), len(product_ids)))
+            catalog_cf_scores[:, cf_positions[cf_known]] = cf_scores[:, cf_known]
+            interacted_rows, interacted_items = np.nonzero(cf_interacted[:, cf_known])
+            excluded[interacted_rows, cf_positions[cf_known][interacted_items]] = True
+            
+            cf_candidates = np.zeros((len(block), len(product_ids)), dtype=bool)
+            cf_candidates[np.ix_(cf_users, cf_positions[cf_known])] = True
+            candidates = cf_candidates | cb_users[:, np.newaxis]
+            
+            # Fuse normalised scores
+            combined = self.cf_weight * normalize_score_rows(catalog_cf_scores, cf_candidates & ~excluded)
+            combined += self.cb_weight * normalize_score_rows(cb_scores, cb_users[:, np.newaxis] & ~excluded)
+            
+            # Add seasonal and location boosts from the precomputed catalog context
+            if current_month:
+                for row, user_id in enumerate(block):
+                    hemisphere, user_location = user_contexts.get(user_id, (None, None))
+                    if not hemisphere:
+                        continue
+                    key = (hemisphere, tuple(sorted((user_location or {}).items())))
+                    if key not in boosts:
+                        boosts[key] = self.cb_model.context_boosts(
+                            current_month, hemisphere, user_location,
+                            seasonal_boost=self.seasonal_boost, location_boost=self.location_boost,
+                        )
+                    combined[row] += boosts[key]
+            
+            candidates &= ~excluded
+            combined[~candidates] = -np.inf
+            
+            top_indices = top_k_rows(combined, n)
+            for row, user_id in enumerate(block):
+                recommendations[user_id] = [
+                    (int(product_ids[idx]), float(combined[row, idx]))
+                    for idx in top_indices[row] if candidates[row, idx]
+                ]
+        
+        return recommendations
     
-    def save(self, cf_filename='collaborative_model.joblib', cb_filename='content_model.joblib'):
-        """Save both models to disk"""
+    def save(self, directory, cf_filename='collaborative_model.joblib', cb_filename='content_model.joblib'):
+        """
+        Save both models to a directory as joblib files
+        
+        Returns:
+            Dictionary of parameters to record in the artifact manifest
+        """
         if self.cf_model:
-            self.cf_model.save(cf_filename)
+            self.cf_model.save(cf_filename, directory)
         if self.cb_model:
-            self.cb_model.save(cb_filename)
+            self.cb_model.save(cb_filename, directory)
         
         # Save hybrid model parameters
-        path = os.path.join(MODELS_DIR, 'hybrid_params.joblib')
+        path = os.path.join(directory, 'hybrid_params.joblib')
         joblib.dump({
             'cf_weight': self.cf_weight,
             'cb_weight': self.cb_weight,
@@ -460,12 +1430,13 @@ class HybridRecommender:
             'location_boost': self.location_boost,
         }, path)
         logger.info(f"Hybrid recommender parameters saved to {path}")
+        return {}
     
     @classmethod
-    def load(cls, cf_filename='collaborative_model.joblib', cb_filename='content_model.joblib'):
-        """Load both models from disk"""
+    def load(cls, directory, cf_filename='collaborative_model.joblib', cb_filename='content_model.joblib'):
+        """Load both models from a directory of joblib files"""
         # Load hybrid model parameters
-        params_path = os.path.join(MODELS_DIR, 'hybrid_params.joblib')
+        params_path = os.path.join(directory, 'hybrid_params.joblib')
         if os.path.exists(params_path):
             params = joblib.load(params_path)
             model = cls(cf_weight=params['cf_weight'], cb_weight=params['cb_weight'])
@@ -475,10 +1446,10 @@ class HybridRecommender:
             model = cls()
         
         # Load collaborative filtering model
-        model.cf_model = CollaborativeFilteringModel.load(cf_filename)
+        model.cf_model = CollaborativeFilteringModel.load(cf_filename, directory)
         
         # Load content-based filtering model
-        model.cb_model = ContentBasedFilteringModel.load(cb_filename)
+        model.cb_model = ContentBasedFilteringModel.load(cb_filename, directory)
         
         # Check if both models were loaded successfully
         if model.cf_model is None or model.cb_model is None:
@@ -487,77 +1458,701 @@ class HybridRecommender:
         
         logger.info("Hybrid recommender loaded successfully")
         return model
+    
+    def save_arrays(self, directory):
+        """
+        Save both models to a directory as raw .npy arrays
+        
+        Returns:
+            Dictionary of parameters to record in the artifact manifest
+        """
+        params = {
+            'format_version': ARRAYS_FORMAT_VERSION,
+            'cf_weight': self.cf_weight,
+            'cb_weight': self.cb_weight,
+            'seasonal_boost': self.seasonal_boost,
+            'location_boost': self.location_boost,
+            'cf_model': self.cf_model.save_arrays(os.path.join(directory, 'cf')),
+            'cb_model': self.cb_model.save_arrays(os.path.join(directory, 'cb')),
+        }
+        logger.info(f"Hybrid recommender arrays saved to {directory}")
+        return params
+    
+    @classmethod
+    def load_arrays(cls, directory, params, mmap_mode='r'):
+        """
+        Load both models saved with save_arrays
+        
+        Args:
+            directory: Version directory
+            params: Parameters recorded in the manifest by save_arrays
+            mmap_mode: Passed to np.load; 'r' shares the arrays' pages between processes
+            
+        Returns:
+            HybridRecommender instance
+        """
+        model = cls(cf_weight=params['cf_weight'], cb_weight=params['cb_weight'])
+        model.seasonal_boost = params['seasonal_boost']
+        model.location_boost = params['location_boost']
+        model.cf_model = CollaborativeFilteringModel.load_arrays(
+            os.path.join(directory, 'cf'), params['cf_model'], mmap_mode
+        )
+        model.cb_model = ContentBasedFilteringModel.load_arrays(
+            os.path.join(directory, 'cb'), params['cb_model'], mmap_mode
+        )
+        
+        logger.info(f"Hybrid recommender loaded from {directory}")
+        return model
 
 
-def prepare_data_for_training():
+def _fsync_directory(directory):
+    """Flush a directory's entries (new files, renames) to disk"""
+    # Directories cannot be opened for fsync on Windows; NTFS journals renames itself
+    if os.name == 'nt':
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _fsync_tree(directory):
+    """Flush every file under a directory, and the directories themselves, to disk"""
+    for root, _, files in os.walk(directory):
+        for filename in files:
+            fd = os.open(os.path.join(root, filename), os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        _fsync_directory(root)
+
+
+def get_current_version():
     """
-    Prepare data for training the recommendation models
+    Get the model version named by the `current` pointer
     
     Returns:
-        Tuple of (interactions_df, products_df)
+        Version name (a directory in MODELS_DIR), or None if nothing was published
     """
-    # Get all interactions
-    interactions = UserProductInteraction.objects.all()
+    try:
+        with open(CURRENT_POINTER) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def set_current_version(version):
+    """
+    Atomically point readers at a published model version
     
-    # Convert to DataFrame
-    interactions_data = []
-    for interaction in interactions:
-        interactions_data.append({
-            'user_id': interaction.user.id,
-            'product_id': interaction.product.id,
-            'interaction_type': interaction.interaction_type,
-            'value': interaction.value
-        })
+    Args:
+        version: Name of a version directory in MODELS_DIR
+    """
+    tmp_pointer = f'{CURRENT_POINTER}.tmp'
+    with open(tmp_pointer, 'w') as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_pointer, CURRENT_POINTER)
+    _fsync_directory(MODELS_DIR)
+
+
+def read_manifest(version):
+    """
+    Read the manifest of a published model version
     
-    if not interactions_data:
-        logger.warning("No interaction data found")
-        return None, None
+    Returns:
+        Manifest dictionary, or None if the version does not exist
+    """
+    try:
+        with open(os.path.join(MODELS_DIR, version, 'manifest.json')) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+@contextmanager
+def _file_lock(path):
+    """Hold a blocking cross-process lock on a lock file for the duration of a block"""
+    fd = os.open(path, os.O_CREAT | os.O_RDWR)
+    try:
+        if not _lock_file(fd, blocking=True):
+            raise OSError(f"Could not lock {path}")
+        try:
+            yield
+        finally:
+            _unlock_file(fd)
+    finally:
+        os.close(fd)
+
+
+def model_store_lock():
+    """Serialise changes to the model store (publish, prune, rollback) across processes"""
+    return _file_lock(MODEL_STORE_LOCK_PATH)
+
+
+def version_sequence(version):
+    """Publish sequence number of a version name (0 for timestamp-only names from older releases)"""
+    parts = version.split('-')
+    return int(parts[1]) if len(parts) == 3 else 0
+
+
+def list_versions():
+    """
+    List published model versions, oldest first
     
-    interactions_df = pd.DataFrame(interactions_data)
+    Only directories with a manifest are listed, so staging directories and
+    partially removed versions are never offered for serving or rollback.
     
-    # Weight interactions: reviews (5x), purchases (3x), cart additions (2x), views (1x)
-    interactions_df['weighted_value'] = interactions_df.apply(
-        lambda row: row['value'] * (
-            5 if row['interaction_type'] == 'review' else
-            3 if row['interaction_type'] == 'purchase' else
-            2 if row['interaction_type'] == 'cart' else 1
-        ), axis=1
+    Returns:
+        List of version names
+    """
+    return sorted(
+        (
+            name for name in os.listdir(MODELS_DIR)
+            if name.startswith('hybrid-') and os.path.exists(os.path.join(MODELS_DIR, name, 'manifest.json'))
+        ),
+        key=lambda name: (version_sequence(name), name),
     )
+
+
+def publish_recommender(recommender, artifact_format=None, kind='trained'):
+    """
+    Save a recommender as a new model version and make it the served one
+    
+    The artifacts are written to a staging directory and fsynced, the directory is
+    renamed into place, and only then is the `current` pointer flipped. A reader
+    therefore always sees one complete version, never a mix of two runs. Old
+    versions are pruned afterwards (see prune_versions).
+    
+    Version names carry a sequence number one above the newest published version,
+    allocated under the model store lock, so their order is the publish order even
+    if the clock goes back (e.g. at the end of daylight saving time).
+    
+    Args:
+        recommender: Fitted HybridRecommender
+        artifact_format: 'joblib' or 'npy' (defaults to the configured format)
+        kind: 'trained' for a training run, 'incremental' for an update of a published version
+        
+    Returns:
+        Name of the published version
+    """
+    artifact_format = artifact_format or ARTIFACT_FORMAT
+    created_at = datetime.now(timezone.utc)
+    staging = os.path.join(MODELS_DIR, f".staging-{os.getpid()}-{created_at.strftime('%Y%m%dT%H%M%S%fZ')}")
+    os.makedirs(staging)
+    
+    try:
+        if artifact_format == 'npy':
+            params = recommender.save_arrays(staging)
+        else:
+            params = recommender.save(staging)
+        
+        with model_store_lock():
+            versions = list_versions()
+            sequence = version_sequence(versions[-1]) + 1 if versions else 1
+            version = f"hybrid-{sequence:08d}-{created_at.strftime('%Y%m%dT%H%M%S%fZ')}"
+            
+            with open(os.path.join(staging, 'manifest.json'), 'w') as f:
+                json.dump({
+                    'version': version,
+                    'sequence': sequence,
+                    'kind': kind,
+                    'format': artifact_format,
+                    'created_at': created_at.isoformat(),
+                    'params': params,
+                }, f, indent=2)
+            
+            _fsync_tree(staging)
+            os.rename(staging, os.path.join(MODELS_DIR, version))
+            _fsync_directory(MODELS_DIR)
+            
+            set_current_version(version)
+            recommender.version = version
+            logger.info(f"Published {kind} recommendation model version {version}")
+            
+            prune_versions()
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    
+    return version
+
+
+def prune_versions(keep=None):
+    """
+    Remove old model versions, never the served one
+    
+    The newest `keep` trained versions are kept for rollback. Incremental versions
+    do not count towards them: the newest `keep` incremental versions published
+    after the newest trained version are kept, older ones are superseded. Files
+    memory-mapped by workers stay readable until they swap models.
+    """
+    keep = KEEP_VERSIONS if keep is None else keep
+    versions = list_versions()
+    incremental = {version for version in versions if (read_manifest(version) or {}).get('kind') == 'incremental'}
+    trained = [version for version in versions if version not in incremental]
+    
+    kept = {get_current_version()}
+    if keep > 0:
+        kept.update(trained[-keep:])
+        newer = versions[versions.index(trained[-1]) + 1:] if trained else versions
+        kept.update([version for version in newer if version in incremental][-keep:])
+    
+    for version in versions:
+        if version not in kept:
+            shutil.rmtree(os.path.join(MODELS_DIR, version), ignore_errors=True)
+
+
+def rollback_recommender(version=None):
+    """
+    Serve a previously published model version
+    
+    Args:
+        version: Version to serve (defaults to the one published before the current one)
+        
+    Returns:
+        Name of the version now served, or None if there is nothing to roll back to
+    """
+    with model_store_lock():
+        versions = list_versions()
+        if version is None:
+            current = get_current_version()
+            older = versions[:versions.index(current)] if current in versions else versions
+            if not older:
+                return None
+            version = older[-1]
+        elif version not in versions:
+            return None
+        
+        set_current_version(version)
+    logger.info(f"Rolled back recommendation model to version {version}")
+    return version
+
+
+def load_recommender(version=None, mmap_mode='r'):
+    """
+    Load a published model version
+    
+    Args:
+        version: Version to load (defaults to the one named by the `current` pointer)
+        mmap_mode: Passed to np.load for array artifacts
+        
+    Returns:
+        HybridRecommender instance, or None if the version does not exist
+    """
+    version = version or get_current_version()
+    if version is None:
+        logger.warning(f"Model pointer {CURRENT_POINTER} not found")
+        return None
+    
+    manifest = read_manifest(version)
+    if manifest is None:
+        logger.warning(f"Manifest for model version {version} not found")
+        return None
+    
+    directory = os.path.join(MODELS_DIR, version)
+    if manifest['format'] == 'npy':
+        if manifest['params'].get('format_version') != ARRAYS_FORMAT_VERSION:
+            logger.warning(f"Model version {version} uses an outdated array format, retrain to replace it")
+            return None
+        recommender = HybridRecommender.load_arrays(directory, manifest['params'], mmap_mode)
+    else:
+        recommender = HybridRecommender.load(directory)
+    
+    if recommender is not None:
+        recommender.version = version
+    return recommender
+
+
+class ModelRegistry:
+    """
+    Process-wide holder for the resident hybrid recommender
+    
+    The model is loaded once per worker and then served from memory. At most
+    every `check_interval` seconds the `current` pointer is checked, and when it
+    names a different version that version is loaded and swapped in atomically.
+    """
+    def __init__(self, check_interval=None):
+        if check_interval is None:
+            check_interval = getattr(settings, 'RECOMMENDER_RELOAD_INTERVAL', 5)
+        self.check_interval = check_interval
+        self._recommender = None
+        self._version = None
+        self._last_check = None
+        self._lock = threading.Lock()
+    
+    def _is_fresh(self):
+        return (
+            self._last_check is not None and
+            time.monotonic() - self._last_check < self.check_interval
+        )
+    
+    def get(self):
+        """
+        Get the resident hybrid recommender, reloading it if the artifacts changed
+        
+        Returns:
+            HybridRecommender instance, or None if no model has been trained yet
+        """
+        if self._recommender is not None and self._is_fresh():
+            return self._recommender
+        
+        # Only one thread checks the disk; the others keep serving the current model
+        if not self._lock.acquire(blocking=self._recommender is None):
+            return self._recommender
+        
+        try:
+            if self._recommender is not None and self._is_fresh():
+                return self._recommender
+            self._last_check = time.monotonic()
+            
+            version = get_current_version()
+            if version is None or version == self._version:
+                return self._recommender
+            
+            try:
+                recommender = load_recommender(version)
+            except Exception as e:
+                # Keep the current model and retry on the next check
+                logger.warning(f"Failed to load recommendation model version {version}: {e}")
+                return self._recommender
+            
+            if recommender is not None:
+                self._recommender = recommender
+                self._version = version
+                logger.info(f"Recommendation model version {version} loaded into model registry")
+            
+            return self._recommender
+        finally:
+            self._lock.release()
+    
+    def reload(self):
+        """Force the next lookup to check the artifacts on disk"""
+        with self._lock:
+            self._last_check = None
+        return self.get()
+    
+    @property
+    def version(self):
+        """Version of the model currently served by this process, or None"""
+        return self._version
+
+
+# Resident recommender shared by all requests served by this process
+model_registry = ModelRegistry()
+
+
+class RecommendationCache:
+    """
+    Recommended products per user, kept in Django's cache so all worker processes share them
+    
+    Every user has a token in the cache that is replaced whenever their
+    interactions are written (see invalidate_many). An entry records the token
+    read before it was computed, the model version and the limit, and is only
+    served while all three still match, so a write in any process makes the
+    user's entry stale everywhere, including an entry that was being computed
+    while the write happened. Entries expire after `ttl` seconds.
+    """
+    def __init__(self, alias=None, ttl=None):
+        if alias is None:
+            alias = getattr(settings, 'RECOMMENDER_RESULT_CACHE_ALIAS', 'default')
+        if ttl is None:
+            ttl = getattr(settings, 'RECOMMENDER_RESULT_CACHE_TTL', 300)
+        self.alias = alias
+        self.ttl = ttl
+    
+    @property
+    def cache(self):
+        return caches[self.alias]
+    
+    @staticmethod
+    def _entry_key(user_id):
+        return f'recommendations:{user_id}'
+    
+    @staticmethod
+    def _token_key(user_id):
+        return f'recommendations:{user_id}:token'
+    
+    def get(self, user_id, version, limit):
+        """
+        Get a user's cached recommendations
+        
+        Returns:
+            Tuple of (list of Product objects, or None if there is no valid entry
+            for this model version and limit, and the user's current token, to be
+            passed to set() with the recomputed recommendations)
+        """
+        if self.ttl <= 0:
+            return None, None
+        
+        values = self.cache.get_many([self._entry_key(user_id), self._token_key(user_id)])
+        token = values.get(self._token_key(user_id))
+        entry = values.get(self._entry_key(user_id))
+        if entry is None:
+            return None, token
+        
+        entry_token, entry_version, entry_limit, products = entry
+        if (entry_token, entry_version, entry_limit) != (token, version, limit):
+            return None, token
+        return products, token
+    
+    def set(self, user_id, token, version, limit, products):
+        """Cache a user's recommendations, computed after `token` was read by get()"""
+        if self.ttl <= 0:
+            return
+        self.cache.set(self._entry_key(user_id), (token, version, limit, products), self.ttl)
+    
+    def invalidate_many(self, user_ids):
+        """Make the cached recommendations of users stale in every process"""
+        if self.ttl <= 0 or not user_ids:
+            return
+        
+        # Tokens outlive any entry computed before they were replaced
+        token = uuid.uuid4().hex
+        self.cache.set_many({self._token_key(user_id): token for user_id in user_ids}, 2 * self.ttl)
+    
+    def invalidate(self, user_id):
+        """Make a user's cached recommendations stale in every process"""
+        self.invalidate_many([user_id])
+
+
+# Recommendation results shared by all worker processes
+recommendation_cache = RecommendationCache()
+
+
+def iterate_chunks(iterable, chunk_size):
+    """Yield lists of up to chunk_size items from an iterable"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def load_interactions_dataframe(interactions, chunk_size=10000):
+    """
+    Stream interactions into a weighted, aggregated user-item DataFrame
+    
+    Rows are read as tuples in chunks and converted to columnar numpy arrays, so
+    no model instances or per-row dicts are created.
+    
+    Args:
+        interactions: UserProductInteraction queryset
+        chunk_size: Number of rows fetched and converted at a time
+        
+    Returns:
+        DataFrame with columns 'user_id', 'product_id', 'value' (one row per user/product)
+    """
+    user_ids, product_ids, values = [], [], []
+    rows = interactions.values_list('user_id', 'product_id', 'interaction_type', 'value').iterator(chunk_size=chunk_size)
+    for chunk in iterate_chunks(rows, chunk_size):
+        user_chunk, product_chunk, type_chunk, value_chunk = zip(*chunk)
+        
+        # Weight interactions with a vectorised lookup by interaction type
+        weights = pd.Series(type_chunk).map(INTERACTION_WEIGHTS).fillna(1).to_numpy(dtype=np.float64)
+        user_ids.append(np.fromiter(user_chunk, dtype=np.int64, count=len(chunk)))
+        product_ids.append(np.fromiter(product_chunk, dtype=np.int64, count=len(chunk)))
+        values.append(np.fromiter(value_chunk, dtype=np.float64, count=len(chunk)) * weights)
+    
+    if not user_ids:
+        return pd.DataFrame({'user_id': [], 'product_id': [], 'value': []})
+    
+    interactions_df = pd.DataFrame({
+        'user_id': np.concatenate(user_ids),
+        'product_id': np.concatenate(product_ids),
+        'value': np.concatenate(values),
+    })
     
     # Aggregate by user and product
-    interactions_df = interactions_df.groupby(['user_id', 'product_id'])['weighted_value'].sum().reset_index()
+    return interactions_df.groupby(['user_id', 'product_id'], sort=False)['value'].sum().reset_index()
+
+
+def load_products_dataframe(products, chunk_size=10000):
+    """
+    Stream product content and attributes into a DataFrame
+    
+    Args:
+        products: Product queryset
+        chunk_size: Number of rows fetched at a time
+        
+    Returns:
+        DataFrame with columns 'id', 'name', 'description', 'category', 'price', 'featured',
+        plus 'season_mask' (see season_mask), and 'countries' and 'regions' (lists of
+        codes, empty unless the product is location-specific)
+    """
+    columns = ['id', 'name', 'description', 'category', 'price', 'featured',
+               'is_location_specific', 'available_countries', 'available_regions']
+    data = {column: [] for column in columns}
+    rows = products.values_list(
+        'id', 'name', 'description', 'category__name', 'price', 'featured',
+        'is_location_specific', 'available_countries', 'available_regions'
+    ).iterator(chunk_size=chunk_size)
+    for chunk in iterate_chunks(rows, chunk_size):
+        for column, values in zip(columns, zip(*chunk)):
+            data[column].extend(values)
+    
+    products_df = pd.DataFrame(data, columns=columns)
+    products_df['id'] = products_df['id'].astype(np.int64)
+    products_df['price'] = products_df['price'].astype(np.float64)
+    
+    # Combine each product's seasons into one bitmask; products without seasons are always in season
+    season_masks = {}
+    season_rows = Product.seasons.through.objects.filter(product__in=products).values_list(
+        'product_id', 'season__start_month', 'season__end_month', 'season__hemisphere'
+    ).iterator(chunk_size=chunk_size)
+    for product_id, start_month, end_month, hemisphere in season_rows:
+        season_masks[product_id] = season_masks.get(product_id, 0) | season_mask(start_month, end_month, hemisphere)
+    products_df['season_mask'] = products_df['id'].map(season_masks).fillna(ALL_SEASONS_MASK).astype(np.int64)
+    
+    # Split comma-separated availability lists of location-specific products into codes
+    for source, column in (('available_countries', 'countries'), ('available_regions', 'regions')):
+        products_df[column] = [
+            [code.strip() for code in (value or '').split(',') if code.strip()] if specific else []
+            for specific, value in zip(data['is_location_specific'], data[source])
+        ]
+    
+    return products_df.drop(columns=['is_location_specific', 'available_countries', 'available_regions'])
+
+
+def prepare_data_for_training():
+    """
+    Prepare data for training the recommendation models
+    
+    Returns:
+        Tuple of (interactions_df, products_df)
+    """
+    # Get all interactions, weighted and aggregated by user and product
+    interactions_df = load_interactions_dataframe(UserProductInteraction.objects.all())
+    
+    if interactions_df.empty:
+        logger.warning("No interaction data found")
+        return None, None
     
     # Get all products
-    products = Product.objects.all().select_related('category')
-    
-    # Convert to DataFrame
-    products_data = []
-    for product in products:
-        products_data.append({
-            'id': product.id,
-            'name': product.name,
-            'description': product.description,
-            'category': product.category.name,
-            'price': float(product.price),
-            'featured': product.featured,
-        })
-    
-    if not products_data:
+    products_df = load_products_dataframe(Product.objects.order_by('id'))
+    
+    if products_df.empty:
         logger.warning("No product data found")
         return interactions_df, None
     
-    products_df = pd.DataFrame(products_data)
-    
     return interactions_df, products_df
 
 
-def train_recommendation_models():
+def _lock_file(fd, exclusive=True, blocking=False):
+    """Take a lock on an open file, returning False if another descriptor holds it (and not `blocking`)"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | (0 if blocking else fcntl.LOCK_NB))
+        else:
+            msvcrt.locking(fd, msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def _unlock_file(fd):
+    """Release a lock taken with _lock_file"""
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+def acquire_training_lock():
+    """
+    Try to take the cross-process training lock without blocking
+    
+    The lock is an OS file lock (flock) held through an open descriptor of
+    TRAINING_LOCK_PATH for the whole run. The kernel releases it when the holder
+    exits or is killed, so a crashed trainer never blocks training, and a live
+    run is never taken over however long it takes.
+    
+    Returns:
+        True if this process now holds the lock, False if another trainer does
+    """
+    global _training_lock_fd
+    
+    with _training_lock_guard:
+        if _training_lock_fd is not None:
+            return False
+        
+        fd = os.open(TRAINING_LOCK_PATH, os.O_CREAT | os.O_RDWR)
+        if not _lock_file(fd):
+            os.close(fd)
+            return False
+        
+        # Record the holder for operators; the lock itself is the descriptor
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()} {datetime.now().isoformat()}\n".encode())
+        _training_lock_fd = fd
+        return True
+
+
+def release_training_lock():
+    """Release the cross-process training lock held by this process"""
+    global _training_lock_fd
+    
+    with _training_lock_guard:
+        if _training_lock_fd is None:
+            return
+        fd, _training_lock_fd = _training_lock_fd, None
+        _unlock_file(fd)
+        os.close(fd)
+
+
+def training_in_progress():
+    """Check whether some live process (this one included) holds the training lock"""
+    try:
+        fd = os.open(TRAINING_LOCK_PATH, os.O_RDWR)
+    except FileNotFoundError:
+        return False
+    
+    try:
+        # A shared lock is refused while any descriptor holds the exclusive one
+        if not _lock_file(fd, exclusive=False):
+            return True
+        _unlock_file(fd)
+        return False
+    finally:
+        os.close(fd)
+
+
+def train_recommendation_models(on_phase=None):
     """
     Train and save recommendation models
+    
+    Only one process trains at a time; a call made while another training run
+    holds the lock returns False immediately.
+    
+    Args:
+        on_phase: Optional callback receiving the name of each training phase
+            ('extract', 'cf_fit', 'cb_fit', 'save') as it starts
     """
+    if not acquire_training_lock():
+        logger.warning("Recommendation model training already in progress, skipping")
+        return False
+    
+    try:
+        with training_threads():
+            return _train_recommendation_models(on_phase)
+    finally:
+        release_training_lock()
+
+
+def _train_recommendation_models(on_phase=None):
+    """Train and save recommendation models (caller holds the training lock)"""
+    if on_phase is None:
+        on_phase = lambda phase: None
+    
     logger.info("Starting recommendation model training")
     
     # Prepare data
+    on_phase('extract')
     interactions_df, products_df = prepare_data_for_training()
     
     if interactions_df is None or products_df is None:
@@ -566,9 +2161,18 @@ def train_recommendation_models():
     
     # Train hybrid recommender
     try:
-        recommender = HybridRecommender()
-        recommender.fit(interactions_df, products_df)
-        recommender.save()
+        recommender = HybridRecommender(
+            n_neighbours=getattr(settings, 'RECOMMENDER_NEIGHBOURS', 50),
+            ann_min_items=getattr(settings, 'RECOMMENDER_ANN_MIN_ITEMS', None),
+            ann_n_probe=getattr(settings, 'RECOMMENDER_ANN_N_PROBE', 8),
+        )
+        recommender.fit(interactions_df, products_df, on_phase=on_phase)
+        recommender.compact(
+            dtype=getattr(settings, 'RECOMMENDER_FACTOR_DTYPE', 'float64'),
+            quantize_neighbours=getattr(settings, 'RECOMMENDER_QUANTIZE_NEIGHBOURS', False),
+        )
+        on_phase('save')
+        publish_recommender(recommender)
         logger.info("Recommendation models trained and saved successfully")
         return True
     except Exception as e:
@@ -576,6 +2180,53 @@ def train_recommendation_models():
         return False
 
 
+def update_content_model(product_ids):
+    """
+    Apply product additions and edits to the served content model without a full retrain
+    
+    Runs in the background (see training_jobs.content_updates). The update is built
+    from the latest published version while holding the content update lock, so
+    concurrent updates from different processes are applied on top of each other
+    instead of one replacing the other. Queues a full training job when vocabulary
+    drift passes the threshold.
+    
+    Args:
+        product_ids: IDs of the products that were created or changed
+        
+    Returns:
+        True if an updated model was published, False otherwise
+    """
+    from .models import TrainingJob
+    from .training_jobs import submit_training_job
+    
+    products_df = load_products_dataframe(Product.objects.filter(id__in=product_ids))
+    if products_df.empty:
+        return False
+    
+    with _file_lock(CONTENT_UPDATE_LOCK_PATH):
+        recommender = model_registry.reload()
+        version = get_current_version()
+        if recommender is not None and recommender.version != version:
+            recommender = load_recommender(version)
+        if recommender is None:
+            # Nothing trained yet; the next training run will include the products
+            return False
+        
+        # Update a copy, so requests keep using the resident model until the new one is published
+        updated = copy.copy(recommender)
+        updated.cb_model = copy.copy(recommender.cb_model)
+        if not updated.cb_model.update_products(products_df):
+            if not TrainingJob.objects.filter(status__in=['pending', 'running']).exists():
+                logger.info("Vocabulary drift threshold exceeded, queueing a training job")
+                submit_training_job()
+            return False
+        
+        publish_recommender(updated, kind='incremental')
+    
+    model_registry.reload()
+    return True
+
+
 def get_user_profile(user_id):
     """
     Get user profile for content-based recommendations
@@ -586,49 +2237,54 @@ def get_user_profile(user_id):
     Returns:
         Dictionary with user profile data
     """
-    # Get user's interactions
-    interactions = UserProductInteraction.objects.filter(user_id=user_id)
+    interactions = list(
+        UserProductInteraction.objects.filter(user_id=user_id).values_list('product_id', 'interaction_type', 'value')
+    )
+    product_categories = dict(
+        Product.objects.filter(id__in={product_id for product_id, _, _ in interactions}).values_list('id', 'category_id')
+    )
+    return build_user_profile(interactions, product_categories)
+
+
+def build_user_profile(interactions, product_categories):
+    """
+    Build a user profile for content-based recommendations from interactions already loaded
     
+    Args:
+        interactions: List of the user's (product_id, interaction_type, value) tuples
+        product_categories: Dictionary mapping product IDs to category IDs
+        
+    Returns:
+        Dictionary with user profile data
+    """
     if not interactions:
         return {'liked_categories': [], 'liked_products': []}
     
-    # Get products the user has interacted with
-    product_ids = interactions.values_list('product_id', flat=True)
-    products = Product.objects.filter(id__in=product_ids)
-    
-    # Get categories the user has shown interest in
+    # Get categories the user has shown interest in, by number of products
     category_counts = {}
-    for product in products:
-        category_id = product.category_id
-        if category_id in category_counts:
-            category_counts[category_id] += 1
-        else:
-            category_counts[category_id] = 1
+    for product_id in dict.fromkeys(product_id for product_id, _, _ in interactions):
+        if product_id in product_categories:
+            category_id = product_categories[product_id]
+            category_counts[category_id] = category_counts.get(category_id, 0) + 1
+    liked_categories = sorted(category_counts, key=category_counts.get, reverse=True)
     
-    # Get top categories
-    liked_categories = sorted(category_counts.items(), key=lambda x: x[1], reverse=True)
-    liked_categories = [cat_id for cat_id, count in liked_categories]
+    # Summarise each product's interactions
+    interaction_counts = {}
+    high_ratings = set()
+    purchases = set()
+    for product_id, interaction_type, value in interactions:
+        interaction_counts[product_id] = interaction_counts.get(product_id, 0) + 1
+        if interaction_type == 'review' and value >= 4:
+            high_ratings.add(product_id)
+        elif interaction_type == 'purchase':
+            purchases.add(product_id)
     
-    # Get products with high ratings or multiple interactions
-    liked_products = []
-    for product_id in product_ids:
-        product_interactions = interactions.filter(product_id=product_id)
-        
-        # Check if user rated the product highly
-        reviews = product_interactions.filter(interaction_type='review')
-        if reviews.exists() and reviews.first().value >= 4:
-            liked_products.append(product_id)
-            continue
-        
-        # Check if user purchased the product
-        purchases = product_interactions.filter(interaction_type='purchase')
-        if purchases.exists():
-            liked_products.append(product_id)
-            continue
-        
-        # Check if user has multiple interactions with the product
-        if product_interactions.count() >= 2:
-            liked_products.append(product_id)
+    # Products with high ratings, purchases or multiple interactions, once per interaction,
+    # so that products the user interacted with in more ways weigh more
+    liked_products = [
+        product_id for product_id, _, _ in interactions
+        if product_id in high_ratings or product_id in purchases or interaction_counts[product_id] >= 2
+    ]
     
     return {
         'liked_categories': liked_categories,
@@ -636,48 +2292,13 @@ def get_user_profile(user_id):
     }
 
 
-def get_recommendations_for_user(user_id, limit=8):
+def user_context(user):
     """
-    Get recommended products for a user using the hybrid recommender
+    Get a user's hemisphere and location for seasonal and location boosts
     
-    Args:
-        user_id: User ID
-        limit: Number of recommendations to return
-        
     Returns:
-        List of Product objects
+        Tuple of (hemisphere 'N' or 'S', location dictionary or None)
     """
-    from django.contrib.auth import get_user_model
-    User = get_user_model()
-    
-    try:
-        user = User.objects.get(id=user_id)
-    except User.DoesNotExist:
-        logger.warning(f"User {user_id} not found")
-        return []
-    
-    # Load hybrid recommender
-    recommender = HybridRecommender.load()
-    if recommender is None:
-        logger.warning("Failed to load hybrid recommender, training new models")
-        if not train_recommendation_models():
-            logger.error("Failed to train recommendation models")
-            return []
-        recommender = HybridRecommender.load()
-        if recommender is None:
-            logger.error("Failed to load newly trained models")
-            return []
-    
-    # Get user profile for content-based recommendations
-    user_profile = get_user_profile(user_id)
-    
-    # Get products the user has interacted with
-    interacted_products = UserProductInteraction.objects.filter(user_id=user_id).values_list('product_id', flat=True)
-    
-    # Get current month and user's location for seasonal and location filtering
-    current_month = datetime.now().month
-    
-    # Determine user's hemisphere based on country
     hemisphere = 'N'  # Default to Northern hemisphere
     user_location = None
     
@@ -695,19 +2316,216 @@ def get_recommendations_for_user(user_id, limit=8):
             'region': user.state if hasattr(user, 'state') else None
         }
     
-    # Get recommendations
-    recommendations = recommender.recommend_for_user(
-        user_id, 
-        user_profile=user_profile,
-        n=limit*2,
-        exclude_items=list(interacted_products),
-        current_month=current_month,
-        hemisphere=hemisphere,
-        user_location=user_location
+    return hemisphere, user_location
+
+
+def hybrid_recommendations(recommender, users, n):
+    """
+    Score several users with the hybrid recommender, as on the request path
+    
+    The users' current interactions are read with one query, folded into the CF
+    latent space and turned into content profiles, so users that are new or have
+    interacted since training are scored on what they did, not on the training
+    snapshot. Seasonal and location boosts use each user's country.
+    
+    Args:
+        recommender: HybridRecommender instance
+        users: List of User objects
+        n: Number of recommendations per user
+        
+    Returns:
+        Dictionary mapping user IDs to lists of (product_id, score) tuples
+    """
+    # Get the users' current interactions
+    interactions = {user.id: [] for user in users}
+    for user_id, product_id, interaction_type, value, updated_at in UserProductInteraction.objects.filter(
+        user_id__in=list(interactions)
+    ).values_list('user_id', 'product_id', 'interaction_type', 'value', 'updated_at').iterator(chunk_size=2000):
+        interactions[user_id].append((product_id, interaction_type, value, updated_at))
+    product_categories = dict(Product.objects.filter(
+        id__in={product_id for rows in interactions.values() for product_id, _, _, _ in rows}
+    ).values_list('id', 'category_id'))
+    
+    # Get current month for seasonal filtering
+    current_month = datetime.now().month
+    
+    # Fold in and score a block at a time; a block never outgrows the fold-in cache,
+    # so its users' latent vectors are still cached when the block is scored
+    cf_model = recommender.cf_model
+    block_size = max(1, min(SCORING_BLOCK_SIZE, cf_model.fold_in_cache_size))
+    
+    recommendations = {}
+    for start in range(0, len(users), block_size):
+        block = users[start:start + block_size]
+        user_profiles, exclude_items, user_contexts = {}, {}, {}
+        
+        for user in block:
+            user_interactions = interactions[user.id]
+            
+            # Fold the interactions into the CF latent space, so users that are new or
+            # have interacted since training get collaborative recommendations right away
+            if user_interactions:
+                item_ids = [product_id for product_id, _, _, _ in user_interactions]
+                values = [value * INTERACTION_WEIGHTS.get(interaction_type, 1) for _, interaction_type, value, _ in user_interactions]
+                # Upserts of existing interactions bump updated_at, so they change the signature too
+                signature = (len(user_interactions), sum(values), max(updated_at for _, _, _, updated_at in user_interactions))
+                cf_model.fold_in_user(user.id, item_ids, values, signature=signature)
+            
+            user_profiles[user.id] = build_user_profile(
+                [(product_id, interaction_type, value) for product_id, interaction_type, value, _ in user_interactions],
+                product_categories,
+            )
+            exclude_items[user.id] = list({product_id for product_id, _, _, _ in user_interactions})
+            user_contexts[user.id] = user_context(user)
+        
+        recommendations.update(recommender.recommend_for_users(
+            [user.id for user in block],
+            user_profiles=user_profiles,
+            n=n,
+            exclude_items=exclude_items,
+            current_month=current_month,
+            user_contexts=user_contexts,
+        ))
+    
+    return recommendations
+
+
+def request_training_on_miss():
+    """
+    Start a background training run when no model is available to serve
+    
+    Safe to call on every request: nothing is queued while a training run holds
+    the lock or this process already has a fallback job pending or running.
+    """
+    global _fallback_training_job_id
+    
+    if training_in_progress():
+        return
+    
+    from .models import TrainingJob
+    from .training_jobs import submit_training_job
+    
+    with _fallback_training_lock:
+        if _fallback_training_job_id is not None and TrainingJob.objects.filter(
+            id=_fallback_training_job_id, status__in=['pending', 'running']
+        ).exists():
+            return
+        job = submit_training_job(only_if_missing=True)
+        _fallback_training_job_id = job.id
+        logger.info(f"Queued training job {job.id} to replace the missing recommendation model")
+
+
+def popular_product_ids(category_id=None):
+    """
+    Get the IDs of the most interacted-with products, cached per process
+    
+    Counting interactions over the catalog is an aggregate over every product, so
+    the ranking is recomputed at most every POPULAR_PRODUCTS_TTL seconds.
+    
+    Args:
+        category_id: Optional category to rank within
+        
+    Returns:
+        List of up to POPULAR_PRODUCTS_POOL product IDs, most popular first
+    """
+    now = time.monotonic()
+    with _popular_products_lock:
+        cached = _popular_products.get(category_id)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+    
+    products = Product.objects.all()
+    if category_id is not None:
+        products = products.filter(category_id=category_id)
+    product_ids = list(
+        products.annotate(interaction_count=Count('user_interactions'))
+        .order_by('-interaction_count', '-featured', '-created_at')
+        .values_list('id', flat=True)[:POPULAR_PRODUCTS_POOL]
     )
     
+    with _popular_products_lock:
+        _popular_products[category_id] = (now + POPULAR_PRODUCTS_TTL, product_ids)
+    return product_ids
+
+
+def get_popular_products(limit=8, exclude_user_id=None, product_id=None):
+    """
+    Get the most interacted-with products, used while no trained model is available
+    
+    Args:
+        limit: Number of products to return
+        exclude_user_id: Optional user whose interacted products are left out
+        product_id: Optional product to find alternatives for; restricts the
+            results to its category and leaves it out
+        
+    Returns:
+        List of Product objects
+    """
+    category_id = None
+    excluded = set()
+    
+    if exclude_user_id is not None:
+        excluded.update(
+            UserProductInteraction.objects.filter(user_id=exclude_user_id).values_list('product_id', flat=True)
+        )
+    
+    if product_id is not None:
+        category_id = Product.objects.filter(id=product_id).values_list('category_id', flat=True).first()
+        if category_id is None:
+            return []
+        excluded.add(product_id)
+    
+    product_ids = [pid for pid in popular_product_ids(category_id) if pid not in excluded][:limit]
+    products = Product.objects.in_bulk(product_ids)
+    return [products[pid] for pid in product_ids if pid in products]
+
+
+def get_recommendations_for_user(user_id, limit=8):
+    """
+    Get recommended products for a user using the hybrid recommender
+    
+    Args:
+        user_id: User ID
+        limit: Number of recommendations to return
+        
+    Returns:
+        List of Product objects
+    """
+    from django.contrib.auth import get_user_model
+    User = get_user_model()
+    
+    # Get resident hybrid recommender
+    recommender = model_registry.get()
+    
+    # Repeated requests between the user's interactions are served from the cache
+    if recommender is not None:
+        cached, cache_token = recommendation_cache.get(user_id, recommender.version, limit)
+        if cached is not None:
+            return cached
+    
+    try:
+        user = User.objects.get(id=user_id)
+    except User.DoesNotExist:
+        logger.warning(f"User {user_id} not found")
+        return []
+    
+    if recommender is None:
+        logger.warning("No trained hybrid recommender, serving popular products")
+        request_training_on_miss()
+        return get_popular_products(limit, exclude_user_id=user_id)
+    
+    # Score with the serving thread budget
+    start = time.perf_counter()
+    with serving_threads():
+        recommendations = hybrid_recommendations(recommender, [user], limit * 2)[user.id]
+        logger.info(
+            f"Scored recommendations for user {user_id} in {(time.perf_counter() - start) * 1000:.2f} ms "
+            f"(BLAS threads: {current_threads() or 'default'})"
+        )
+    
     if not recommendations:
         logger.warning(f"No recommendations generated for user {user_id}")
+        recommendation_cache.set(user_id, cache_token, recommender.version, limit, [])
         return []
     
     # Get recommended product IDs
@@ -720,6 +2538,7 @@ def get_recommendations_for_user(user_id, limit=8):
     product_dict = {product.id: product for product in products}
     sorted_products = [product_dict[product_id] for product_id in product_ids if product_id in product_dict]
     
+    recommendation_cache.set(user_id, cache_token, recommender.version, limit, sorted_products[:limit])
     return sorted_products[:limit]
 
 
@@ -734,20 +2553,21 @@ def get_similar_products(product_id, limit=4):
     Returns:
         List of Product objects
     """
-    # Load hybrid recommender
-    recommender = HybridRecommender.load()
+    # Get resident hybrid recommender
+    recommender = model_registry.get()
     if recommender is None:
-        logger.warning("Failed to load hybrid recommender, training new models")
-        if not train_recommendation_models():
-            logger.error("Failed to train recommendation models")
-            return []
-        recommender = HybridRecommender.load()
-        if recommender is None:
-            logger.error("Failed to load newly trained models")
-            return []
+        logger.warning("No trained hybrid recommender, serving popular products")
+        request_training_on_miss()
+        return get_popular_products(limit, product_id=product_id)
     
-    # Get similar products
-    similar_products = recommender.get_similar_items(product_id, n=limit)
+    # Get similar products with the serving thread budget
+    start = time.perf_counter()
+    with serving_threads():
+        similar_products = recommender.get_similar_items(product_id, n=limit)
+        logger.info(
+            f"Scored similar products for product {product_id} in {(time.perf_counter() - start) * 1000:.2f} ms "
+            f"(BLAS threads: {current_threads() or 'default'})"
+        )
     
     if not similar_products:
         logger.warning(f"No similar products found for product {product_id}")
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from products.models import Product
 
 class UserProductInteraction(models.Model):
@@ -15,6 +16,7 @@ class UserProductInteraction(models.Model):
     interaction_type = models.CharField(max_length=10, choices=INTERACTION_TYPES)
     value = models.FloatField(default=1.0)  # Strength of interaction (e.g., rating value)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # Set explicitly by bulk upserts, which skip auto_now
     
     class Meta:
         unique_together = ('user', 'product', 'interaction_type')
@@ -47,3 +49,100 @@ class UserProductRecommendation(models.Model):
     def __str__(self):
         return f"Recommendation of {self.product.name} for {self.user.username}: {self.score}"
 
+class TrainingJob(models.Model):
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    )
+    
+    PHASE_CHOICES = (
+        ('queued', 'Queued'),
+        ('extract', 'Extracting data'),
+        ('cf_fit', 'Fitting collaborative filtering model'),
+        ('cb_fit', 'Fitting content-based model'),
+        ('save', 'Saving models'),
+        ('done', 'Done'),
+    )
+    
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, blank=True, null=True, related_name='training_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    phase = models.CharField(max_length=20, choices=PHASE_CHOICES, default='queued')
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Training job {self.id}: {self.status} ({self.phase})"
+    
+    @property
+    def elapsed_seconds(self):
+        if not self.started_at:
+            return None
+        end = self.finished_at or timezone.now()
+        return (end - self.started_at).total_seconds()
+
+class InteractionSyncState(models.Model):
+    """Watermark of the incremental interaction sync for one source"""
+    SOURCE_CHOICES = (
+        ('review', 'Reviews'),
+        ('purchase', 'Order items'),
+    )
+    
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, unique=True)
+    synced_until = models.DateTimeField(blank=True, null=True)  # updated_at of the newest synced source row
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.get_source_display()} synced until {self.synced_until}"
+
+class PopularitySegment(models.Model):
+    """Precomputed cold-start products for users of one country, hemisphere and month"""
+    HEMISPHERE_CHOICES = (
+        ('N', 'Northern'),
+        ('S', 'Southern'),
+    )
+    
+    country = models.CharField(max_length=100, blank=True)  # Blank for users without a country
+    hemisphere = models.CharField(max_length=1, choices=HEMISPHERE_CHOICES)
+    month = models.PositiveSmallIntegerField()
+    # Ranked [product_id, country location boost, available regions (None unless location-specific)] entries
+    products = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ('country', 'hemisphere', 'month')
+    
+    def __str__(self):
+        return f"Popular products for {self.country or 'any country'} ({self.hemisphere}), month {self.month}"
+    
+    def ranked_products(self, region=None, limit=20, existing_ids=None):
+        """
+        Get (product_id, score) pairs for a user in this segment, scored like the live cold-start fallback
+        
+        Args:
+            region: The user's region; location-specific products not available there are skipped
+            limit: Number of products to return
+            existing_ids: Optional set of product IDs that still exist; products deleted
+                since the segment was refreshed are skipped
+        """
+        ranked = []
+        for product_id, location_boost, regions in self.products:
+            if existing_ids is not None and product_id not in existing_ids:
+                continue
+            if self.country and region and regions is not None:
+                if region.lower() not in regions.lower():
+                    continue
+                if region in regions:
+                    location_boost += 0.05
+            
+            # Base score decreases with position; every product in a segment is in season (+0.2)
+            ranked.append((product_id, 1.0 - (len(ranked) * 0.05) + 0.2 + location_boost))
+            if len(ranked) == limit:
+                break
+        return ranked
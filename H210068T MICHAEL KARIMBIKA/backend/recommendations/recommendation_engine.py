@@ -1,12 +1,20 @@
 import numpy as np
-import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
-from django.db.models import Count, Avg, Q
+from scipy import sparse
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.db.models import Count, Avg, Sum, Q
 from django.contrib.auth import get_user_model
 from products.models import Product, Review
-from orders.models import OrderItem
-from .models import UserProductInteraction, ProductSimilarity, UserProductRecommendation
-from .ml_models import train_recommendation_models, get_recommendations_for_user, get_similar_products
+from orders.models import Order, OrderItem
+from .models import (
+    UserProductInteraction, ProductSimilarity, UserProductRecommendation, PopularitySegment, InteractionSyncState,
+)
+from .ml_models import (
+    train_recommendation_models, get_recommendations_for_user, get_similar_products,
+    season_bit, season_mask, ALL_SEASONS_MASK, INTERACTION_WEIGHTS, build_neighbour_table, load_interactions_dataframe,
+    recommendation_cache, model_registry, hybrid_recommendations,
+)
 import datetime
 import logging
 
@@ -15,6 +23,21 @@ logger = logging.getLogger(__name__)
 
 User = get_user_model()
 
+# Countries served with Southern hemisphere seasons; all others use the Northern ones
+SOUTHERN_COUNTRIES = ['AU', 'NZ', 'AR', 'BR', 'CL', 'ZA']
+
+# The interaction sync re-reads rows stamped this long before its watermark, so rows
+# saved before the watermark but committed after the previous sync are not missed
+SYNC_SAFETY_LAG = datetime.timedelta(seconds=getattr(settings, 'RECOMMENDER_SYNC_SAFETY_LAG', 300))
+
+
+def in_season(product, month, hemisphere='N'):
+    """Product.is_in_season using the product's prefetched seasons, so it runs no queries"""
+    mask = 0
+    for season in product.seasons.all():
+        mask |= season_mask(season.start_month, season.end_month, season.hemisphere)
+    return not mask or bool(mask & (1 << season_bit(month, hemisphere)))
+
 
 class RecommendationEngine:
     """
@@ -22,41 +45,117 @@ class RecommendationEngine:
     """
     
     @staticmethod
-    def update_user_product_interactions():
+    def update_user_product_interactions(chunk_size=1000):
         """
-        Update user-product interactions based on views, cart additions, purchases, and reviews
+        Sync user-product interactions with the reviews and purchases changed since the last run
+        
+        Reviews are tracked by their updated_at and order items by their order's
+        updated_at, against watermarks stored in InteractionSyncState. Each run
+        starts SYNC_SAFETY_LAG before the watermark, because updated_at is stamped
+        when a row is saved, not when its transaction commits. Changed interactions
+        are upserted on the (user, product, interaction_type) unique constraint, so
+        re-reading rows is harmless and the table is never emptied mid-run. A
+        purchase's value is the total quantity the user bought of the product across
+        all orders. Deleted reviews and orders are not removed from the interactions.
+        
+        Args:
+            chunk_size: Rows read and written per batch
+            
+        Returns:
+            Number of interactions written
         """
-        # Clear existing interactions
-        UserProductInteraction.objects.all().delete()
-        
-        # Add interactions from reviews
-        reviews = Review.objects.all()
-        for review in reviews:
-            UserProductInteraction.objects.create(
-                user=review.user,
-                product=review.product,
-                interaction_type='review',
-                value=review.rating
-            )
+        written = 0
         
-        # Add interactions from purchases
-        order_items = OrderItem.objects.all()
-        for item in order_items:
-            UserProductInteraction.objects.create(
-                user=item.order.user,
-                product=item.product,
-                interaction_type='purchase',
-                value=item.quantity
-            )
+        # Reviews: the latest rating of each product by each user
+        with transaction.atomic():
+            state, _ = InteractionSyncState.objects.select_for_update().get_or_create(source='review')
+            reviews = Review.objects.all()
+            if state.synced_until is not None:
+                reviews = reviews.filter(updated_at__gte=state.synced_until - SYNC_SAFETY_LAG)
+            
+            ratings = {}
+            for user_id, product_id, rating, updated_at in reviews.order_by('updated_at').values_list(
+                'user_id', 'product_id', 'rating', 'updated_at'
+            ).iterator(chunk_size=chunk_size):
+                ratings[(user_id, product_id)] = rating
+                state.synced_until = max(state.synced_until or updated_at, updated_at)
+            
+            written += RecommendationEngine._upsert_interactions('review', ratings, chunk_size)
+            state.save()
+        
+        # Purchases: re-total every (user, product) pair that appears in a changed order
+        with transaction.atomic():
+            state, _ = InteractionSyncState.objects.select_for_update().get_or_create(source='purchase')
+            orders = Order.objects.all()
+            if state.synced_until is not None:
+                orders = orders.filter(updated_at__gte=state.synced_until - SYNC_SAFETY_LAG)
+            
+            changed_pairs = set()
+            for user_id, product_id, updated_at in OrderItem.objects.filter(order__in=orders).order_by(
+                'order__updated_at'
+            ).values_list('order__user_id', 'product_id', 'order__updated_at').iterator(chunk_size=chunk_size):
+                changed_pairs.add((user_id, product_id))
+                state.synced_until = max(state.synced_until or updated_at, updated_at)
+            
+            user_ids = sorted({user_id for user_id, _ in changed_pairs})
+            quantities = {}
+            for start in range(0, len(user_ids), chunk_size):
+                totals = OrderItem.objects.filter(
+                    order__user_id__in=user_ids[start:start + chunk_size]
+                ).values_list('order__user_id', 'product_id').annotate(total=Sum('quantity'))
+                for user_id, product_id, total in totals:
+                    if (user_id, product_id) in changed_pairs:
+                        quantities[(user_id, product_id)] = total
+            
+            written += RecommendationEngine._upsert_interactions('purchase', quantities, chunk_size)
+            state.save()
+        
+        # Views and cart additions are recorded as they happen (see event_buffer.py)
+        
+        logger.info(f"Updated user-product interactions: {written} interactions written")
+        return written
+    
+    @staticmethod
+    def _upsert_interactions(interaction_type, values, chunk_size=1000):
+        """
+        Insert or update interactions of one type
         
-        # Note: In a real application, you would also track views and cart additions
+        Args:
+            interaction_type: Interaction type of every row
+            values: Dictionary mapping (user_id, product_id) pairs to interaction values
+            chunk_size: Rows written per INSERT
+        """
+        # bulk_create does not apply auto_now to updated rows
+        now = timezone.now()
+        rows = [
+            UserProductInteraction(
+                user_id=user_id, product_id=product_id, interaction_type=interaction_type, value=value, updated_at=now
+            )
+            for (user_id, product_id), value in values.items()
+        ]
+        UserProductInteraction.objects.bulk_create(
+            rows,
+            batch_size=chunk_size,
+            update_conflicts=True,
+            unique_fields=['user', 'product', 'interaction_type'],
+            update_fields=['value', 'updated_at'],
+        )
         
-        logger.info(f"Updated user-product interactions: {UserProductInteraction.objects.count()} interactions")
+        # The users' cached recommendations are stale once the rows are committed
+        user_ids = sorted({user_id for user_id, _ in values})
+        transaction.on_commit(lambda: recommendation_cache.invalidate_many(user_ids))
+        return len(rows)
     
     @staticmethod
-    def calculate_product_similarities():
+    def calculate_product_similarities(chunk_size=1000):
         """
         Calculate product similarities based on user interactions
+        
+        If the models cannot be trained, the top-K item-item cosine similarities of
+        the interaction matrix are stored as ProductSimilarity rows instead.
+        
+        Args:
+            chunk_size: Products whose similarities are written per batch
         """
         # Train recommendation models
         success = train_recommendation_models()
@@ -64,92 +163,51 @@ class RecommendationEngine:
         if not success:
             logger.error("Failed to train recommendation models, falling back to simple similarity calculation")
             
-            # Get all interactions
-            interactions = UserProductInteraction.objects.all()
+            # Weighted interactions, aggregated per user and product
+            interactions_df = load_interactions_dataframe(UserProductInteraction.objects.all())
             
-            if not interactions:
+            if interactions_df.empty:
                 logger.warning("No interactions found, skipping similarity calculation")
                 return
             
-            # Convert to DataFrame
-            interaction_data = []
-            for interaction in interactions:
-                interaction_data.append({
-                    'user_id': interaction.user.id,
-                    'product_id': interaction.product.id,
-                    'interaction_type': interaction.interaction_type,
-                    'value': interaction.value
-                })
-            
-            if not interaction_data:
-                logger.warning("No interaction data found, skipping similarity calculation")
-                return
-            
-            df = pd.DataFrame(interaction_data)
+            # Only products that still exist
+            existing_ids = np.fromiter(Product.objects.values_list('id', flat=True), dtype=np.int64)
+            interactions_df = interactions_df[interactions_df['product_id'].isin(existing_ids)]
             
-            # Create user-item matrix
-            # Weight interactions: reviews (5x), purchases (3x), cart additions (2x), views (1x)
-            df['weighted_value'] = df.apply(
-                lambda row: row['value'] * (
-                    5 if row['interaction_type'] == 'review' else
-                    3 if row['interaction_type'] == 'purchase' else
-                    2 if row['interaction_type'] == 'cart' else 1
-                ), axis=1
+            # Create sparse item-user matrix
+            product_ids, item_indices = np.unique(interactions_df['product_id'].to_numpy(), return_inverse=True)
+            user_ids, user_indices = np.unique(interactions_df['user_id'].to_numpy(), return_inverse=True)
+            item_user_matrix = sparse.csr_matrix(
+                (interactions_df['value'].to_numpy(dtype=np.float64), (item_indices, user_indices)),
+                shape=(len(product_ids), len(user_ids)),
             )
             
-            # Aggregate by user and product
-            user_item_df = df.groupby(['user_id', 'product_id'])['weighted_value'].sum().unstack().fillna(0)
-            
-            # Calculate item-item similarity matrix
-            item_similarity = cosine_similarity(user_item_df.T)
-            
-            # Convert to DataFrame with product IDs
-            item_similarity_df = pd.DataFrame(
-                item_similarity,
-                index=user_item_df.columns,
-                columns=user_item_df.columns
+            # Calculate top-K item-item cosine similarities block by block
+            neighbour_indices, neighbour_scores = build_neighbour_table(
+                item_user_matrix, k=getattr(settings, 'RECOMMENDER_NEIGHBOURS', 50)
             )
             
-            # Clear existing similarities
-            ProductSimilarity.objects.all().delete()
-            
-            # Save similarities to database
-            products = Product.objects.all()
-            product_ids = [p.id for p in products]
-            
-            for i, product1_id in enumerate(item_similarity_df.index):
-                if product1_id not in product_ids:
-                    continue
-                    
-                for product2_id in item_similarity_df.columns[i+1:]:
-                    if product2_id not in product_ids:
-                        continue
-                        
-                    similarity = item_similarity_df.loc[product1_id, product2_id]
-                    
+            # Replace all similarities in one transaction, so readers never see an empty table
+            similarity_count = 0
+            with transaction.atomic():
+                ProductSimilarity.objects.all().delete()
+                
+                for start in range(0, len(product_ids), chunk_size):
                     # Skip if similarity is too low
-                    if similarity < 0.1:
-                        continue
-                    
-                    # Get product objects
-                    product1 = Product.objects.get(id=product1_id)
-                    product2 = Product.objects.get(id=product2_id)
-                    
-                    # Save similarity
-                    ProductSimilarity.objects.create(
-                        product1=product1,
-                        product2=product2,
-                        similarity_score=similarity
-                    )
-                    
-                    # Save reverse similarity
-                    ProductSimilarity.objects.create(
-                        product1=product2,
-                        product2=product1,
-                        similarity_score=similarity
-                    )
-            
-            logger.info(f"Calculated product similarities: {ProductSimilarity.objects.count()} similarity pairs")
+                    rows, cols = np.nonzero(neighbour_scores[start:start + chunk_size] >= 0.1)
+                    rows += start
+                    similarities = [
+                        ProductSimilarity(
+                            product1_id=int(product_ids[row]),
+                            product2_id=int(product_ids[neighbour_indices[row, col]]),
+                            similarity_score=float(neighbour_scores[row, col]),
+                        )
+                        for row, col in zip(rows, cols)
+                    ]
+                    ProductSimilarity.objects.bulk_create(similarities, batch_size=1000)
+                    similarity_count += len(similarities)
+            
+            logger.info(f"Calculated product similarities: {similarity_count} similarity pairs")
     
     @staticmethod
     def generate_recommendations_for_user(user):
@@ -166,8 +224,13 @@ class RecommendationEngine:
         if not recommended_products:
             logger.warning(f"No recommendations generated for user {user.id}, falling back to simple method")
             
-            # Get products the user has interacted with
-            interacted_products = UserProductInteraction.objects.filter(user=user).values_list('product_id', flat=True)
+            # Get the user's weighted interaction value per product in one query
+            interaction_values = {}
+            for product_id, interaction_type, value in UserProductInteraction.objects.filter(user=user).values_list(
+                'product_id', 'interaction_type', 'value'
+            ):
+                interaction_values[product_id] = interaction_values.get(product_id, 0) + value * INTERACTION_WEIGHTS.get(interaction_type, 1)
+            interacted_products = list(interaction_values)
             
             # Get all products
             all_products = Product.objects.all()
@@ -204,26 +267,44 @@ class RecommendationEngine:
                         Q(available_regions__icontains=user_region)
                     )
             
+            # Popular products with their seasons prefetched, for in_season checks without queries
+            # (annotation names must not shadow the Product.review_count property)
+            popular_products = new_products.annotate(
+                num_reviews=Count('reviews'),
+                avg_rating=Avg('reviews__rating')
+            ).filter(num_reviews__gt=0).order_by('-avg_rating', '-num_reviews').prefetch_related('seasons')
+            
             # If user has no interactions, recommend popular products that are in season and location-relevant
             if not interacted_products:
-                popular_products = new_products.annotate(
-                    review_count=Count('reviews'),
-                    avg_rating=Avg('reviews__rating')
-                ).filter(review_count__gt=0).order_by('-avg_rating', '-review_count')[:20]
+                # Read the precomputed segment (see refresh_popularity_segments) if there is one
+                segment = PopularitySegment.objects.filter(
+                    country=user_country or '', hemisphere=hemisphere, month=current_month
+                ).first()
+                if segment is not None:
+                    # Skip products deleted since the segment was refreshed
+                    existing_ids = set(Product.objects.filter(
+                        id__in=[product_id for product_id, _, _ in segment.products]
+                    ).values_list('id', flat=True))
+                    UserProductRecommendation.objects.bulk_create([
+                        UserProductRecommendation(user=user, product_id=product_id, score=score)
+                        for product_id, score in segment.ranked_products(user_region, existing_ids=existing_ids)
+                    ])
+                    return
                 
                 # Filter for seasonal relevance
                 in_season_products = []
-                for product in popular_products:
-                    if product.is_in_season(current_month, hemisphere):
+                for product in popular_products[:20]:
+                    if in_season(product, current_month, hemisphere):
                         in_season_products.append(product)
                 
                 # Create recommendations with seasonal boost
+                rows = []
                 for i, product in enumerate(in_season_products[:20]):
                     # Base score decreases with position
                     base_score = 1.0 - (i * 0.05)
                     
                     # Seasonal boost: products in season get a 20% boost
-                    seasonal_boost = 0.2 if product.is_in_season(current_month, hemisphere) else 0
+                    seasonal_boost = 0.2
                     
                     # Location boost: products specific to user's location get a 15% boost
                     location_boost = 0
@@ -236,59 +317,44 @@ class RecommendationEngine:
                     # Final score
                     final_score = base_score + seasonal_boost + location_boost
                     
-                    UserProductRecommendation.objects.create(
-                        user=user,
-                        product=product,
-                        score=final_score
-                    )
+                    rows.append(UserProductRecommendation(user=user, product=product, score=final_score))
                 
+                UserProductRecommendation.objects.bulk_create(rows)
                 return
             
-            # Calculate recommendation scores based on similar products
+            # Calculate recommendation scores based on similar products, fetching every
+            # similarity of every interacted product with its similar product in one join
             recommendations = {}
-            
-            for product_id in interacted_products:
-                # Get user's interaction value for this product
-                interactions = UserProductInteraction.objects.filter(user=user, product_id=product_id)
-                interaction_value = sum(
-                    i.value * (
-                        5 if i.interaction_type == 'review' else
-                        3 if i.interaction_type == 'purchase' else
-                        2 if i.interaction_type == 'cart' else 1
-                    ) for i in interactions
-                )
-                
-                # Get similar products
-                similarities = ProductSimilarity.objects.filter(product1_id=product_id)
+            similarities = ProductSimilarity.objects.filter(
+                product1_id__in=interacted_products
+            ).exclude(
+                product2_id__in=interacted_products
+            ).select_related('product2').prefetch_related('product2__seasons')
+            
+            for similarity in similarities:
+                similar_product = similarity.product2
                 
-                for similarity in similarities:
-                    similar_product = similarity.product2
-                    
-                    # Skip if user has already interacted with this product
-                    if similar_product.id in interacted_products:
+                # Skip if product is not available in user's location
+                if user_country and similar_product.is_location_specific:
+                    if user_country not in (similar_product.available_countries or ''):
                         continue
-                    
-                    # Skip if product is not available in user's location
-                    if user_country and similar_product.is_location_specific:
-                        if user_country not in (similar_product.available_countries or ''):
-                            continue
-                        if user_region and user_region not in (similar_product.available_regions or ''):
-                            continue
-                    
-                    # Calculate base recommendation score
-                    base_score = similarity.similarity_score * interaction_value
-                    
-                    # Apply seasonal boost
-                    seasonal_boost = 0.2 if similar_product.is_in_season(current_month, hemisphere) else 0
-                    
-                    # Final score
-                    final_score = base_score * (1 + seasonal_boost)
-                    
-                    # Add to recommendations
-                    if similar_product.id in recommendations:
-                        recommendations[similar_product.id] += final_score
-                    else:
-                        recommendations[similar_product.id] = final_score
+                    if user_region and user_region not in (similar_product.available_regions or ''):
+                        continue
+                
+                # Calculate base recommendation score
+                base_score = similarity.similarity_score * interaction_values[similarity.product1_id]
+                
+                # Apply seasonal boost
+                seasonal_boost = 0.2 if in_season(similar_product, current_month, hemisphere) else 0
+                
+                # Final score
+                final_score = base_score * (1 + seasonal_boost)
+                
+                # Add to recommendations
+                if similar_product.id in recommendations:
+                    recommendations[similar_product.id] += final_score
+                else:
+                    recommendations[similar_product.id] = final_score
             
             # Normalize scores
             if recommendations:
@@ -297,30 +363,22 @@ class RecommendationEngine:
                     recommendations[product_id] /= max_score
             
             # Save recommendations
-            for product_id, score in sorted(recommendations.items(), key=lambda x: x[1], reverse=True)[:20]:
-                product = Product.objects.get(id=product_id)
-                UserProductRecommendation.objects.create(
-                    user=user,
-                    product=product,
-                    score=score
-                )
+            rows = [
+                UserProductRecommendation(user=user, product_id=product_id, score=score)
+                for product_id, score in sorted(recommendations.items(), key=lambda x: x[1], reverse=True)[:20]
+            ]
             
             # If not enough recommendations, add popular products that are in season and location-relevant
-            recommendation_count = UserProductRecommendation.objects.filter(user=user).count()
+            recommendation_count = len(rows)
             if recommendation_count < 10:
-                popular_products = new_products.annotate(
-                    review_count=Count('reviews'),
-                    avg_rating=Avg('reviews__rating')
-                ).filter(
-                    review_count__gt=0
-                ).exclude(
-                    id__in=list(recommendations.keys()) + list(interacted_products)
-                ).order_by('-avg_rating', '-review_count')[:20-recommendation_count]
+                popular_products = popular_products.exclude(
+                    id__in=list(recommendations.keys())
+                )[:20-recommendation_count]
                 
                 # Filter for seasonal and location relevance
                 relevant_products = []
                 for product in popular_products:
-                    if product.is_in_season(current_month, hemisphere):
+                    if in_season(product, current_month, hemisphere):
                         relevant_products.append(product)
                 
                 for i, product in enumerate(relevant_products):
@@ -328,29 +386,157 @@ class RecommendationEngine:
                     base_score = 0.5 - (i * 0.02)
                     
                     # Seasonal boost
-                    seasonal_boost = 0.1 if product.is_in_season(current_month, hemisphere) else 0
+                    seasonal_boost = 0.1
                     
                     # Final score
                     final_score = base_score + seasonal_boost
                     
-                    UserProductRecommendation.objects.create(
-                        user=user,
-                        product=product,
-                        score=final_score
-                    )
+                    rows.append(UserProductRecommendation(user=user, product=product, score=final_score))
         else:
-            # Save recommendations from ML model
-            for i, product in enumerate(recommended_products):
-                # Score decreases with position
-                score = 1.0 - (i * 0.05)
-                
-                UserProductRecommendation.objects.create(
-                    user=user,
-                    product=product,
-                    score=score
-                )
+            # Save recommendations from ML model (score decreases with position)
+            rows = [
+                UserProductRecommendation(user=user, product=product, score=1.0 - (i * 0.05))
+                for i, product in enumerate(recommended_products)
+            ]
+        
+        UserProductRecommendation.objects.bulk_create(rows)
+        logger.info(f"Generated recommendations for user {user.id}: {len(rows)} recommendations")
+    
+    @staticmethod
+    def refresh_popularity_segments(size=100):
+        """
+        Precompute the cold-start products of every (country, hemisphere, month) segment
+        
+        Each segment ranks the reviewed products by average rating and review count,
+        keeping those in season for the month and available in the country, as the
+        no-interaction fallback of generate_recommendations_for_user does per user.
+        Segments are built for every country users have, plus a blank one for users
+        without a country.
+        
+        Args:
+            size: Number of ranked products kept per segment (extra candidates are
+                needed because region filtering happens at read time)
+            
+        Returns:
+            Number of segments written
+        """
+        # Reviewed products, best rated first
+        products = list(
+            Product.objects.annotate(num_reviews=Count('reviews'), rating=Avg('reviews__rating'))
+            .filter(num_reviews__gt=0)
+            .order_by('-rating', '-num_reviews', 'id')
+            .values_list('id', 'is_location_specific', 'available_countries', 'available_regions')
+        )
+        
+        # Combine each product's seasons into one bitmask
+        season_masks = {}
+        season_rows = Product.seasons.through.objects.values_list(
+            'product_id', 'season__start_month', 'season__end_month', 'season__hemisphere'
+        )
+        for product_id, start_month, end_month, hemisphere in season_rows:
+            season_masks[product_id] = season_masks.get(product_id, 0) | season_mask(start_month, end_month, hemisphere)
+        
+        countries = set(
+            User.objects.exclude(country__isnull=True).exclude(country='').values_list('country', flat=True).distinct()
+        )
+        
+        segments = []
+        for country in sorted(countries | {''}):
+            hemisphere = 'S' if country in SOUTHERN_COUNTRIES else 'N'
+            
+            # Products available in the country (location filters only apply to users with a country)
+            available = []
+            for product_id, is_location_specific, available_countries, available_regions in products:
+                location_boost = 0
+                if country and is_location_specific:
+                    if country.lower() not in (available_countries or '').lower():
+                        continue
+                    if country in (available_countries or ''):
+                        location_boost = 0.1
+                regions = (available_regions or '') if is_location_specific else None
+                available.append((product_id, location_boost, regions))
+            
+            for month in range(1, 13):
+                bit = 1 << season_bit(month, hemisphere)
+                ranked = [
+                    [product_id, location_boost, regions]
+                    for product_id, location_boost, regions in available
+                    if season_masks.get(product_id, ALL_SEASONS_MASK) & bit
+                ][:size]
+                segments.append(PopularitySegment(country=country, hemisphere=hemisphere, month=month, products=ranked))
+        
+        with transaction.atomic():
+            PopularitySegment.objects.all().delete()
+            PopularitySegment.objects.bulk_create(segments, batch_size=500)
+        
+        logger.info(f"Refreshed {len(segments)} popularity segments for {len(countries)} countries")
+        return len(segments)
+    
+    @staticmethod
+    def refresh_recommendations(user_ids, limit=8):
+        """
+        Refresh the stored recommendations of several users in bulk
+        
+        Users are scored with the hybrid recommender exactly as on the request path
+        (see hybrid_recommendations), with a few queries for all of them instead of
+        per-user ones, and written with one bulk replace. Users the model has no
+        recommendations for go through the heuristic fallback of
+        generate_recommendations_for_user.
+        
+        Args:
+            user_ids: List of user IDs
+            limit: Recommendations stored per user
+            
+        Returns:
+            Tuple of (users refreshed, recommendations bulk-written, users sent to the fallback)
+        """
+        users = list(User.objects.filter(id__in=user_ids))
+        
+        recommendations = {}
+        recommender = model_registry.get()
+        if recommender is not None:
+            # Extra candidates make up for products deleted since training
+            for user_id, items in hybrid_recommendations(recommender, users, limit * 2).items():
+                if items:
+                    recommendations[user_id] = [product_id for product_id, _ in items]
+        
+        row_count = RecommendationEngine.store_recommendations(recommendations, limit=limit)
+        
+        fallback_users = [user for user in users if user.id not in recommendations]
+        for user in fallback_users:
+            RecommendationEngine.generate_recommendations_for_user(user)
+        
+        return len(users), row_count, len(fallback_users)
+    
+    @staticmethod
+    def store_recommendations(recommendations, limit=None):
+        """
+        Replace the stored recommendations of several users in bulk
+        
+        Args:
+            recommendations: Dictionary mapping user IDs to ordered lists of product IDs
+            limit: Optional number of (existing) products stored per user
+        """
+        recommendations = {user_id: product_ids for user_id, product_ids in recommendations.items() if product_ids}
+        if not recommendations:
+            return 0
+        
+        # Skip products deleted since the model was trained
+        all_product_ids = {product_id for product_ids in recommendations.values() for product_id in product_ids}
+        existing_product_ids = set(Product.objects.filter(id__in=all_product_ids).values_list('id', flat=True))
+        
+        # Score decreases with position, as for single-user ML recommendations
+        rows = [
+            UserProductRecommendation(user_id=user_id, product_id=product_id, score=1.0 - (i * 0.05))
+            for user_id, product_ids in recommendations.items()
+            for i, product_id in enumerate([pid for pid in product_ids if pid in existing_product_ids][:limit])
+        ]
+        
+        with transaction.atomic():
+            UserProductRecommendation.objects.filter(user_id__in=list(recommendations)).delete()
+            UserProductRecommendation.objects.bulk_create(rows, batch_size=1000)
         
-        logger.info(f"Generated recommendations for user {user.id}: {UserProductRecommendation.objects.filter(user=user).count()} recommendations")
+        return len(rows)
     
     @staticmethod
     def get_similar_products(product, limit=4, user=None):
@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, pre_save
+from django.dispatch import receiver
+from products.models import Product
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+# Product fields the content model is built from (seasons are tracked through m2m_changed)
+CONTENT_FIELDS = ('name', 'description', 'category', 'is_location_specific', 'available_countries', 'available_regions')
+
+
+def incremental_updates_enabled():
+    """Whether product changes are folded into the content model between training runs"""
+    return getattr(settings, 'RECOMMENDER_INCREMENTAL_CONTENT_UPDATES', True)
+
+
+def queue_content_update(product_ids):
+    """Queue products for a background content model update once the current transaction commits"""
+    from .training_jobs import content_updates
+    
+    if product_ids:
+        transaction.on_commit(lambda: content_updates.add(product_ids))
+
+
+def product_content(product):
+    """Values of a product's content fields"""
+    return tuple(getattr(product, Product._meta.get_field(field).attname) for field in CONTENT_FIELDS)
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_content(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Record the stored content of an edited product, so that post_save can skip edits that change none of it"""
+    instance._stored_content = None
+    if raw or instance.pk is None or not incremental_updates_enabled():
+        return
+    if update_fields is not None and not set(update_fields) & set(CONTENT_FIELDS):
+        instance._stored_content = product_content(instance)
+        return
+    instance._stored_content = Product.objects.filter(pk=instance.pk).values_list(*CONTENT_FIELDS).first()
+
+
+@receiver(post_save, sender=Product)
+def update_content_model_on_product_save(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Fold a created product, or an edit of a product's content, into the content model
+    
+    Edits of other fields (stock, price, ...) leave the content model alone.
+    """
+    if raw or not incremental_updates_enabled():
+        return
+    if not created and getattr(instance, '_stored_content', None) == product_content(instance):
+        return
+    queue_content_update([instance.id])
+
+
+@receiver(m2m_changed, sender=Product.seasons.through)
+def update_content_model_on_season_change(sender, instance, action, reverse=False, pk_set=None, **kwargs):
+    """Seasons are part of the content model's context"""
+    if not incremental_updates_enabled():
+        return
+    
+    if reverse and action == 'pre_clear':
+        # Clearing a season's products does not report which products were affected
+        instance._cleared_product_ids = list(instance.products.values_list('id', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            queue_content_update([instance.id])
+        elif action == 'post_clear':
+            queue_content_update(getattr(instance, '_cleared_product_ids', []))
+        elif pk_set:
+            queue_content_update(sorted(pk_set))
+
@@ -1,3 +1,1757 @@
-from django.test import TestCase
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.cache import caches
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from products.models import Category, Product, Review, Season
+from orders.models import Order, OrderItem
+from .models import (
+    UserProductInteraction, ProductSimilarity, UserProductRecommendation, TrainingJob, InteractionSyncState,
+)
+from .recommendation_engine import RecommendationEngine
+from .event_buffer import InteractionEventBuffer
+from . import ml_models, thread_budget, training_jobs, views
+from .ml_models import (
+    CollaborativeFilteringModel, ContentBasedFilteringModel, HybridRecommender, build_neighbour_table,
+    quantize_rows, dequantize_rows, RecommendationCache,
+)
+from .evaluation import ranking_metrics, latency_summary
+from .ann_index import IVFIndex, benchmark_index, normalize_rows, top_k
+import copy
+import datetime
+import math
+import os
+import subprocess
+import sys
+import threading
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.metrics.pairwise import cosine_similarity
+import tempfile
+
+User = get_user_model()
+
+
+@mock.patch('recommendations.recommendation_engine.get_recommendations_for_user', return_value=[])
+class FallbackRecommendationTests(TestCase):
+    """Heuristic fallback of generate_recommendations_for_user (no trained model)"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        current_month = datetime.datetime.now().month
+        category = Category.objects.create(name='Garden')
+        
+        # A season that never includes the current month in the Northern hemisphere
+        off_month = current_month % 12 + 1
+        cls.off_season = Season.objects.create(
+            name='Off season', start_month=off_month, end_month=off_month, hemisphere='N'
+        )
+        cls.in_season = Season.objects.create(
+            name='In season', start_month=current_month, end_month=current_month, hemisphere='B'
+        )
+        
+        cls.products = [
+            Product.objects.create(
+                name=f'Product {i}', description='A product', price=10, category=category, stock=5
+            )
+            for i in range(12)
+        ]
+        cls.products[6].seasons.add(cls.off_season)
+        cls.products[7].seasons.add(cls.in_season)
+        
+        cls.user = User.objects.create_user(username='shopper', email='shopper@example.com', password='x', country='US')
+        cls.reviewer = User.objects.create_user(username='reviewer', email='reviewer@example.com', password='x')
+        
+        # The user interacted with the first three products
+        for product in cls.products[:3]:
+            UserProductInteraction.objects.create(user=cls.user, product=product, interaction_type='purchase', value=1)
+        
+        # Each interacted product is similar to three others
+        for i, product in enumerate(cls.products[:3]):
+            for j in (3, 6, 7):
+                ProductSimilarity.objects.create(
+                    product1=product, product2=cls.products[j], similarity_score=0.5 + 0.1 * i
+                )
+            ProductSimilarity.objects.create(product1=product, product2=cls.products[(i + 1) % 3], similarity_score=0.9)
+        
+        # Reviewed products top up short recommendation lists
+        for product in cls.products[8:]:
+            Review.objects.create(product=product, user=cls.reviewer, rating=4, comment='Good')
+    
+    def test_fallback_uses_constant_number_of_queries(self, _):
+        # Delete, interactions, similarity join, seasons of similar products,
+        # popular products, their seasons, and the bulk insert
+        with self.assertNumQueries(7):
+            RecommendationEngine.generate_recommendations_for_user(self.user)
+    
+    def test_fallback_query_count_does_not_grow_with_interactions(self, _):
+        for product in self.products[3:6]:
+            UserProductInteraction.objects.create(user=self.user, product=product, interaction_type='view', value=1)
+            ProductSimilarity.objects.create(product1=product, product2=self.products[7], similarity_score=0.4)
+        
+        with self.assertNumQueries(7):
+            RecommendationEngine.generate_recommendations_for_user(self.user)
+    
+    def test_fallback_recommendations(self, _):
+        RecommendationEngine.generate_recommendations_for_user(self.user)
+        
+        recommended = list(
+            UserProductRecommendation.objects.filter(user=self.user).order_by('-score').values_list('product_id', flat=True)
+        )
+        
+        # Similar products first (in-season and non-seasonal ones boosted), then popular products
+        self.assertEqual(set(recommended[:2]), {self.products[3].id, self.products[7].id})
+        self.assertEqual(recommended[2], self.products[6].id)
+        self.assertEqual(set(recommended[3:]), {product.id for product in self.products[8:]})
+        self.assertFalse(set(recommended) & {product.id for product in self.products[:3]})
+    
+    def test_cold_start_segment_skips_deleted_products(self, _):
+        RecommendationEngine.refresh_popularity_segments()
+        new_user = User.objects.create_user(username='newcomer', email='newcomer@example.com', password='x', country='US')
+        deleted_id = self.products[8].id
+        self.products[8].delete()
+        
+        RecommendationEngine.generate_recommendations_for_user(new_user)
+        
+        recommended = list(
+            UserProductRecommendation.objects.filter(user=new_user).order_by('-score').values_list('product_id', 'score')
+        )
+        self.assertEqual([product_id for product_id, _ in recommended], [product.id for product in self.products[9:]])
+        self.assertNotIn(deleted_id, dict(recommended))
+        self.assertAlmostEqual(recommended[0][1], 1.2)
+
+
+class RefreshRecommendationsCommandTests(TestCase):
+    """refresh_recommendations management command (run in-process with --workers 1)"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Garden')
+        cls.products = [
+            Product.objects.create(
+                name=f'Product {i}', description='A product', price=10, category=category, stock=5
+            )
+            for i in range(4)
+        ]
+        cls.active = User.objects.create_user(username='active', email='active@example.com', password='x')
+        cls.inactive = User.objects.create_user(username='inactive', email='inactive@example.com', password='x')
+        
+        UserProductInteraction.objects.create(user=cls.active, product=cls.products[0], interaction_type='view', value=1)
+        old = UserProductInteraction.objects.create(user=cls.inactive, product=cls.products[0], interaction_type='view', value=1)
+        UserProductInteraction.objects.filter(id=old.id).update(updated_at=datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc))
+    
+    def refresh(self, *args, known_user_ids=None):
+        """Run the command with a model that recommends products 1 and 2 to the users it knows"""
+        known_user_ids = {self.active.id, self.inactive.id} if known_user_ids is None else known_user_ids
+        
+        def hybrid_recommendations(recommender, users, n):
+            items = [(self.products[1].id, 0.9), (self.products[2].id, 0.8)]
+            return {user.id: items[:n] if user.id in known_user_ids else [] for user in users}
+        
+        with mock.patch('recommendations.ml_models.model_registry.get', return_value=mock.Mock()), \
+                mock.patch('recommendations.recommendation_engine.hybrid_recommendations', side_effect=hybrid_recommendations), \
+                mock.patch('recommendations.ml_models.get_recommendations_for_user') as get_recommendations, \
+                mock.patch.object(RecommendationEngine, 'generate_recommendations_for_user') as fallback:
+            call_command('refresh_recommendations', '--workers', '1', *args, stdout=StringIO())
+        
+        # Batch scoring never takes the per-user (cached) path
+        get_recommendations.assert_not_called()
+        return fallback
+    
+    def test_refresh_all_users(self):
+        fallback = self.refresh()
+        
+        for user in (self.active, self.inactive):
+            recommended = list(
+                UserProductRecommendation.objects.filter(user=user).order_by('-score').values_list('product_id', flat=True)
+            )
+            self.assertEqual(recommended, [self.products[1].id, self.products[2].id])
+        fallback.assert_not_called()
+    
+    def test_unknown_users_use_fallback(self):
+        fallback = self.refresh(known_user_ids={self.active.id})
+        
+        self.assertTrue(UserProductRecommendation.objects.filter(user=self.active).exists())
+        fallback.assert_called_once_with(self.inactive)
+    
+    def test_refresh_since_only_includes_users_with_changed_interactions(self):
+        self.refresh('--since', '2024-01-01')
+        
+        self.assertTrue(UserProductRecommendation.objects.filter(user=self.active).exists())
+        self.assertFalse(UserProductRecommendation.objects.filter(user=self.inactive).exists())
+    
+    def test_invalid_since(self):
+        with self.assertRaises(CommandError):
+            self.refresh('--since', 'yesterday')
+
+
+class InteractionSyncTests(TestCase):
+    """Incremental sync of review and purchase interactions"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Garden')
+        cls.products = [
+            Product.objects.create(
+                name=f'Product {i}', description='A product', price=10, category=category, stock=5
+            )
+            for i in range(3)
+        ]
+        cls.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='x')
+    
+    def order(self, *items):
+        order = Order.objects.create(
+            user=self.user, full_name='Buyer', email='buyer@example.com', phone='555', address='1 Road',
+            total_amount=10,
+        )
+        for product, quantity in items:
+            OrderItem.objects.create(order=order, product=product, quantity=quantity, price=10)
+        return order
+    
+    def interactions(self, interaction_type):
+        return dict(
+            UserProductInteraction.objects.filter(user=self.user, interaction_type=interaction_type)
+            .values_list('product_id', 'value')
+        )
+    
+    def test_first_run_syncs_everything(self):
+        Review.objects.create(product=self.products[0], user=self.user, rating=4, comment='Good')
+        self.order((self.products[1], 2))
+        
+        RecommendationEngine.update_user_product_interactions()
+        
+        self.assertEqual(self.interactions('review'), {self.products[0].id: 4})
+        self.assertEqual(self.interactions('purchase'), {self.products[1].id: 2})
+        self.assertIsNotNone(InteractionSyncState.objects.get(source='review').synced_until)
+        self.assertIsNotNone(InteractionSyncState.objects.get(source='purchase').synced_until)
+    
+    def test_incremental_run_picks_up_changes(self):
+        review = Review.objects.create(product=self.products[0], user=self.user, rating=4, comment='Good')
+        RecommendationEngine.update_user_product_interactions()
+        
+        synced_at = UserProductInteraction.objects.get(interaction_type='review').updated_at
+        
+        review.rating = 2
+        review.save()
+        self.order((self.products[2], 1))
+        RecommendationEngine.update_user_product_interactions()
+        
+        self.assertEqual(self.interactions('review'), {self.products[0].id: 2})
+        self.assertGreater(UserProductInteraction.objects.get(interaction_type='review').updated_at, synced_at)
+        self.assertEqual(self.interactions('purchase'), {self.products[2].id: 1})
+    
+    def test_repeat_purchase_retotals_quantity(self):
+        self.order((self.products[0], 2), (self.products[1], 1))
+        RecommendationEngine.update_user_product_interactions()
+        
+        self.order((self.products[0], 3))
+        RecommendationEngine.update_user_product_interactions()
+        
+        self.assertEqual(self.interactions('purchase'), {self.products[0].id: 5, self.products[1].id: 1})
+    
+    def test_rows_committed_after_the_watermark_are_synced(self):
+        Review.objects.create(product=self.products[0], user=self.user, rating=4, comment='Good')
+        RecommendationEngine.update_user_product_interactions()
+        synced_until = InteractionSyncState.objects.get(source='review').synced_until
+        
+        # Saved before the last run's newest row, but committed after that run
+        late = Review.objects.create(product=self.products[1], user=self.user, rating=5, comment='Great')
+        Review.objects.filter(id=late.id).update(updated_at=synced_until - datetime.timedelta(seconds=1))
+        RecommendationEngine.update_user_product_interactions()
+        
+        self.assertEqual(self.interactions('review'), {self.products[0].id: 4, self.products[1].id: 5})
+        self.assertEqual(InteractionSyncState.objects.get(source='review').synced_until, synced_until)
+
+
+@mock.patch('recommendations.recommendation_engine.train_recommendation_models', return_value=False)
+class SimilarityFallbackTests(TestCase):
+    """Item-item similarities stored when the models cannot be trained"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        rng = np.random.default_rng(3)
+        category = Category.objects.create(name='Garden')
+        cls.products = [
+            Product.objects.create(name=f'Product {i}', description='A product', price=10, category=category, stock=5)
+            for i in range(8)
+        ]
+        users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='x') for i in range(6)
+        ]
+        UserProductInteraction.objects.bulk_create(
+            UserProductInteraction(
+                user=user, product=product, interaction_type=interaction_type, value=float(rng.integers(1, 5))
+            )
+            for user in users
+            for product in rng.choice(cls.products, size=3, replace=False)
+            for interaction_type in rng.choice(['view', 'cart', 'purchase', 'review'], size=2, replace=False)
+        )
+    
+    def dense_similarities(self):
+        """Similarities as computed before the sparse top-K rewrite: dense cosine over all products, both directions"""
+        df = pd.DataFrame(
+            UserProductInteraction.objects.values('user_id', 'product_id', 'interaction_type', 'value')
+        )
+        df['weighted_value'] = df['value'] * df['interaction_type'].map({'review': 5, 'purchase': 3, 'cart': 2, 'view': 1})
+        user_item_df = df.groupby(['user_id', 'product_id'])['weighted_value'].sum().unstack().fillna(0)
+        item_similarity = cosine_similarity(user_item_df.T)
+        
+        expected = {}
+        for i, product1_id in enumerate(user_item_df.columns):
+            for j, product2_id in enumerate(user_item_df.columns):
+                if i != j and item_similarity[i, j] >= 0.1:
+                    expected[(product1_id, product2_id)] = item_similarity[i, j]
+        return expected
+    
+    def test_same_neighbours_as_dense_calculation(self, train):
+        expected = self.dense_similarities()
+        self.assertTrue(expected)
+        self.assertLess(len(expected), len(self.products) * (len(self.products) - 1))
+        
+        RecommendationEngine.calculate_product_similarities(chunk_size=3)
+        
+        stored = {
+            (product1_id, product2_id): score
+            for product1_id, product2_id, score in ProductSimilarity.objects.values_list('product1_id', 'product2_id', 'similarity_score')
+        }
+        self.assertEqual(set(stored), set(expected))
+        for pair, score in expected.items():
+            self.assertAlmostEqual(stored[pair], score, places=6)
+    
+    @override_settings(RECOMMENDER_NEIGHBOURS=2)
+    def test_neighbours_are_capped_at_k(self, train):
+        expected = self.dense_similarities()
+        RecommendationEngine.calculate_product_similarities()
+        
+        for product in self.products:
+            neighbours = dict(
+                ProductSimilarity.objects.filter(product1=product).values_list('product2_id', 'similarity_score')
+            )
+            candidates = sorted(
+                (score for (product1_id, _), score in expected.items() if product1_id == product.id), reverse=True
+            )
+            self.assertEqual(len(neighbours), min(2, len(candidates)))
+            np.testing.assert_allclose(sorted(neighbours.values(), reverse=True), candidates[:2], rtol=1e-6)
+
+
+class InteractionEventBufferTests(TestCase):
+    """Buffered view and cart events are summed and added to the stored interactions"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Garden')
+        cls.products = [
+            Product.objects.create(name=f'Product {i}', description='A product', price=10, category=category, stock=5)
+            for i in range(2)
+        ]
+        cls.user = User.objects.create_user(username='browser', email='browser@example.com', password='x')
+    
+    def buffer(self, **kwargs):
+        """A buffer whose events are only flushed by the test"""
+        events = InteractionEventBuffer(**kwargs)
+        patcher = mock.patch.object(events, '_ensure_started')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return events
+    
+    def interactions(self):
+        return dict(
+            ((product_id, interaction_type), value) for product_id, interaction_type, value in
+            UserProductInteraction.objects.filter(user=self.user).values_list('product_id', 'interaction_type', 'value')
+        )
+    
+    def test_repeated_events_are_summed(self):
+        events = self.buffer()
+        for _ in range(3):
+            events.record(self.user.id, self.products[0].id, 'view')
+        events.record(self.user.id, self.products[1].id, 'view')
+        events.record(self.user.id, self.products[0].id, 'cart', 2)
+        events.record(self.user.id, self.products[0].id, 'cart', 1)
+        
+        self.assertEqual(events.flush(), 3)
+        self.assertEqual(self.interactions(), {
+            (self.products[0].id, 'view'): 3, (self.products[1].id, 'view'): 1, (self.products[0].id, 'cart'): 3,
+        })
+        self.assertEqual(events.flush(), 0)
+    
+    def test_flush_adds_to_stored_values(self):
+        stored = UserProductInteraction.objects.create(
+            user=self.user, product=self.products[0], interaction_type='view', value=2
+        )
+        events = self.buffer()
+        events.record(self.user.id, self.products[0].id, 'view')
+        events.record(self.user.id, self.products[0].id, 'view')
+        events.flush()
+        
+        interaction = UserProductInteraction.objects.get(id=stored.id)
+        self.assertEqual(interaction.value, 4)
+        self.assertGreater(interaction.updated_at, stored.updated_at)
+        self.assertEqual(UserProductInteraction.objects.count(), 1)
+    
+    def test_flush_reads_only_the_flushed_rows(self):
+        # Both rows are in the users x products x types cross product of the flushed events
+        for product, interaction_type in ((self.products[1], 'view'), (self.products[0], 'cart')):
+            UserProductInteraction.objects.create(user=self.user, product=product, interaction_type=interaction_type, value=5)
+        events = self.buffer()
+        events.record(self.user.id, self.products[0].id, 'view')
+        events.record(self.user.id, self.products[1].id, 'cart')
+        
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(events.flush(), 2)
+        
+        selects = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and 'recommendations_userproductinteraction' in query['sql']
+        ]
+        self.assertEqual(len(selects), 1)
+        with connection.cursor() as cursor:
+            cursor.execute(selects[0])
+            self.assertEqual(len(cursor.fetchall()), 2)
+        self.assertEqual(self.interactions(), {
+            (self.products[0].id, 'view'): 1, (self.products[1].id, 'cart'): 1,
+            (self.products[1].id, 'view'): 5, (self.products[0].id, 'cart'): 5,
+        })
+    
+    def test_events_of_deleted_users_and_products_are_skipped(self):
+        events = self.buffer()
+        events.record(self.user.id, self.products[0].id, 'view')
+        events.record(self.user.id, 999999, 'view')
+        events.record(999999, self.products[0].id, 'view')
+        
+        self.assertEqual(events.flush(), 1)
+        self.assertEqual(self.interactions(), {(self.products[0].id, 'view'): 1})
+    
+    def test_background_thread_flushes_full_batches(self):
+        events = InteractionEventBuffer(flush_interval=60, batch_size=2)
+        flushed = threading.Event()
+        with mock.patch.object(events, 'flush', side_effect=flushed.set), mock.patch('atexit.register'):
+            events.record(self.user.id, self.products[0].id, 'view')
+            self.assertFalse(flushed.wait(0.2))
+            events.record(self.user.id, self.products[1].id, 'view')
+            self.assertTrue(flushed.wait(5))
+        # The thread lives on, waiting for the next interval
+        events._events.clear()
+    
+    def test_pending_events_are_flushed_at_exit(self):
+        events = InteractionEventBuffer(flush_interval=60)
+        with mock.patch('atexit.register') as register, mock.patch('threading.Thread'):
+            events.record(self.user.id, self.products[0].id, 'view')
+        register.assert_called_once_with(events.flush)
+        
+        # The atexit handler writes what the flusher thread has not
+        register.call_args.args[0]()
+        self.assertEqual(self.interactions(), {(self.products[0].id, 'view'): 1})
+
+
+class TrainingDataExtractionTests(TestCase):
+    """Streaming extraction of interactions and products into training DataFrames"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Garden')
+        spring = Season.objects.create(name='Spring', start_month=3, end_month=5, hemisphere='N')
+        cls.products = [
+            Product.objects.create(name='Spade', description='A spade', price=10, category=category, stock=5),
+            Product.objects.create(
+                name='Rake', description='A rake', price='12.50', category=category, stock=5,
+                is_location_specific=True, available_countries='US, ZA', available_regions='CA',
+            ),
+            # Availability lists only apply to location-specific products
+            Product.objects.create(
+                name='Hoe', description='A hoe', price=8, category=category, stock=5, available_countries='GB',
+            ),
+        ]
+        cls.products[0].seasons.add(spring)
+        
+        cls.users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='x') for i in range(2)
+        ]
+        for user, product, interaction_type, value in (
+            (cls.users[0], cls.products[0], 'view', 2),
+            (cls.users[0], cls.products[0], 'cart', 1),
+            (cls.users[0], cls.products[1], 'purchase', 1),
+            (cls.users[1], cls.products[1], 'review', 4),
+        ):
+            UserProductInteraction.objects.create(user=user, product=product, interaction_type=interaction_type, value=value)
+    
+    def test_interactions_are_weighted_and_aggregated_across_chunks(self):
+        interactions_df = ml_models.load_interactions_dataframe(UserProductInteraction.objects.all(), chunk_size=2)
+        
+        values = {
+            (user_id, product_id): value
+            for user_id, product_id, value in interactions_df.itertuples(index=False)
+        }
+        self.assertEqual(values, {
+            (self.users[0].id, self.products[0].id): 2 * 1 + 1 * 2,
+            (self.users[0].id, self.products[1].id): 1 * 3,
+            (self.users[1].id, self.products[1].id): 4 * 5,
+        })
+    
+    def test_no_interactions(self):
+        interactions_df = ml_models.load_interactions_dataframe(UserProductInteraction.objects.none())
+        self.assertTrue(interactions_df.empty)
+        self.assertEqual(list(interactions_df.columns), ['user_id', 'product_id', 'value'])
+    
+    def test_products(self):
+        products_df = ml_models.load_products_dataframe(Product.objects.order_by('id'), chunk_size=2)
+        
+        self.assertEqual(products_df['id'].tolist(), [product.id for product in self.products])
+        self.assertEqual(products_df['category'].tolist(), ['Garden'] * 3)
+        self.assertEqual(products_df['price'].tolist(), [10.0, 12.5, 8.0])
+        self.assertEqual(products_df['season_mask'].tolist(), [
+            ml_models.season_mask(3, 5, 'N'), ml_models.ALL_SEASONS_MASK, ml_models.ALL_SEASONS_MASK,
+        ])
+        self.assertEqual(products_df['countries'].tolist(), [[], ['US', 'ZA'], []])
+        self.assertEqual(products_df['regions'].tolist(), [[], ['CA'], []])
+
+
+class CollaborativeFilteringLookupTests(SimpleTestCase):
+    """ID lookups of the collaborative filtering model, which searches the sorted ID arrays"""
+    
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        rng = np.random.default_rng(0)
+        cls.interactions = pd.DataFrame({
+            'user_id': rng.choice([3, 11, 42, 7, 100, 58], size=60),
+            'product_id': rng.choice(np.arange(1000, 1040, 3), size=60),
+            'value': rng.integers(1, 5, size=60).astype(float),
+        })
+        cls.model = CollaborativeFilteringModel(n_components=3, n_neighbours=5).fit(cls.interactions)
+    
+    def test_lookups(self):
+        for position, user_id in enumerate(self.model.user_ids):
+            self.assertEqual(self.model.user_index(int(user_id)), position)
+        for position, item_id in enumerate(self.model.item_ids):
+            self.assertEqual(self.model.item_index(int(item_id)), position)
+        self.assertIsNone(self.model.user_index(5))
+        self.assertIsNone(self.model.item_index(999))
+        self.assertIsNone(self.model.item_index(2000))
+        self.assertEqual(self.model.get_similar_items(1001), [])
+    
+    def test_sparse_user_item_matrix(self):
+        matrix = self.model.user_item_matrix
+        self.assertTrue(sparse.isspmatrix_csr(matrix))
+        
+        # Repeated (user, product) pairs are summed, as the dense pivot table did
+        dense = self.interactions.pivot_table(index='user_id', columns='product_id', values='value', aggfunc='sum', fill_value=0)
+        np.testing.assert_array_equal(matrix.toarray(), dense.loc[self.model.user_ids, self.model.item_ids].to_numpy())
+        
+        scores, interacted = self.model.score_user(42)
+        row = dense.loc[42].to_numpy()
+        components = self.model.model.components_
+        np.testing.assert_allclose(scores, row @ components.T @ components)
+        np.testing.assert_array_equal(interacted, row > 0)
+    
+    def test_batch_scores_match_per_user_scores(self):
+        # A folded-in user, training users and an unknown user in one block
+        self.model.fold_in_user(3, [1003, 1006], [1.0, 2.0])
+        user_ids = [100, 3, 5, 58, 42]
+        
+        scores, interacted, known = self.model.score_users(user_ids)
+        
+        np.testing.assert_array_equal(known, [True, True, False, True, True])
+        for row, user_id in enumerate(user_ids):
+            expected_scores, expected_interacted = self.model.score_user(user_id)
+            if expected_scores is None:
+                self.assertFalse(scores[row].any() or interacted[row].any())
+                continue
+            np.testing.assert_allclose(scores[row], expected_scores)
+            np.testing.assert_array_equal(interacted[row], expected_interacted)
+        self.model.user_factors_cache.clear()
+    
+    def test_memory_mapped_model_matches_trained_model(self):
+        with tempfile.TemporaryDirectory() as directory:
+            params = self.model.save_arrays(directory)
+            loaded = CollaborativeFilteringModel.load_arrays(directory, params, mmap_mode='r')
+            
+            user_ids = [42, 5, 3, 100]
+            for expected, served in zip(self.model.score_users(user_ids), loaded.score_users(user_ids)):
+                np.testing.assert_array_equal(served, expected)
+            self.assertEqual(loaded.recommend_for_user(42, n=4), self.model.recommend_for_user(42, n=4))
+            self.assertEqual(loaded.recommend_for_user(5, n=4), [])
+            self.assertEqual(loaded.get_similar_items(1003, n=3), self.model.get_similar_items(1003, n=3))
+            
+            # Folded-in interactions on unknown items are ignored
+            factors = loaded.fold_in_user(5, [1003, 999, 1006], [1.0, 2.0, 3.0])
+            expected = loaded.model.components_[:, [loaded.item_index(1003), loaded.item_index(1006)]] @ [1.0, 3.0]
+            np.testing.assert_allclose(factors, expected)
+
+
+class NeighbourTableTests(SimpleTestCase):
+    """Top-K neighbour tables computed block by block"""
+    
+    def assert_matches_dense_similarities(self, features, k, block_size):
+        indices, scores = build_neighbour_table(features, k=k, block_size=block_size)
+        
+        dense = features.toarray() if sparse.issparse(features) else features
+        similarities = cosine_similarity(dense)
+        np.fill_diagonal(similarities, -np.inf)
+        expected = -np.sort(-similarities, axis=1)[:, :k]
+        
+        self.assertEqual((indices.dtype, scores.dtype), (np.int32, np.float32))
+        np.testing.assert_allclose(scores, expected, atol=1e-6)
+        np.testing.assert_allclose(np.take_along_axis(similarities, indices.astype(np.int64), axis=1), scores, atol=1e-6)
+        self.assertFalse((indices == np.arange(len(dense))[:, None]).any())
+    
+    def test_dense_features(self):
+        features = np.random.default_rng(0).normal(size=(30, 6))
+        self.assert_matches_dense_similarities(features, k=5, block_size=7)
+    
+    def test_sparse_features(self):
+        features = sparse.random(25, 40, density=0.2, random_state=1, format='csr')
+        self.assert_matches_dense_similarities(features, k=4, block_size=10)
+    
+    def test_k_is_capped_by_catalog_size(self):
+        indices, scores = build_neighbour_table(np.eye(3), k=50)
+        self.assertEqual(indices.shape, (3, 2))
+        
+        indices, scores = build_neighbour_table(np.ones((1, 3)), k=50)
+        self.assertEqual(indices.shape, (1, 0))
+
+
+class IVFIndexTests(SimpleTestCase):
+    """Approximate nearest-neighbour index for similar products"""
+    
+    def setUp(self):
+        # Clustered toy catalog: 8 directions with 25 noisy items each
+        rng = np.random.default_rng(0)
+        centres = rng.normal(size=(8, 16))
+        self.features = np.repeat(centres, 25, axis=0) + rng.normal(scale=0.3, size=(200, 16))
+    
+    def exact_neighbours(self, features, item_idx, n):
+        normalized = normalize_rows(features)
+        scores = normalized @ normalized[item_idx]
+        scores[item_idx] = -np.inf
+        return top_k(scores, n)
+    
+    def test_probing_every_list_is_exact(self):
+        index = IVFIndex(n_lists=10, n_probe=10).build(self.features)
+        self.assertEqual(index.list_offsets[-1], 200)
+        self.assertEqual(sorted(index.list_items.tolist()), list(range(200)))
+        
+        for item_idx in (0, 57, 199):
+            indices, scores = index.query_item(item_idx, n=5)
+            np.testing.assert_array_equal(indices, self.exact_neighbours(self.features, item_idx, 5))
+            self.assertTrue(np.all(np.diff(scores) <= 0))
+            self.assertNotIn(item_idx, indices)
+    
+    def test_recall_against_brute_force(self):
+        index = IVFIndex(n_lists=14, n_probe=4).build(self.features)
+        self.assertGreaterEqual(benchmark_index(self.features, index, n=10, n_queries=50)['recall_at_k'], 0.9)
+    
+    def test_update_items(self):
+        index = IVFIndex(n_lists=10, n_probe=10).build(self.features)
+        
+        # Move item 3 onto item 150 and append a copy of item 10
+        features = np.vstack([self.features, self.features[10] * 2])
+        features[3] = self.features[150] + 0.01
+        index.update_items(np.array([3, 200]), features)
+        
+        self.assertEqual(sorted(index.list_items.tolist()), list(range(201)))
+        for item_idx in (3, 10, 200):
+            np.testing.assert_array_equal(index.query_item(item_idx, n=5)[0], self.exact_neighbours(features, item_idx, 5))
+        self.assertEqual(index.query_item(200, n=1)[0].tolist(), [10])
+    
+    def test_save_and_load_round_trip(self):
+        index = IVFIndex(n_lists=14, n_probe=4).build(self.features)
+        
+        with tempfile.TemporaryDirectory() as directory:
+            loaded = IVFIndex.load_arrays(directory, index.save_arrays(directory))
+            
+            self.assertEqual((loaded.n_probe, len(loaded.centroids)), (4, 14))
+            for item_idx in (0, 57, 199):
+                expected_indices, expected_scores = index.query_item(item_idx, n=5)
+                indices, scores = loaded.query_item(item_idx, n=5)
+                np.testing.assert_array_equal(indices, expected_indices)
+                np.testing.assert_allclose(scores, expected_scores)
+
+
+class TrainingLockTests(SimpleTestCase):
+    """Cross-process training lock, held as an OS file lock"""
+    
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch.object(ml_models, 'TRAINING_LOCK_PATH', os.path.join(directory.name, 'training.lock'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(ml_models.release_training_lock)
+    
+    def test_acquire_and_release(self):
+        self.assertFalse(ml_models.training_in_progress())
+        self.assertTrue(ml_models.acquire_training_lock())
+        self.assertTrue(ml_models.training_in_progress())
+        self.assertFalse(ml_models.acquire_training_lock())
+        
+        ml_models.release_training_lock()
+        self.assertFalse(ml_models.training_in_progress())
+        self.assertTrue(ml_models.acquire_training_lock())
+    
+    def test_lock_of_killed_trainer_is_released(self):
+        # A trainer process that takes the lock and is killed before releasing it
+        script = (
+            'import fcntl, os, sys, time\n'
+            'fd = os.open(sys.argv[1], os.O_CREAT | os.O_RDWR)\n'
+            'fcntl.flock(fd, fcntl.LOCK_EX)\n'
+            'print("locked", flush=True)\n'
+            'time.sleep(60)\n'
+        )
+        trainer = subprocess.Popen([sys.executable, '-c', script, ml_models.TRAINING_LOCK_PATH], stdout=subprocess.PIPE, text=True)
+        self.addCleanup(trainer.wait)
+        self.addCleanup(trainer.kill)
+        self.assertEqual(trainer.stdout.readline().strip(), 'locked')
+        
+        self.assertTrue(ml_models.training_in_progress())
+        self.assertFalse(ml_models.acquire_training_lock())
+        
+        trainer.kill()
+        trainer.wait()
+        self.assertFalse(ml_models.training_in_progress())
+        self.assertTrue(ml_models.acquire_training_lock())
+
+
+class PopularProductsTests(TestCase):
+    """Popular products served while no model is available"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.garden = Category.objects.create(name='Garden')
+        kitchen = Category.objects.create(name='Kitchen')
+        cls.products = [
+            Product.objects.create(
+                name=f'Product {i}', description='A product', price=10, category=cls.garden if i < 4 else kitchen, stock=5
+            )
+            for i in range(6)
+        ]
+        cls.user = User.objects.create_user(username='shopper', email='shopper@example.com', password='x')
+        
+        # Product i has 6 - i interactions
+        for i, product in enumerate(cls.products):
+            for j in range(6 - i):
+                user = User.objects.create(username=f'user{i}-{j}', email=f'user{i}-{j}@example.com')
+                UserProductInteraction.objects.create(user=user, product=product, interaction_type='view', value=1)
+        UserProductInteraction.objects.create(user=cls.user, product=cls.products[0], interaction_type='view', value=1)
+    
+    def setUp(self):
+        ml_models._popular_products.clear()
+        self.addCleanup(ml_models._popular_products.clear)
+    
+    def test_ranking_and_exclusions(self):
+        self.assertEqual(ml_models.get_popular_products(limit=3), self.products[:3])
+        self.assertEqual(ml_models.get_popular_products(limit=3, exclude_user_id=self.user.id), self.products[1:4])
+        self.assertEqual(ml_models.get_popular_products(limit=8, product_id=self.products[1].id), [self.products[0], *self.products[2:4]])
+        self.assertEqual(ml_models.get_popular_products(product_id=0), [])
+    
+    def test_ranking_is_cached_per_process(self):
+        ml_models.get_popular_products(limit=3)
+        
+        # Only the user's interactions and the products themselves are read
+        with self.assertNumQueries(2):
+            self.assertEqual(ml_models.get_popular_products(limit=3, exclude_user_id=self.user.id), self.products[1:4])
+
+
+class TrainingJobTests(TestCase):
+    """Background training jobs, run in a separate process"""
+    
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch.object(ml_models, 'TRAINING_LOCK_PATH', os.path.join(directory.name, 'training.lock'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(ml_models.release_training_lock)
+    
+    def test_submit_hands_job_to_training_process_on_commit(self):
+        with mock.patch.object(training_jobs, 'get_executor') as get_executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                job = training_jobs.submit_training_job(only_if_missing=True)
+                get_executor.assert_not_called()
+        
+        get_executor.return_value.submit.assert_called_once_with(training_jobs.run_training_job, job.id, True)
+        self.assertEqual(job.status, 'pending')
+    
+    @mock.patch.object(training_jobs, 'ProcessPoolExecutor')
+    def test_executor_supports_python_3_10(self, executor):
+        self.addCleanup(setattr, training_jobs, '_executor', training_jobs._executor)
+        
+        with mock.patch.object(training_jobs.sys, 'version_info', (3, 10, 14)):
+            training_jobs.get_executor(replace=True)
+        self.assertNotIn('max_tasks_per_child', executor.call_args.kwargs)
+        
+        training_jobs.get_executor(replace=True)
+        self.assertEqual(executor.call_args.kwargs['max_tasks_per_child'], 1)
+    
+    @mock.patch('recommendations.ml_models._train_recommendation_models', return_value=True)
+    def test_run_training_job(self, train):
+        job = TrainingJob.objects.create()
+        training_jobs.run_training_job(job.id)
+        
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.phase), ('succeeded', 'done'))
+        self.assertFalse(ml_models.training_in_progress())
+    
+    @mock.patch('recommendations.ml_models._train_recommendation_models', return_value=True)
+    def test_run_training_job_while_another_run_holds_the_lock(self, train):
+        job = TrainingJob.objects.create()
+        ml_models.acquire_training_lock()
+        training_jobs.run_training_job(job.id)
+        
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ('failed', 'Another training run is in progress'))
+        train.assert_not_called()
+    
+    def test_orphaned_running_jobs_are_failed(self):
+        job = TrainingJob.objects.create(status='running')
+        
+        # Left alone while a trainer holds the lock
+        ml_models.acquire_training_lock()
+        self.assertEqual(training_jobs.fail_orphaned_training_jobs(), 0)
+        
+        ml_models.release_training_lock()
+        self.assertEqual(training_jobs.fail_orphaned_training_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIsNotNone(job.finished_at)
+    
+    def test_stale_pending_jobs_are_failed(self):
+        stale = TrainingJob.objects.create()
+        TrainingJob.objects.filter(id=stale.id).update(created_at=timezone.now() - datetime.timedelta(minutes=5))
+        fresh = TrainingJob.objects.create()
+        
+        # Left alone while a trainer holds the lock (they may be queued behind it)
+        ml_models.acquire_training_lock()
+        self.assertEqual(training_jobs.fail_orphaned_training_jobs(), 0)
+        
+        ml_models.release_training_lock()
+        self.assertEqual(training_jobs.fail_orphaned_training_jobs(), 1)
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual((stale.status, fresh.status), ('failed', 'pending'))
+    
+    @mock.patch('recommendations.ml_models._train_recommendation_models', return_value=True)
+    def test_job_failed_while_queued_is_not_run(self, train):
+        job = TrainingJob.objects.create(status='failed', phase='done')
+        training_jobs.run_training_job(job.id)
+        
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        train.assert_not_called()
+        self.assertFalse(ml_models.training_in_progress())
+    
+    def test_job_started_after_the_lock_probe_is_not_failed(self):
+        job = TrainingJob.objects.create()
+        
+        # The job takes the lock and marks itself running right after the lock was found free
+        def training_in_progress():
+            TrainingJob.objects.filter(id=job.id).update(status='running', started_at=timezone.now())
+            return False
+        
+        with mock.patch.object(ml_models, 'training_in_progress', side_effect=training_in_progress):
+            self.assertEqual(training_jobs.fail_orphaned_training_jobs(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'running')
+    
+    @mock.patch.object(training_jobs, 'connections')
+    def test_job_of_dead_training_process_is_failed(self, _):
+        job = TrainingJob.objects.create(status='running')
+        future = mock.Mock(**{'exception.return_value': RuntimeError('killed')})
+        training_jobs._training_job_done(job.id, future)
+        
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('killed', job.error)
+
+
+class StubRecommender:
+    """Stands in for a fitted HybridRecommender when publishing"""
+    
+    def save(self, directory):
+        open(os.path.join(directory, 'model.joblib'), 'w').close()
+
+
+class ModelStoreTests(SimpleTestCase):
+    """Versioned model store: publishing, pruning and rollback"""
+    
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.models_dir = directory.name
+        for name, value in (
+            ('MODELS_DIR', self.models_dir),
+            ('CURRENT_POINTER', os.path.join(self.models_dir, 'current')),
+            ('MODEL_STORE_LOCK_PATH', os.path.join(self.models_dir, 'store.lock')),
+            ('KEEP_VERSIONS', 3),
+        ):
+            patcher = mock.patch.object(ml_models, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    def publish(self, count):
+        return [ml_models.publish_recommender(StubRecommender(), artifact_format='joblib') for _ in range(count)]
+    
+    def test_publish(self):
+        versions = self.publish(2)
+        
+        self.assertEqual(ml_models.list_versions(), versions)
+        self.assertEqual(ml_models.get_current_version(), versions[1])
+        self.assertEqual([ml_models.read_manifest(version)['sequence'] for version in versions], [1, 2])
+        self.assertFalse([name for name in os.listdir(self.models_dir) if name.startswith('.staging-')])
+    
+    def test_versions_are_ordered_by_publish_order_when_the_clock_goes_back(self):
+        clock = mock.Mock(wraps=datetime.datetime)
+        clock.now.side_effect = [
+            datetime.datetime(2026, 10, 25, 1, 30, tzinfo=datetime.timezone.utc),
+            datetime.datetime(2026, 10, 25, 0, 45, tzinfo=datetime.timezone.utc),
+        ]
+        with mock.patch.object(ml_models, 'datetime', clock):
+            versions = self.publish(2)
+        
+        self.assertEqual(ml_models.list_versions(), versions)
+        self.assertEqual(ml_models.rollback_recommender(), versions[0])
+    
+    def test_versions_from_older_releases_sort_first(self):
+        legacy = 'hybrid-20261018124215694221'
+        os.makedirs(os.path.join(self.models_dir, legacy))
+        with open(os.path.join(self.models_dir, legacy, 'manifest.json'), 'w') as f:
+            f.write('{"version": "%s", "format": "joblib", "params": null}' % legacy)
+        
+        versions = self.publish(1)
+        self.assertEqual(ml_models.list_versions(), [legacy, *versions])
+    
+    def test_prune_keeps_newest_versions_and_the_served_one(self):
+        versions = self.publish(3)
+        ml_models.rollback_recommender(versions[0])
+        ml_models.prune_versions(keep=1)
+        
+        self.assertEqual(ml_models.list_versions(), [versions[0], versions[2]])
+        self.assertEqual(ml_models.get_current_version(), versions[0])
+    
+    def test_publish_prunes_old_versions(self):
+        versions = self.publish(5)
+        self.assertEqual(ml_models.list_versions(), versions[2:])
+    
+    def test_rollback(self):
+        versions = self.publish(3)
+        
+        self.assertEqual(ml_models.rollback_recommender(), versions[1])
+        self.assertEqual(ml_models.rollback_recommender(), versions[0])
+        self.assertIsNone(ml_models.rollback_recommender())
+        self.assertEqual(ml_models.get_current_version(), versions[0])
+        
+        self.assertEqual(ml_models.rollback_recommender(versions[2]), versions[2])
+        self.assertIsNone(ml_models.rollback_recommender('hybrid-00000099-20260101T000000000000Z'))
+        self.assertEqual(ml_models.get_current_version(), versions[2])
+
+    def test_incremental_versions_do_not_count_towards_trained_versions(self):
+        trained = self.publish(3)
+        incremental = [
+            ml_models.publish_recommender(StubRecommender(), artifact_format='joblib', kind='incremental')
+            for _ in range(5)
+        ]
+        self.assertEqual(ml_models.list_versions(), trained + incremental[2:])
+        
+        # A new training run supersedes the incremental versions
+        trained += self.publish(1)
+        self.assertEqual(ml_models.list_versions(), trained[1:])
+
+
+class ModelInfoViewTests(TestCase):
+    """Model info endpoint while versions are pruned concurrently"""
+    
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for target, name, value in (
+            (ml_models, 'MODELS_DIR', directory.name),
+            (views, 'MODELS_DIR', directory.name),
+            (ml_models, 'CURRENT_POINTER', os.path.join(directory.name, 'current')),
+            (ml_models, 'MODEL_STORE_LOCK_PATH', os.path.join(directory.name, 'store.lock')),
+        ):
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.versions = [ml_models.publish_recommender(StubRecommender(), artifact_format='joblib') for _ in range(2)]
+    
+    def test_versions_removed_while_listed_are_skipped(self):
+        getsize = os.path.getsize
+        
+        def getsize_of_pruned_files(path):
+            if self.versions[0] in path:
+                raise FileNotFoundError(path)
+            return getsize(path)
+        
+        with mock.patch.object(views, 'list_versions', return_value=[*self.versions, 'hybrid-00000003-20261018T120000000000Z']), \
+                mock.patch('recommendations.evaluation.os.path.getsize', side_effect=getsize_of_pruned_files):
+            response = self.client.get(reverse('model-info'))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(version['version'], version['current']) for version in response.json()['versions']],
+            [(self.versions[1], True), (self.versions[0], False)],
+        )
+
+
+class ModelRegistryTests(SimpleTestCase):
+    """Resident recommender, swapped in when a new version is published"""
+    
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for name, value in (
+            ('MODELS_DIR', directory.name),
+            ('CURRENT_POINTER', os.path.join(directory.name, 'current')),
+            ('MODEL_STORE_LOCK_PATH', os.path.join(directory.name, 'store.lock')),
+        ):
+            patcher = mock.patch.object(ml_models, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.registry = ml_models.ModelRegistry(check_interval=60)
+    
+    def test_no_model(self):
+        self.assertIsNone(self.registry.get())
+        self.assertIsNone(self.registry.version)
+    
+    def test_model_is_loaded_once_and_reloaded_when_a_version_is_published(self):
+        first = ml_models.publish_recommender(fit_hybrid(seed=0), artifact_format='joblib')
+        recommender = self.registry.get()
+        self.assertEqual((recommender.version, self.registry.version), (first, first))
+        
+        # Served from memory until the next check
+        with mock.patch.object(ml_models, 'load_recommender') as load_recommender:
+            self.assertIs(self.registry.get(), recommender)
+            load_recommender.assert_not_called()
+        
+        second = ml_models.publish_recommender(fit_hybrid(seed=1), artifact_format='joblib')
+        self.assertIs(self.registry.get(), recommender)
+        self.assertEqual(self.registry.reload().version, second)
+        self.assertEqual(self.registry.version, second)
+    
+    def test_failed_load_keeps_the_resident_model(self):
+        ml_models.publish_recommender(fit_hybrid(), artifact_format='joblib')
+        recommender = self.registry.get()
+        
+        ml_models.publish_recommender(fit_hybrid(seed=1), artifact_format='joblib')
+        with mock.patch.object(ml_models, 'load_recommender', side_effect=OSError('truncated')):
+            self.assertIs(self.registry.reload(), recommender)
+
+
+def product_frame(rng, ids, words):
+    """Products with random content drawn from `words`"""
+    return pd.DataFrame({
+        'id': np.asarray(ids, dtype=np.int64),
+        'name': [' '.join(rng.choice(words, size=3)) for _ in ids],
+        'description': [' '.join(rng.choice(words, size=12)) for _ in ids],
+        'category': rng.choice(['garden', 'kitchen', 'outdoor'], size=len(ids)),
+    })
+
+
+def fit_hybrid(seed=0, n_users=12, product_ids=range(1, 41)):
+    """A HybridRecommender fitted on random interactions with products drawn from product_frame"""
+    rng = np.random.default_rng(seed)
+    product_ids = list(product_ids)
+    products = product_frame(rng, product_ids, np.array([f'word{i}' for i in range(60)]))
+    interactions = pd.DataFrame({
+        'user_id': rng.integers(1, n_users + 1, size=10 * n_users),
+        'product_id': rng.choice(product_ids, size=10 * n_users),
+        'value': rng.integers(1, 5, size=10 * n_users).astype(float),
+    })
+    return HybridRecommender(n_neighbours=5).fit(interactions, products)
+
+
+class ContentModelUpdateTests(SimpleTestCase):
+    """Incremental product updates of the content-based model"""
+    
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+        self.words = np.array([f'word{i}' for i in range(150)])
+        self.model = ContentBasedFilteringModel(n_neighbours=5).fit(product_frame(self.rng, range(1, 81), self.words))
+    
+    def changes(self):
+        """An edit of product 3 and two new products, in the fitted vocabulary"""
+        return product_frame(self.rng, [3, 81, 82], self.words)
+    
+    def assert_exact_neighbours(self, model, atol=1e-5):
+        expected_indices, expected_scores = build_neighbour_table(model.product_features, k=5)
+        scores = model.neighbour_scores
+        if model.neighbour_score_scales is not None:
+            scores = dequantize_rows(scores, model.neighbour_score_scales)
+        np.testing.assert_allclose(scores, expected_scores, atol=atol)
+        if model.neighbour_score_scales is None:
+            np.testing.assert_array_equal(model.neighbour_indices, expected_indices)
+    
+    def test_update_products(self):
+        original = copy.copy(self.model)
+        original_features = self.model.product_features.copy()
+        changes = self.changes()
+        
+        self.assertTrue(self.model.update_products(changes))
+        
+        self.assertEqual(self.model.product_ids.tolist(), list(range(1, 83)))
+        expected = self.model.get_pipeline().transform(ContentBasedFilteringModel._product_content(changes))
+        rows = self.model.product_rows([3, 81, 82])
+        np.testing.assert_allclose(self.model.product_features[rows], expected)
+        np.testing.assert_array_equal(np.delete(self.model.product_features[:80], 2, axis=0), np.delete(original_features, 2, axis=0))
+        self.assert_exact_neighbours(self.model)
+        
+        # The model the copy was taken from (the served one) is untouched
+        self.assertEqual(len(original.product_ids), 80)
+        np.testing.assert_array_equal(original.product_features, original_features)
+    
+    def test_lookups_of_unsorted_ids_after_memory_mapped_load(self):
+        # Feature rows are in fit order, not ID order
+        model = ContentBasedFilteringModel(n_neighbours=5).fit(product_frame(self.rng, [50, 7, 93, 12, 61, 3], self.words))
+        
+        with tempfile.TemporaryDirectory() as directory:
+            loaded = ContentBasedFilteringModel.load_arrays(directory, model.save_arrays(directory), mmap_mode='r')
+            
+            self.assertIsInstance(loaded.sorted_product_ids, np.memmap)
+            self.assertEqual(loaded.product_rows([93, 3, 8, 50]).tolist(), [2, 5, -1, 0])
+            self.assertEqual(loaded.product_index(12), 3)
+            self.assertIsNone(loaded.product_index(1000))
+            self.assertEqual(loaded.get_similar_items(61, n=3), model.get_similar_items(61, n=3))
+            self.assertEqual(loaded.get_similar_items(8), [])
+    
+    def test_update_neighbours_with_quantized_scores(self):
+        self.model.compact(dtype=np.float32, quantize_neighbours=True)
+        self.assertTrue(self.model.update_products(self.changes()))
+        
+        self.assertEqual(self.model.neighbour_scores.dtype, np.int8)
+        self.assert_exact_neighbours(self.model, atol=0.02)
+    
+    def test_update_neighbours_after_repeated_updates(self):
+        for _ in range(3):
+            self.assertTrue(self.model.update_products(product_frame(self.rng, self.rng.choice(range(1, 81), 4, replace=False), self.words)))
+        self.assert_exact_neighbours(self.model)
+    
+    def test_vocabulary_drift_needs_refit(self):
+        features = self.model.product_features.copy()
+        unknown = np.array([f'novel{i}' for i in range(150)])
+        
+        self.assertFalse(self.model.update_products(product_frame(self.rng, range(81, 121), unknown)))
+        np.testing.assert_array_equal(self.model.product_features, features)
+
+
+@mock.patch('recommendations.training_jobs.content_updates')
+class ContentUpdateSignalTests(TestCase):
+    """Product saves queue content model updates only when content changes"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Garden')
+        cls.product = Product.objects.create(name='Spade', description='A spade', price=10, category=cls.category, stock=5)
+        cls.season = Season.objects.create(name='Spring', start_month=3, end_month=5, hemisphere='N')
+    
+    def save(self, product, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save(**kwargs)
+    
+    def test_created_product(self, content_updates):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(name='Rake', description='A rake', price=10, category=self.category, stock=5)
+        content_updates.add.assert_called_once_with([product.id])
+    
+    def test_stock_only_edits_are_ignored(self, content_updates):
+        product = Product.objects.get(id=self.product.id)
+        product.stock += 1
+        self.save(product)
+        self.save(product, update_fields=['stock'])
+        content_updates.add.assert_not_called()
+    
+    def test_content_edits(self, content_updates):
+        product = Product.objects.get(id=self.product.id)
+        product.description = 'A sturdy spade'
+        self.save(product)
+        content_updates.add.assert_called_once_with([product.id])
+    
+    def test_season_changes(self, content_updates):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.seasons.add(self.season)
+        content_updates.add.assert_called_once_with([self.product.id])
+        
+        content_updates.reset_mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.season.products.clear()
+        content_updates.add.assert_called_once_with([self.product.id])
+
+
+class ContentUpdateQueueTests(SimpleTestCase):
+    """Background content updates coalesce the products saved while an update runs"""
+    
+    def test_pending_products_are_coalesced(self):
+        queue = training_jobs.ContentUpdateQueue()
+        started, release = threading.Event(), threading.Event()
+        calls = []
+        
+        def update(product_ids):
+            calls.append(product_ids)
+            started.set()
+            release.wait(5)
+        
+        with mock.patch('recommendations.ml_models.update_content_model', side_effect=update):
+            queue.add([1])
+            started.wait(5)
+            queue.add([3, 2])
+            queue.add([2])
+            release.set()
+            queue._executor.shutdown(wait=True)
+        
+        self.assertEqual(calls, [[1], [2, 3]])
+
+
+class UpdateContentModelTests(TestCase):
+    """update_content_model builds on the latest published version"""
+    
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for target, value in (
+            ('CONTENT_UPDATE_LOCK_PATH', os.path.join(directory.name, 'content_update.lock')),
+            ('load_products_dataframe', mock.Mock(return_value=pd.DataFrame({'id': [1]}))),
+            ('get_current_version', mock.Mock(return_value='hybrid-00000002-20261018T130000000000Z')),
+            ('model_registry', mock.Mock()),
+            ('load_recommender', mock.Mock()),
+            ('publish_recommender', mock.Mock()),
+        ):
+            patcher = mock.patch.object(ml_models, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    def recommender(self, version, updated=True):
+        recommender = mock.Mock(version=version)
+        recommender.cb_model.update_products.return_value = updated
+        return recommender
+    
+    def test_update_is_built_from_the_latest_published_version(self):
+        # This process still serves an older version than another process published
+        ml_models.model_registry.reload.return_value = self.recommender('hybrid-00000001-20261018T120000000000Z')
+        ml_models.load_recommender.return_value = latest = self.recommender('hybrid-00000002-20261018T130000000000Z')
+        
+        with mock.patch('copy.copy', side_effect=lambda obj: obj):
+            self.assertTrue(ml_models.update_content_model([1]))
+        
+        ml_models.load_recommender.assert_called_once_with('hybrid-00000002-20261018T130000000000Z')
+        latest.cb_model.update_products.assert_called_once()
+        ml_models.publish_recommender.assert_called_once_with(latest, kind='incremental')
+    
+    @mock.patch('recommendations.training_jobs.submit_training_job')
+    def test_vocabulary_drift_queues_a_training_job(self, submit_training_job):
+        ml_models.model_registry.reload.return_value = self.recommender('hybrid-00000002-20261018T130000000000Z', updated=False)
+        
+        with mock.patch('copy.copy', side_effect=lambda obj: obj):
+            self.assertFalse(ml_models.update_content_model([1]))
+            
+            # Not queued again while the job is pending
+            TrainingJob.objects.create()
+            self.assertFalse(ml_models.update_content_model([1]))
+        
+        submit_training_job.assert_called_once_with()
+        ml_models.publish_recommender.assert_not_called()
+
+
+class EvaluationTests(SimpleTestCase):
+    """Ranking metrics and latency summaries reported by benchmark_recommender"""
+    
+    def test_ranking_metrics(self):
+        precision, recall, ndcg = ranking_metrics([1, 2, 3, 4, 5], {2, 4, 9}, k=4)
+        
+        # Hits at ranks 2 and 4; an ideal list has its three relevant items at ranks 1-3
+        self.assertAlmostEqual(precision, 2 / 4)
+        self.assertAlmostEqual(recall, 2 / 3)
+        self.assertAlmostEqual(ndcg, (1 / math.log2(3) + 1 / math.log2(5)) / (1 + 1 / math.log2(3) + 1 / math.log2(4)))
+    
+    def test_ranking_metrics_edge_cases(self):
+        # Fewer recommendations than k still divide precision by k
+        self.assertEqual(ranking_metrics([5], {5}, k=2), (0.5, 1.0, 1.0))
+        self.assertEqual(ranking_metrics([1, 2], set(), k=2), (0.0, 0.0, 0.0))
+        self.assertEqual(ranking_metrics([], {1}, k=3), (0.0, 0.0, 0.0))
+    
+    def test_latency_summary(self):
+        self.assertEqual(latency_summary([0.004, 0.001, 0.003, 0.002]), {
+            'count': 4,
+            'mean_ms': 2.5,
+            'p50_ms': 2.5,
+            'p95_ms': 3.85,
+            'p99_ms': 3.97,
+        })
+        self.assertEqual(latency_summary([]), {'count': 0})
+
+
+class CompactModelTests(SimpleTestCase):
+    """float32 factors and int8-quantised neighbour scores"""
+    
+    def test_quantize_rows(self):
+        scores = np.array([[0.9, 0.5, -0.3], [0.2, 0.1, -np.inf], [0.0, 0.0, 0.0]], dtype=np.float32)
+        codes, scales = quantize_rows(scores)
+        
+        self.assertEqual(codes.dtype, np.int8)
+        self.assertEqual(codes[0].tolist(), [127, 71, -42])
+        self.assertEqual(codes[1, 2], -128)
+        np.testing.assert_allclose(scales, [0.9 / 127, 0.2 / 127, 1.0], rtol=1e-6)
+        
+        # Each score is off by at most half a quantisation step; padding stays -inf
+        restored = dequantize_rows(codes, scales)
+        finite = np.isfinite(scores)
+        self.assertTrue(np.all(np.abs(restored[finite] - scores[finite]) <= np.repeat(scales, 3).reshape(3, 3)[finite] / 2 + 1e-7))
+        self.assertEqual(restored[1, 2], -np.inf)
+    
+    def test_compact_model_round_trips_through_both_artifact_formats(self):
+        recommender = fit_hybrid()
+        full_size = sum(recommender.memory_usage().values())
+        expected_similar = recommender.get_similar_items(7, n=5)
+        
+        recommender.compact(dtype=np.float32, quantize_neighbours=True)
+        self.assertLess(sum(recommender.memory_usage().values()), full_size)
+        self.assertEqual(recommender.cf_model.neighbour_scores.dtype, np.int8)
+        self.assertEqual(recommender.cb_model.product_features.dtype, np.float32)
+        
+        # Quantisation keeps the neighbours and their scores close
+        similar = recommender.get_similar_items(7, n=5)
+        self.assertEqual(len(similar), len(expected_similar))
+        np.testing.assert_allclose(
+            sorted(score for _, score in similar), sorted(score for _, score in expected_similar), atol=0.02
+        )
+        
+        profile = {'liked_categories': [1], 'liked_products': [3, 9]}
+        expected = recommender.recommend_for_user(2, user_profile=profile, n=5, current_month=6, hemisphere='N')
+        
+        for save, load in (
+            (recommender.save, lambda directory, params: HybridRecommender.load(directory)),
+            (recommender.save_arrays, lambda directory, params: HybridRecommender.load_arrays(directory, params)),
+        ):
+            with self.subTest(save=save.__name__), tempfile.TemporaryDirectory() as directory:
+                loaded = load(directory, save(directory))
+                
+                self.assertEqual(loaded.cf_model.neighbour_scores.dtype, np.int8)
+                self.assertEqual(loaded.get_similar_items(7, n=5), similar)
+                
+                # Memory-mapped arrays may take a different BLAS path, so scores can differ in the last bits
+                recommendations = loaded.recommend_for_user(2, user_profile=profile, n=5, current_month=6, hemisphere='N')
+                self.assertEqual([item_id for item_id, _ in recommendations], [item_id for item_id, _ in expected])
+                np.testing.assert_allclose([score for _, score in recommendations], [score for _, score in expected], rtol=1e-6)
+
+    
+    def test_float32_artifacts_serve_the_same_ranking(self):
+        # The same fit, saved in full and compact form
+        with tempfile.TemporaryDirectory() as full_directory, tempfile.TemporaryDirectory() as compact_directory:
+            # User 1000 only interacted with product 41, which no one else did, so the
+            # truncated SVD leaves their CF scores at rounding noise
+            rng = np.random.default_rng(0)
+            product_ids = list(range(1, 42))
+            products = product_frame(rng, product_ids, np.array([f'word{i}' for i in range(60)]))
+            interactions = pd.DataFrame({
+                'user_id': np.append(rng.integers(1, 21, size=200), 1000),
+                'product_id': np.append(rng.choice(product_ids[:-1], size=200), 41),
+                'value': np.append(rng.integers(1, 5, size=200), 1).astype(float),
+            })
+            recommender = HybridRecommender(n_neighbours=5).fit(interactions, products)
+            full = HybridRecommender.load_arrays(full_directory, recommender.save_arrays(full_directory))
+            recommender.compact(dtype=np.float32, quantize_neighbours=True)
+            compact = HybridRecommender.load_arrays(compact_directory, recommender.save_arrays(compact_directory))
+            self.assertEqual(compact.cb_model.product_features.dtype, np.float32)
+            
+            # Every trained user, plus one unknown to the CF model
+            for user_id in list(range(1, 21)) + [1000, 99]:
+                for profile in ({}, {'liked_categories': [1], 'liked_products': [user_id % 40 + 1]}):
+                    with self.subTest(user_id=user_id, profile=profile):
+                        expected = full.recommend_for_user(user_id, user_profile=profile, n=8, current_month=6, hemisphere='N')
+                        served = compact.recommend_for_user(user_id, user_profile=profile, n=8, current_month=6, hemisphere='N')
+                        self.assertEqual([item_id for item_id, _ in served], [item_id for item_id, _ in expected])
+                        np.testing.assert_allclose(
+                            [score for _, score in served], [score for _, score in expected], atol=1e-4
+                        )
+
+
+class HybridScoreFusionTests(SimpleTestCase):
+    """
+    Fused hybrid ranking over the whole catalog
+    
+    Catalog 10, 20, 30, 40; the CF model knows 10, 20, 30 and 50 (no longer in the
+    catalog) and the user already interacted with 30.
+    """
+    
+    def setUp(self):
+        self.recommender = HybridRecommender(cf_weight=0.7, cb_weight=0.3)
+        self.recommender.cf_model = mock.Mock(item_ids=np.array([10, 20, 30, 50]))
+        self.set_cf_scores(np.array([4.0, 2.0, 0.0, 9.0]), np.array([False, False, True, False]))
+        self.recommender.cb_model = ContentBasedFilteringModel()
+        self.recommender.cb_model.product_ids = np.array([10, 20, 30, 40])
+        self.recommender.cb_model._build_mappings()
+        self.cb_scores = np.array([0.1, 0.5, 0.9, 0.3])
+        self.recommender.cb_model.score_profiles = lambda profiles: (
+            np.array([self.cb_scores if profile else np.zeros(4) for profile in profiles]),
+            np.array([bool(profile) for profile in profiles]),
+        )
+    
+    def set_cf_scores(self, scores, interacted):
+        # Every user gets the same CF row; (None, None) makes every user unknown to CF
+        known = scores is not None
+        if not known:
+            scores, interacted = np.zeros(4), np.zeros(4, dtype=bool)
+        self.recommender.cf_model.score_users = lambda user_ids: (
+            np.tile(scores, (len(user_ids), 1)), np.tile(interacted, (len(user_ids), 1)), np.full(len(user_ids), known),
+        )
+    
+    def recommend(self, profile, **kwargs):
+        return [(item_id, round(score, 6)) for item_id, score in self.recommender.recommend_for_user(1, user_profile=profile, **kwargs)]
+    
+    def test_fused_ranking(self):
+        # CF scaled over 10, 20: 1, 0; CB scaled over 10, 20, 40: 0, 1, 0.5
+        self.assertEqual(self.recommend({'liked_products': [30]}), [(10, 0.7), (20, 0.3), (40, 0.15)])
+        self.assertEqual(self.recommend({'liked_products': [30]}, n=2), [(10, 0.7), (20, 0.3)])
+    
+    def test_excluded_items_are_left_out_of_the_scaling(self):
+        # CF scaled over 20 alone (constant, so 0); CB over 20, 40: 1, 0
+        self.assertEqual(self.recommend({'liked_products': [30]}, exclude_items=[10]), [(20, 0.3), (40, 0.0)])
+    
+    def test_cf_only(self):
+        # Without a profile only CF-known products are candidates
+        self.assertEqual(self.recommend({}), [(10, 0.7), (20, 0.0)])
+    
+    def test_cb_only(self):
+        # A user unknown to the CF model is ranked by content alone, including product 30
+        self.set_cf_scores(None, None)
+        self.assertEqual(self.recommend({'liked_products': [30]}), [(30, 0.3), (20, 0.15), (40, 0.075), (10, 0.0)])
+    
+    def test_near_zero_cf_scores_are_constant(self):
+        # Rounding noise in the CF row is not stretched to [0, 1], so CB alone ranks
+        self.set_cf_scores(np.array([1e-15, -2e-15, 0.0, 3e-15]), np.array([False, False, True, False]))
+        self.assertEqual(self.recommend({'liked_products': [30]}), [(20, 0.3), (40, 0.15), (10, 0.0)])
+        
+        # Noise on a larger magnitude, as in float32 artifacts
+        np.testing.assert_array_equal(
+            ml_models.normalize_scores(np.array([5.0, 5.0 + 2e-6, 5.0 - 1e-6]), np.ones(3, dtype=bool)), np.zeros(3)
+        )
+        np.testing.assert_allclose(
+            ml_models.normalize_scores(np.array([1e-3, 2e-3, 0.0]), np.ones(3, dtype=bool)), [0.5, 1.0, 0.0]
+        )
+    
+    def test_cold_start(self):
+        self.set_cf_scores(None, None)
+        self.assertEqual(self.recommend({}), [])
+    
+    def set_context(self, season_masks, countries):
+        cb_model = self.recommender.cb_model
+        cb_model.season_masks = np.array(season_masks, dtype=np.uint32)
+        cb_model.country_codes, cb_model.country_index = ml_models.build_availability_index(countries)
+        cb_model.region_codes, cb_model.region_index = ml_models.build_availability_index([[]] * len(countries))
+    
+    def test_seasonal_and_location_boosts_are_added(self):
+        june = ml_models.season_mask(6, 6, 'N')
+        self.set_context([0, 0, 0, june], [[], ['US'], [], []])
+        
+        # In season in June, product 40 moves above 20; outside June the ranking is unchanged
+        self.assertEqual(
+            self.recommend({'liked_products': [30]}, current_month=6, hemisphere='N'),
+            [(10, 0.7), (40, 0.35), (20, 0.3)],
+        )
+        self.assertEqual(
+            self.recommend({'liked_products': [30]}, current_month=7, hemisphere='N'),
+            [(10, 0.7), (20, 0.3), (40, 0.15)],
+        )
+        
+        # Product 20 is available in the user's country
+        self.assertEqual(
+            self.recommend({'liked_products': [30]}, current_month=7, hemisphere='N', user_location={'country': 'US'}),
+            [(10, 0.7), (20, 0.4), (40, 0.15)],
+        )
+    
+    def test_batch_matches_per_user_recommendations(self):
+        self.set_context([0, 0, 0, ml_models.season_mask(6, 6, 'N')], [[], ['US'], [], []])
+        users = {
+            1: ({'liked_products': [30]}, [], ('N', {'country': 'US'})),
+            2: ({}, [10], ('N', None)),
+            3: ({'liked_products': [30]}, [40], (None, None)),
+            4: ({}, [], ('S', {'country': 'US'})),
+        }
+        
+        # Blocks of three users, so per-user exclusions and contexts must hold across blocks
+        batch = self.recommender.recommend_for_users(
+            list(users),
+            user_profiles={user_id: profile for user_id, (profile, _, _) in users.items()},
+            n=3,
+            exclude_items={user_id: exclude_items for user_id, (_, exclude_items, _) in users.items()},
+            current_month=6,
+            user_contexts={user_id: context for user_id, (_, _, context) in users.items()},
+            block_size=3,
+        )
+        
+        self.assertEqual(list(batch), list(users))
+        for user_id, (profile, exclude_items, (hemisphere, user_location)) in users.items():
+            expected = self.recommender.recommend_for_user(
+                user_id, user_profile=profile, n=3, exclude_items=exclude_items,
+                current_month=6, hemisphere=hemisphere, user_location=user_location,
+            )
+            self.assertEqual(batch[user_id], expected)
+    
+    def test_boost_lifts_the_lowest_scored_product(self):
+        # Product 10 scales to a CB score of 0 and still gains the seasonal boost
+        self.set_cf_scores(None, None)
+        self.set_context([ml_models.season_mask(6, 6, 'N'), 0, 0, 0], [[], [], [], []])
+        
+        self.assertEqual(
+            self.recommend({'liked_products': [30]}, current_month=6, hemisphere='N'),
+            [(30, 0.3), (10, 0.2), (20, 0.15), (40, 0.075)],
+        )
+
+
+class ThreadBudgetTests(SimpleTestCase):
+    """BLAS thread limits for scoring and training blocks"""
+    
+    def setUp(self):
+        self.controller = mock.Mock()
+        for name, value in (
+            ('_controller', self.controller),
+            ('_original_limits', None),
+            ('_current_limit', None),
+            ('SERVING_THREADS', 1),
+            ('TRAINING_THREADS', 8),
+        ):
+            patcher = mock.patch.object(thread_budget, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    def test_serving_budget_is_scoped(self):
+        with thread_budget.serving_threads():
+            self.assertEqual(thread_budget.current_threads(), 1)
+        
+        # Nothing outside a scoring block is throttled
+        self.assertIsNone(thread_budget.current_threads())
+        self.controller.limit.return_value.restore_original_limits.assert_called_once_with()
+        with thread_budget.training_threads():
+            self.assertEqual(thread_budget.current_threads(), 8)
+    
+    def test_overlapping_blocks(self):
+        first, second = thread_budget.serving_threads(), thread_budget.serving_threads()
+        first.__enter__()
+        second.__enter__()
+        
+        # A training run started while requests score takes over the pools
+        with thread_budget.training_threads():
+            self.assertEqual(thread_budget.current_threads(), 8)
+        self.assertEqual(thread_budget.current_threads(), 1)
+        
+        # The budget holds until the last concurrent scoring block ends
+        first.__exit__(None, None, None)
+        self.assertEqual(thread_budget.current_threads(), 1)
+        second.__exit__(None, None, None)
+        self.assertIsNone(thread_budget.current_threads())
+
+
+class TrainedCatalogTestData:
+    """Catalog, users and interactions for tests that train a real HybridRecommender on the database"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        rng = np.random.default_rng(0)
+        words = np.array([f'word{i}' for i in range(60)])
+        categories = [Category.objects.create(name=name) for name in ('Garden', 'Kitchen', 'Outdoor')]
+        cls.products = [
+            Product.objects.create(
+                name=f'Product {i} ' + ' '.join(rng.choice(words, size=2)), description=' '.join(rng.choice(words, size=12)),
+                price=10, category=categories[i % 3], stock=5,
+            )
+            for i in range(30)
+        ]
+        cls.users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='x') for i in range(8)
+        ]
+        UserProductInteraction.objects.bulk_create(
+            UserProductInteraction(user=user, product=product, interaction_type=interaction_type, value=1)
+            for user in cls.users
+            for product in rng.choice(cls.products, size=6, replace=False)
+            for interaction_type in rng.choice(['view', 'cart', 'purchase'], size=1)
+        )
+    
+    def train(self):
+        """A recommender trained on the interactions stored so far, served by model_registry"""
+        recommender = HybridRecommender(n_neighbours=5).fit(*ml_models.prepare_data_for_training())
+        recommender.version = 'hybrid-00000001-20261018T120000000000Z'
+        patcher = mock.patch.object(ml_models.model_registry, 'get', return_value=recommender)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return recommender
+
+
+@mock.patch.object(ml_models, 'recommendation_cache', mock.Mock(**{'get.return_value': (None, None)}))
+class FoldInTests(TrainedCatalogTestData, TestCase):
+    """Interactions made since training are folded into the CF model at request time"""
+    
+    def interact(self, user, product, value, interaction_type='view'):
+        UserProductInteraction.objects.update_or_create(
+            user=user, product=product, interaction_type=interaction_type, defaults={'value': value}
+        )
+    
+    def expected_factors(self, recommender, user):
+        cf_model = recommender.cf_model
+        rows = UserProductInteraction.objects.filter(user=user).values_list('product_id', 'interaction_type', 'value')
+        factors = np.zeros(len(cf_model.model.components_))
+        for product_id, interaction_type, value in rows:
+            if cf_model.item_index(product_id) is not None:
+                factors += cf_model.model.components_[:, cf_model.item_index(product_id)] * value * ml_models.INTERACTION_WEIGHTS[interaction_type]
+        return factors
+    
+    def test_new_user_is_folded_in(self):
+        recommender = self.train()
+        newcomer = User.objects.create_user(username='newcomer', email='newcomer@example.com', password='x')
+        self.interact(newcomer, self.products[0], 1)
+        self.interact(newcomer, self.products[1], 2)
+        
+        recommended = ml_models.get_recommendations_for_user(newcomer.id)
+        
+        self.assertTrue(recommended)
+        self.assertFalse({self.products[0], self.products[1]} & set(recommended))
+        np.testing.assert_allclose(recommender.cf_model.user_factors_cache[newcomer.id][1], self.expected_factors(recommender, newcomer))
+    
+    def test_fold_in_reflects_new_and_updated_interactions(self):
+        recommender = self.train()
+        user = self.users[0]
+        ml_models.get_recommendations_for_user(user.id)
+        first = recommender.cf_model.user_factors_cache[user.id][1]
+        
+        # Unchanged interactions reuse the cached vector
+        ml_models.get_recommendations_for_user(user.id)
+        self.assertIs(recommender.cf_model.user_factors_cache[user.id][1], first)
+        
+        # New interactions
+        new_products = [
+            product for product in self.products
+            if not UserProductInteraction.objects.filter(user=user, product=product).exists()
+        ][:2]
+        self.interact(user, new_products[0], 1)
+        self.interact(user, new_products[1], 2)
+        ml_models.get_recommendations_for_user(user.id)
+        np.testing.assert_allclose(recommender.cf_model.user_factors_cache[user.id][1], self.expected_factors(recommender, user))
+        
+        # Upserts that swap two values keep the count, the total and every created_at
+        for product, value in zip(new_products, (2, 1)):
+            UserProductInteraction.objects.filter(user=user, product=product).update(
+                value=value, updated_at=timezone.now() + datetime.timedelta(seconds=1)
+            )
+        ml_models.get_recommendations_for_user(user.id)
+        np.testing.assert_allclose(recommender.cf_model.user_factors_cache[user.id][1], self.expected_factors(recommender, user))
+
+
+@mock.patch.object(ml_models, 'recommendation_cache', mock.Mock(**{'get.return_value': (None, None)}))
+class BatchRefreshTests(TrainedCatalogTestData, TestCase):
+    """Batch refreshes store what the request path serves, including interactions made since training"""
+    
+    def setUp(self):
+        self.recommender = self.train()
+        
+        # Interactions made after training, by a known user and by a new one
+        user = self.users[0]
+        for product in [
+            product for product in self.products
+            if not UserProductInteraction.objects.filter(user=user, product=product).exists()
+        ][:2]:
+            UserProductInteraction.objects.create(user=user, product=product, interaction_type='purchase', value=1)
+        self.newcomer = User.objects.create_user(username='newcomer', email='newcomer@example.com', password='x')
+        for product in self.products[:3]:
+            UserProductInteraction.objects.create(user=self.newcomer, product=product, interaction_type='review', value=5)
+    
+    def stored(self, user):
+        return list(
+            UserProductRecommendation.objects.filter(user=user).order_by('-score').values_list('product_id', flat=True)
+        )
+    
+    def served(self, user):
+        return [product.id for product in ml_models.get_recommendations_for_user(user.id, limit=5)]
+    
+    def test_refresh_matches_request_path(self):
+        call_command('refresh_recommendations', '--workers', '1', '--limit', '5', stdout=StringIO())
+        
+        for user in self.users + [self.newcomer]:
+            self.assertEqual(len(self.stored(user)), 5)
+            self.assertEqual(self.stored(user), self.served(user))
+        self.assertFalse(set(self.stored(self.newcomer)) & {product.id for product in self.products[:3]})
+    
+    def test_refresh_since_scores_current_interactions(self):
+        call_command(
+            'refresh_recommendations', '--workers', '1', '--limit', '5',
+            '--since', (timezone.now() - datetime.timedelta(minutes=1)).isoformat(), stdout=StringIO(),
+        )
+        
+        for user in (self.users[0], self.newcomer):
+            self.assertEqual(self.stored(user), self.served(user))
+    
+    def test_precompute_matches_request_path(self):
+        call_command('precompute_recommendations', '--chunk-size', '4', '--limit', '5', stdout=StringIO())
+        
+        for user in self.users + [self.newcomer]:
+            self.assertEqual(self.stored(user), self.served(user))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'recommendation-cache-tests'}})
+class RecommendationCacheTests(TrainedCatalogTestData, TestCase):
+    """Recommendation results are shared through Django's cache and go stale when interactions are written"""
+    
+    def setUp(self):
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+    
+    def test_entries_are_keyed_by_token_version_and_limit(self):
+        cache = RecommendationCache(ttl=60)
+        products, token = cache.get(1, 'v1', 8)
+        self.assertIsNone(products)
+        
+        # A write while the recommendations were being computed
+        cache.invalidate(1)
+        cache.set(1, token, 'v1', 8, ['computed before the write'])
+        self.assertIsNone(cache.get(1, 'v1', 8)[0])
+        
+        _, token = cache.get(1, 'v1', 8)
+        cache.set(1, token, 'v1', 8, ['fresh'])
+        
+        # Another worker process reads the same entry
+        self.assertEqual(RecommendationCache(ttl=60).get(1, 'v1', 8)[0], ['fresh'])
+        self.assertIsNone(cache.get(1, 'v2', 8)[0])
+        self.assertIsNone(cache.get(1, 'v1', 4)[0])
+        self.assertIsNone(cache.get(2, 'v1', 8)[0])
+        
+        # Invalidation by another worker process
+        RecommendationCache(ttl=60).invalidate_many([1, 2])
+        self.assertIsNone(cache.get(1, 'v1', 8)[0])
+    
+    def test_interaction_writes_invalidate_and_next_read_recomputes(self):
+        recommender = self.train()
+        user = self.users[0]
+        new_products = [
+            product for product in self.products
+            if not UserProductInteraction.objects.filter(user=user, product=product).exists()
+        ]
+        
+        with mock.patch.object(recommender, 'recommend_for_users', wraps=recommender.recommend_for_users) as score:
+            first = ml_models.get_recommendations_for_user(user.id)
+            self.assertEqual(ml_models.get_recommendations_for_user(user.id), first)
+            self.assertEqual(score.call_count, 1)
+            
+            # Buffered view events
+            events = InteractionEventBuffer()
+            with mock.patch.object(events, '_ensure_started'):
+                events.record(user.id, first[0].id, 'view')
+            with self.captureOnCommitCallbacks(execute=True):
+                events.flush()
+            recommended = ml_models.get_recommendations_for_user(user.id)
+            self.assertEqual(score.call_count, 2)
+            self.assertNotIn(first[0], recommended)
+            
+            # Synced reviews
+            Review.objects.create(product=recommended[0], user=user, rating=5, comment='Great')
+            with self.captureOnCommitCallbacks(execute=True):
+                RecommendationEngine.update_user_product_interactions()
+            self.assertNotIn(recommended[0], ml_models.get_recommendations_for_user(user.id))
+            self.assertEqual(score.call_count, 3)
+            
+            # Other users keep their entries
+            ml_models.get_recommendations_for_user(self.users[1].id)
+            ml_models.get_recommendations_for_user(self.users[1].id)
+            self.assertEqual(score.call_count, 4)
 
-# Create your tests here.
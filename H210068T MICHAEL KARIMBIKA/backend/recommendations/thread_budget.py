@@ -0,0 +1,129 @@
+import os
+import threading
+from contextlib import contextmanager
+from django.conf import settings
+from threadpoolctl import ThreadpoolController
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# BLAS/OpenMP threads per process for request-time scoring. Every server worker has its
+# own thread pools, so N workers x all cores threads would compete for the same CPUs
+SERVING_THREADS = getattr(settings, 'RECOMMENDER_SERVING_THREADS', 1)
+
+# BLAS/OpenMP threads for training runs (None = all cores)
+TRAINING_THREADS = getattr(settings, 'RECOMMENDER_TRAINING_THREADS', None)
+
+# Thread pool limits are process-wide, so they are tracked here rather than per thread
+_state_lock = threading.Lock()
+_controller = None
+_original_limits = None
+_current_limit = None
+_active_training_runs = 0
+_active_scoring_calls = 0
+_idle_limit = None
+
+
+def get_controller():
+    """Get the process's threadpoolctl controller (inspecting the loaded libraries once)"""
+    global _controller
+    if _controller is None:
+        _controller = ThreadpoolController()
+    return _controller
+
+
+def current_threads():
+    """Thread limit currently applied by this module, or None if the library defaults are in use"""
+    return _current_limit
+
+
+def _set_limit(n_threads):
+    """Apply a thread limit to all BLAS and OpenMP pools (None restores the library defaults)"""
+    global _original_limits, _current_limit
+    if n_threads == _current_limit:
+        return
+    
+    if n_threads is None:
+        _original_limits.restore_original_limits()
+        _original_limits = None
+    else:
+        limiter = get_controller().limit(limits=n_threads)
+        if _original_limits is None:
+            _original_limits = limiter
+    _current_limit = n_threads
+
+
+def _apply_budget():
+    """Apply the budget of the active blocks: training wins over scoring, and with neither the idle limit is restored"""
+    if _active_training_runs:
+        _set_limit(TRAINING_THREADS or os.cpu_count())
+    elif _active_scoring_calls:
+        _set_limit(SERVING_THREADS)
+    else:
+        _set_limit(_idle_limit)
+
+
+def _enter_budget(kind):
+    global _active_training_runs, _active_scoring_calls, _idle_limit
+    with _state_lock:
+        if not _active_training_runs and not _active_scoring_calls:
+            _idle_limit = _current_limit
+        if kind == 'training':
+            _active_training_runs += 1
+        else:
+            _active_scoring_calls += 1
+        _apply_budget()
+
+
+def _exit_budget(kind):
+    global _active_training_runs, _active_scoring_calls
+    with _state_lock:
+        if kind == 'training':
+            _active_training_runs -= 1
+        else:
+            _active_scoring_calls -= 1
+        _apply_budget()
+
+
+@contextmanager
+def serving_threads():
+    """
+    Run a block (request-time scoring) with the serving thread budget
+    
+    The limit only applies while at least one scoring block runs, so training or
+    benchmarks run afterwards in the same process get their own budget back.
+    While a training run in this process holds the training budget, the limit is
+    left alone and requests share the training thread pools.
+    """
+    _enter_budget('serving')
+    try:
+        yield
+    finally:
+        _exit_budget('serving')
+
+
+@contextmanager
+def training_threads():
+    """Run a block (a training run) with the training thread budget, restoring the previous limit after"""
+    _enter_budget('training')
+    logger.info(f"Training with {TRAINING_THREADS or os.cpu_count()} BLAS threads")
+    
+    try:
+        yield
+    finally:
+        _exit_budget('training')
+
+
+@contextmanager
+def limit_threads(n_threads):
+    """Run a block with a fixed thread limit, e.g. to benchmark a budget (None leaves the limits unchanged)"""
+    with _state_lock:
+        previous = _current_limit
+        _set_limit(n_threads if n_threads is not None else previous)
+    
+    try:
+        yield
+    finally:
+        with _state_lock:
+            _set_limit(previous)
@@ -0,0 +1,238 @@
+import multiprocessing
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+import django
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import TrainingJob
+from datetime import timedelta
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# A job is handed to its server process's training executor when it is created, and
+# the executor runs one job at a time, so a job still pending this long while no
+# training run holds the lock was lost with that process
+PENDING_JOB_TIMEOUT = timedelta(seconds=getattr(settings, 'RECOMMENDER_PENDING_JOB_TIMEOUT', 60))
+
+# Training runs in a separate process, one job at a time per server process, so it
+# neither holds the GIL against request threads nor dies silently with a request
+# thread. The process is spawned (not forked from a threaded server) and sets up
+# Django itself; it exits after each job, returning the training memory (Python 3.11+,
+# earlier versions keep the process for the next job)
+_executor_lock = threading.Lock()
+_executor = None
+
+
+def get_executor(replace=False):
+    """Get this process's training executor (a new one if `replace`, e.g. after its process died)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None or replace:
+            options = {'max_tasks_per_child': 1} if sys.version_info >= (3, 11) else {}
+            _executor = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup,
+                **options,
+            )
+        return _executor
+
+
+class ContentUpdateQueue:
+    """
+    Background queue of products whose content changed, applied to the content model in batches
+    
+    Saving a product only records its ID. One background thread per process applies
+    the pending IDs with update_content_model; IDs recorded while an update runs are
+    coalesced into the next one, so a burst of saves publishes a few versions rather
+    than one per save.
+    """
+    def __init__(self):
+        self._pending = set()
+        self._scheduled = False
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='content-model-updates')
+    
+    def add(self, product_ids):
+        """Queue products for the next content model update"""
+        with self._lock:
+            self._pending.update(product_ids)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._executor.submit(self._run)
+    
+    def _run(self):
+        from .ml_models import update_content_model
+        
+        with self._lock:
+            product_ids, self._pending = sorted(self._pending), set()
+            self._scheduled = False
+        
+        # This thread holds its own database connection
+        close_old_connections()
+        try:
+            update_content_model(product_ids)
+        except Exception as e:
+            logger.error(f"Error updating content model for products {product_ids}: {e}")
+        finally:
+            close_old_connections()
+
+
+# Content changes of products saved in this process
+content_updates = ContentUpdateQueue()
+
+
+def submit_training_job(requested_by=None, only_if_missing=False):
+    """
+    Queue a training run and return immediately
+    
+    Args:
+        requested_by: User who requested the training, if any
+        only_if_missing: Skip training if a model has been published by the
+            time the job starts (used by the request-path fallback)
+        
+    Returns:
+        TrainingJob instance tracking the run
+    """
+    fail_orphaned_training_jobs()
+    job = TrainingJob.objects.create(requested_by=requested_by)
+    
+    # Start only once the job row is visible to the training process's connection
+    transaction.on_commit(lambda: _start_training_job(job.id, only_if_missing))
+    return job
+
+
+def _start_training_job(job_id, only_if_missing):
+    """Hand a queued job to the training process"""
+    try:
+        future = get_executor().submit(run_training_job, job_id, only_if_missing)
+    except BrokenProcessPool:
+        # The previous training process died, so this one can no longer be used
+        future = get_executor(replace=True).submit(run_training_job, job_id, only_if_missing)
+    future.add_done_callback(partial(_training_job_done, job_id))
+
+
+def _training_job_done(job_id, future):
+    """Record jobs whose training process died, and serve a newly trained model from this process"""
+    error = future.exception()
+    if error is not None:
+        logger.error(f"Training job {job_id} did not complete: {error!r}")
+        try:
+            _finish_failed_job(job_id, f'Training process exited: {error!r}')
+        finally:
+            # This callback runs on the executor's management thread
+            connections.close_all()
+        return
+    
+    # Other workers pick the model up on their next reload check
+    from .ml_models import model_registry
+    model_registry.reload()
+
+
+def _finish_failed_job(job_id, error):
+    TrainingJob.objects.filter(id=job_id, status__in=['pending', 'running']).update(
+        status='failed', phase='done', error=error, finished_at=timezone.now()
+    )
+
+
+def fail_orphaned_training_jobs():
+    """
+    Mark running and stale pending jobs whose training process is gone as failed
+    
+    A job is 'running' only while its process holds the training lock, which the
+    OS releases when that process exits, so a running job without a lock holder
+    was lost with its process (e.g. a recycled server worker). A job marks itself
+    running only after taking the lock, so jobs started after the lock was found
+    free are left alone. A pending job waits in its process's executor only behind
+    a job holding the lock, so one older than PENDING_JOB_TIMEOUT without a lock
+    holder was lost before it started (run_training_job skips it if it does start).
+    
+    Returns:
+        Number of jobs marked as failed
+    """
+    from .ml_models import training_in_progress
+    
+    probed_at = timezone.now()
+    if training_in_progress():
+        return 0
+    
+    count = TrainingJob.objects.filter(
+        Q(status='running', started_at__lt=probed_at)
+        | Q(status='running', started_at__isnull=True)
+        | Q(status='pending', created_at__lt=probed_at - PENDING_JOB_TIMEOUT)
+    ).update(
+        status='failed', phase='done', error='Training process exited before the job finished',
+        finished_at=timezone.now(),
+    )
+    if count:
+        logger.warning(f"Marked {count} orphaned training jobs as failed")
+    return count
+
+
+def run_training_job(job_id, only_if_missing=False):
+    """
+    Train the recommendation models for a queued job, recording phase and outcome
+    
+    The job holds the training lock from the moment it is marked running until its
+    outcome is recorded.
+    
+    Args:
+        job_id: TrainingJob ID
+        only_if_missing: Skip training if a model is already available
+    """
+    from .ml_models import (
+        _train_recommendation_models, acquire_training_lock, release_training_lock, get_current_version,
+    )
+    from .thread_budget import training_threads
+    
+    close_old_connections()
+    try:
+        if not acquire_training_lock():
+            logger.warning("Recommendation model training already in progress, skipping")
+            _finish_failed_job(job_id, 'Another training run is in progress')
+            return
+        
+        try:
+            # A job failed as orphaned while it was queued stays failed
+            if not TrainingJob.objects.filter(id=job_id, status='pending').update(
+                status='running', started_at=timezone.now()
+            ):
+                logger.warning(f"Training job {job_id} is no longer pending, skipping")
+                return
+            
+            # Another process may have trained while this job was queued
+            if only_if_missing and get_current_version() is not None:
+                TrainingJob.objects.filter(id=job_id).update(
+                    status='succeeded', phase='done', finished_at=timezone.now()
+                )
+                return
+            
+            def on_phase(phase):
+                TrainingJob.objects.filter(id=job_id).update(phase=phase)
+            
+            try:
+                with training_threads():
+                    success = _train_recommendation_models(on_phase=on_phase)
+                error = '' if success else 'Training failed, see server logs for details'
+            except Exception as e:
+                logger.error(f"Training job {job_id} failed: {e}")
+                success, error = False, str(e)
+            
+            TrainingJob.objects.filter(id=job_id).update(
+                status='succeeded' if success else 'failed',
+                phase='done',
+                error=error,
+                finished_at=timezone.now(),
+            )
+        finally:
+            release_training_lock()
+    finally:
+        close_old_connections()
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import similar_products, recommended_products, featured_products, seasonal_products, model_info, train_models
+from .views import similar_products, recommended_products, featured_products, seasonal_products, model_info, train_models, training_job_status
 
 urlpatterns = [
     path('similar-products/<int:product_id>/', similar_products, name='similar-products'),
@@ -8,5 +8,6 @@ urlpatterns = [
     path('seasonal-products/', seasonal_products, name='seasonal-products'),
     path('recommendation-models/info/', model_info, name='model-info'),
     path('recommendation-models/train/', train_models, name='train-models'),
+    path('recommendation-models/train/<int:job_id>/', training_job_status, name='training-job-status'),
 ]
 
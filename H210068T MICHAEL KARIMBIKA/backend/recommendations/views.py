@@ -1,13 +1,27 @@
-from rest_framework import viewsets, permissions
+from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.db.models import Q
 from products.models import Product
 from products.serializers import ProductSerializer
+from .models import UserProductInteraction, ProductSimilarity, UserProductRecommendation, TrainingJob
 from .recommendation_engine import RecommendationEngine
-from .ml_models import get_recommendations_for_user, get_similar_products
+from .training_jobs import submit_training_job, fail_orphaned_training_jobs
+from .ml_models import (
+    get_recommendations_for_user, get_similar_products, model_registry,
+    MODELS_DIR, get_current_version, list_versions, read_manifest,
+)
+from .evaluation import directory_size
 import datetime
+import os
+
+def with_model_version(response):
+    """Tag a response with the recommendation model version served by this process"""
+    if model_registry.version:
+        response['X-Model-Version'] = model_registry.version
+    return response
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
@@ -22,7 +36,7 @@ def similar_products(request, product_id):
     similar_products = RecommendationEngine.get_similar_products(product, user=user)
     
     serializer = ProductSerializer(similar_products, many=True, context={'request': request})
-    return Response(serializer.data)
+    return with_model_version(Response(serializer.data))
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
@@ -46,7 +60,7 @@ def recommended_products(request):
         if recommendation:
             product['matchScore'] = int(recommendation.score * 100)
     
-    return Response(serializer.data)
+    return with_model_version(Response(serializer.data))
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
@@ -125,55 +139,29 @@ def model_info(request):
     """
     Get information about the recommendation models
     """
-    import os
-    from django.conf import settings
-    
-    MODELS_DIR = os.path.join(settings.BASE_DIR, 'models')
-    
-    # Check if models exist
-    cf_model_path = os.path.join(MODELS_DIR, 'collaborative_model.joblib')
-    cb_model_path = os.path.join(MODELS_DIR, 'content_model.joblib')
-    hybrid_params_path = os.path.join(MODELS_DIR, 'hybrid_params.joblib')
-    
-    cf_model_exists = os.path.exists(cf_model_path)
-    cb_model_exists = os.path.exists(cb_model_path)
-    hybrid_params_exist = os.path.exists(hybrid_params_path)
-    
-    # Get model file sizes and modification times
-    model_info = {}
-    
-    if cf_model_exists:
-        cf_size = os.path.getsize(cf_model_path) / (1024 * 1024)  # Size in MB
-        cf_modified = datetime.datetime.fromtimestamp(os.path.getmtime(cf_model_path))
-        model_info['collaborative_model'] = {
-            'exists': True,
-            'size_mb': round(cf_size, 2),
-            'last_modified': cf_modified.strftime('%Y-%m-%d %H:%M:%S')
-        }
-    else:
-        model_info['collaborative_model'] = {'exists': False}
-    
-    if cb_model_exists:
-        cb_size = os.path.getsize(cb_model_path) / (1024 * 1024)  # Size in MB
-        cb_modified = datetime.datetime.fromtimestamp(os.path.getmtime(cb_model_path))
-        model_info['content_model'] = {
-            'exists': True,
-            'size_mb': round(cb_size, 2),
-            'last_modified': cb_modified.strftime('%Y-%m-%d %H:%M:%S')
-        }
-    else:
-        model_info['content_model'] = {'exists': False}
-    
-    if hybrid_params_exist:
-        hybrid_size = os.path.getsize(hybrid_params_path) / 1024  # Size in KB
-        hybrid_modified = datetime.datetime.fromtimestamp(os.path.getmtime(hybrid_params_path))
-        model_info['hybrid_params'] = {
-            'exists': True,
-            'size_kb': round(hybrid_size, 2),
-            'last_modified': hybrid_modified.strftime('%Y-%m-%d %H:%M:%S')
-        }
-    else:
-        model_info['hybrid_params'] = {'exists': False}
+    current_version = get_current_version()
+    
+    # Get published model versions with their size and creation time
+    versions = []
+    for version in reversed(list_versions()):
+        # Versions pruned by another process while they are listed are skipped
+        manifest = read_manifest(version)
+        if manifest is None:
+            continue
+        size = directory_size(os.path.join(MODELS_DIR, version)) / (1024 * 1024)  # Size in MB
+        versions.append({
+            'version': version,
+            'format': manifest.get('format'),
+            'created_at': manifest.get('created_at'),
+            'size_mb': round(size, 2),
+            'current': version == current_version,
+        })
+    
+    model_info = {
+        'current_version': current_version,
+        'serving_version': model_registry.version,
+        'versions': versions,
+    }
     
     # Get database stats
     model_info['database_stats'] = {
@@ -183,20 +171,44 @@ def model_info(request):
         'recommendations': UserProductRecommendation.objects.count()
     }
     
-    return Response(model_info)
+    return with_model_version(Response(model_info))
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAdminUser])
 def train_models(request):
     """
-    Trigger training of recommendation models (admin only)
+    Queue training of recommendation models in the background (admin only)
     """
-    from .ml_models import train_recommendation_models
-    
-    success = train_recommendation_models()
-    
-    if success:
-        return Response({'status': 'success', 'message': 'Models trained successfully'})
-    else:
-        return Response({'status': 'error', 'message': 'Failed to train models'}, status=500)
+    job = submit_training_job(requested_by=request.user)
+    
+    return Response({
+        'status': 'accepted',
+        'message': 'Model training queued',
+        'job_id': job.id,
+        'status_url': reverse('training-job-status', args=[job.id]),
+    }, status=status.HTTP_202_ACCEPTED)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def training_job_status(request, job_id):
+    """
+    Get the phase, elapsed time and outcome of a training job (admin only)
+    """
+    job = get_object_or_404(TrainingJob, id=job_id)
+    
+    # A running or queued job whose training process exited is reported as failed
+    if job.status in ('pending', 'running') and fail_orphaned_training_jobs():
+        job.refresh_from_db()
+    
+    return Response({
+        'job_id': job.id,
+        'status': job.status,
+        'phase': job.phase,
+        'phase_display': job.get_phase_display(),
+        'elapsed_seconds': round(job.elapsed_seconds, 2) if job.elapsed_seconds is not None else None,
+        'error': job.error,
+        'created_at': job.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'started_at': job.started_at.strftime('%Y-%m-%d %H:%M:%S') if job.started_at else None,
+        'finished_at': job.finished_at.strftime('%Y-%m-%d %H:%M:%S') if job.finished_at else None,
+    })
 